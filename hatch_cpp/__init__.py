@@ -1,6 +1,13 @@
 __version__ = "0.5.0"
 
+from .cache import *
 from .config import *
+from .executor import *
 from .hooks import *
+from .incremental import *
+from .pgo import *
 from .plugin import *
+from .scheduler import *
+from .steps import *
 from .toolchains import *
+from .trace import *
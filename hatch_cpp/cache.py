@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+from hashlib import sha256
+from os import getpid, replace, utime
+from pathlib import Path
+from shlex import split
+from shutil import copyfile
+from threading import Lock, get_ident
+from time import perf_counter, time
+
+from pydantic import BaseModel, Field, PrivateAttr, field_validator
+
+from .executor import HatchCppExecutor, HatchCppStepResult
+from .steps import HatchCppBuildStep
+from .toolchains import probe_compiler
+from .utils import parse_size, user_cache_dir
+
+__all__ = ("HatchCppCompileCache",)
+
+# Flags whose effect is fully captured by the preprocessed source, or that only name files
+_PATH_FLAGS = ("-MF", "-o")
+_PREPROCESSOR_PREFIXES = ("-I", "/I", "-D", "/D", "-U", "/U", "/Fo")
+
+
+def normalize_compile_command(step: HatchCppBuildStep) -> list[str]:
+    """Return the flags of a compile command that affect code generation after preprocessing."""
+    sources = {str(path) for path in step.inputs}
+    tokens = split(step.command)[len(split(step.compiler or "")) :]
+    flags = []
+    skip_next = False
+    for token in tokens:
+        if skip_next:
+            skip_next = False
+        elif token in _PATH_FLAGS:
+            skip_next = True
+        elif token in sources or token in ("-c", "/c", "-MMD") or token.startswith(_PREPROCESSOR_PREFIXES):
+            continue
+        else:
+            flags.append(token)
+    return flags
+
+
+class HatchCppCompileCache(BaseModel):
+    """A content-addressed object cache shared between builds, independent of ccache.
+
+    Objects are keyed on the preprocessed source, the compile flags that remain after
+    preprocessing, and the compiler's version banner. The cache is bounded by ``max_size``
+    and evicts least recently used entries first.
+    """
+
+    enabled: bool = Field(default=False, description="Cache compiled objects in `directory`.")
+    directory: Path = Field(default_factory=lambda: user_cache_dir() / "objects")
+    max_size: int = Field(default=5 * 1024**3, description="Maximum cache size in bytes; accepts suffixes like 500M or 5G.")
+
+    _lock: Lock = PrivateAttr(default_factory=Lock)
+    _hits: int = PrivateAttr(default=0)
+    _misses: int = PrivateAttr(default=0)
+
+    @field_validator("max_size", mode="before")
+    @classmethod
+    def check_max_size(cls, value):
+        return parse_size(value)
+
+    @property
+    def hits(self) -> int:
+        return self._hits
+
+    @property
+    def misses(self) -> int:
+        return self._misses
+
+    def _entry(self, key: str) -> Path:
+        return self.directory / key[:2] / key
+
+    def key(self, step: HatchCppBuildStep, preprocessed: str) -> str:
+        digest = sha256()
+        for part in (probe_compiler(step.compiler).version if step.compiler else "", "\0".join(normalize_compile_command(step)), preprocessed):
+            digest.update(part.encode())
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def run(self, step: HatchCppBuildStep, executor: HatchCppExecutor) -> HatchCppStepResult:
+        """Run a compile step, restoring its object from the cache when possible."""
+        begin = perf_counter()
+        start = time()
+        preprocess = executor.run(step.model_copy(update={"name": f"{step.name}:preprocess", "command": step.preprocess}))
+        if preprocess.returncode != 0:
+            # Let the real compile report the error
+            return executor.run(step)
+
+        key = self.key(step, preprocess.stdout)
+        entry = self._entry(key)
+        obj = entry.with_suffix(".o")
+        if obj.exists() and self._restore(entry, step):
+            with self._lock:
+                self._hits += 1
+            return HatchCppStepResult(
+                name=step.name,
+                kind=step.kind,
+                command=step.command,
+                cached=True,
+                start=start,
+                wall_time=perf_counter() - begin,
+                cpu_time=preprocess.cpu_time,
+                max_rss=preprocess.max_rss,
+            )
+
+        with self._lock:
+            self._misses += 1
+        result = executor.run(step)
+        if result.returncode == 0:
+            entry.parent.mkdir(parents=True, exist_ok=True)
+            if step.depfile is not None and step.depfile.exists():
+                self._store(step.depfile, entry.with_suffix(".d"))
+            # The object is stored last since its presence marks the entry as complete
+            self._store(step.outputs[0], obj)
+        return result
+
+    def _restore(self, entry: Path, step: HatchCppBuildStep) -> bool:
+        """Copy an entry's object and depfile into place, or return False if another build evicted it meanwhile."""
+        obj = entry.with_suffix(".o")
+        try:
+            copyfile(obj, step.outputs[0])
+            if step.depfile is not None and entry.with_suffix(".d").exists():
+                copyfile(entry.with_suffix(".d"), step.depfile)
+            # Touch the entry so that eviction sees it as recently used
+            utime(obj)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def _store(self, source: Path, destination: Path) -> None:
+        temporary = destination.with_name(f"{destination.name}.{getpid()}.{get_ident()}.tmp")
+        copyfile(source, temporary)
+        replace(temporary, destination)
+
+    def evict(self) -> int:
+        """Remove least recently used entries until the cache fits in ``max_size``; return the bytes freed."""
+        if not self.directory.exists():
+            return 0
+        entries = []
+        total = 0
+        for obj in self.directory.glob("*/*.o"):
+            stat = obj.stat()
+            depfile = obj.with_suffix(".d")
+            size = stat.st_size + (depfile.stat().st_size if depfile.exists() else 0)
+            entries.append((stat.st_mtime, size, obj))
+            total += size
+        freed = 0
+        for _, size, obj in sorted(entries):
+            if total - freed <= self.max_size:
+                break
+            obj.unlink(missing_ok=True)
+            obj.with_suffix(".d").unlink(missing_ok=True)
+            freed += size
+        return freed
+
+    def summary(self) -> str:
+        lookups = self._hits + self._misses
+        rate = 100 * self._hits / lookups if lookups else 0
+        return f"hatch-cpp compile cache: {self._hits} hits, {self._misses} misses ({rate:.0f}% hit rate) in {self.directory}"
@@ -1,12 +1,35 @@
 from __future__ import annotations
 
-from os import environ, system as system_call
+import sys
+from hashlib import sha256
+from os import environ, getpid, replace
 from pathlib import Path
+from shutil import rmtree
+from threading import Lock, get_ident
+from time import time
+from typing import Literal
 
 from pkn import getSimpleLogger
-from pydantic import BaseModel, Field, model_validator
+from pydantic import AliasChoices, BaseModel, Field, PrivateAttr, model_validator
 
-from .toolchains import BuildType, HatchCppCmakeConfiguration, HatchCppLibrary, HatchCppPlatform, HatchCppVcpkgConfiguration, Toolchain
+from .cache import HatchCppCompileCache
+from .executor import HatchCppExecutor, HatchCppStepResult
+from .incremental import HatchCppFingerprints, compiler_identity, hash_file, parse_depfile
+from .pgo import HatchCppPgo
+from .scheduler import run_steps
+from .steps import HatchCppBuildStep
+from .toolchains import (
+    BuildType,
+    HatchCppCmakeConfiguration,
+    HatchCppInterpreterProbe,
+    HatchCppLibrary,
+    HatchCppPlatform,
+    HatchCppVcpkgConfiguration,
+    Toolchain,
+    get_nanobind_dir,
+    probe_interpreter,
+)
+from .utils import file_lock, usable_cpu_count, user_cache_dir
 
 __all__ = (
     "HatchCppBuildConfig",
@@ -17,12 +40,34 @@ __all__ = (
 log = getSimpleLogger("hatch_cpp")
 
 
+def _nanobind_source() -> Path:
+    return get_nanobind_dir() / "src" / "nb_combined.cpp"
+
+
+def _is_interpreter_specific(library: HatchCppLibrary) -> bool:
+    return library.binding != "generic" and not library.py_limited_api
+
+
 class HatchCppBuildConfig(BaseModel):
     """Build config values for Hatch C++ Builder."""
 
     verbose: bool | None = Field(default=False)
     skip: bool | None = Field(default=False)
     name: str | None = Field(default=None)
+    jobs: int = Field(default_factory=usable_cpu_count, ge=1, description="Number of build jobs to run concurrently, also passed to cmake --build.")
+    incremental: bool = Field(default=True, description="Skip compiles and links whose inputs are unchanged since the last build.")
+    compile_cache: HatchCppCompileCache = Field(default_factory=HatchCppCompileCache, alias=AliasChoices("compile_cache", "compile-cache"))
+    pgo: HatchCppPgo = Field(default_factory=HatchCppPgo)
+    trace_file: str = Field(
+        default="",
+        alias=AliasChoices("trace_file", "trace-file"),
+        description="Write a Chrome trace-event JSON timeline of the build to this path.",
+    )
+    interpreters: list[str] = Field(
+        default_factory=list,
+        description="Python interpreters to build the libraries for, all into one wheel, e.g. python3.12 or pypy3.10. "
+        "Defaults to the interpreter running the build.",
+    )
     libraries: list[HatchCppLibrary] = Field(default_factory=list)
     cmake: HatchCppCmakeConfiguration | None = Field(default=None)
     platform: HatchCppPlatform | None = Field(default_factory=HatchCppPlatform.default)
@@ -58,9 +103,32 @@ class HatchCppBuildPlan(HatchCppBuildConfig):
     commands: list[str] = Field(default_factory=list)
 
     _active_toolchains: list[Toolchain] = []
+    _steps: list[HatchCppBuildStep] = []
+    _generated_files: dict[Path, str] = {}
+    _fingerprints: HatchCppFingerprints | None = None
+    _executor: HatchCppExecutor | None = None
+    _results: list[HatchCppStepResult] = []
+    _runtime_files: list[Path] = []
+    _staged_runtimes: dict[str, list[tuple[Path, Path]]] = {}
+    _pgo_phase: Literal["", "generate", "use"] = ""
+    _output_lock: Lock = PrivateAttr(default_factory=Lock)
+
+    @property
+    def results(self) -> list[HatchCppStepResult]:
+        """Results of the steps run by the last call to ``execute``, in completion order."""
+        return self._results
+
+    @property
+    def runtime_files(self) -> list[Path]:
+        """Shared runtime libraries copied next to the extensions, which must ship in the wheel alongside them."""
+        return self._runtime_files
 
     def generate(self):
         self.commands = []
+        self._steps = []
+        self._generated_files = {}
+        self._runtime_files = []
+        self._staged_runtimes = {}
 
         # Check for env var overrides
         vcpkg_override = environ.get("HATCH_CPP_VCPKG")
@@ -85,42 +153,420 @@ class HatchCppBuildPlan(HatchCppBuildConfig):
         elif cmake_override != "0" and self.cmake:
             self._active_toolchains.append("cmake")
 
-        # Collect toolchain commands
+        # Collect toolchain steps; vcpkg steps run in order and everything else waits for them
+        vcpkg_depends = []
         if "vcpkg" in self._active_toolchains:
-            self.commands.extend(self.vcpkg.generate(self))
+            self._steps.extend(self._generate_vcpkg())
+            vcpkg_depends = [self._steps[-1].name] if self._steps else []
 
         if "vanilla" in self._active_toolchains:
             if "vcpkg" in self._active_toolchains:
                 log.warning("vcpkg toolchain is active; ensure that your compiler is configured to use vcpkg includes and libs.")
 
             for library_index, library in enumerate(self.libraries):
-                compile_flags = self.platform.get_compile_flags(library, self.build_type)
-                link_flags = self.platform.get_link_flags(library, self.build_type)
-                compiler = self.platform.cc if library.language == "c" else self.platform.cxx
-                if self.platform.platform == "emscripten":
-                    objects = []
-                    for source_index, source in enumerate(library.sources):
-                        obj = Path("build/hatch-cpp") / f"{library_index}-{source_index}-{Path(source).stem}.o"
-                        objects.append(str(obj))
-                        self.commands.append(f"{compiler} -c {source} {compile_flags} -o {obj}")
-                    self.commands.append(f"{compiler} {' '.join(objects)} {link_flags}")
-                else:
-                    self.commands.append(f"{compiler} {' '.join(library.sources)} {compile_flags} {link_flags}")
+                for interpreter in self.get_interpreters(library):
+                    self._steps.extend(self._generate_library(library_index, library, vcpkg_depends, interpreter))
 
         if "cmake" in self._active_toolchains:
-            self.commands.extend(self.cmake.generate(self))
+            configure, build, install = self.cmake.generate(self)
+            query, content = self.cmake.get_file_api_query()
+            self._generated_files[query] = content
+            # Configuring is skipped while its command, compiler, environment and CMake scripts are unchanged;
+            # cmake --build still regenerates by itself if anything it tracks changes afterwards
+            self._steps.append(
+                HatchCppBuildStep(
+                    name="cmake:configure",
+                    kind="cmake-configure",
+                    command=configure,
+                    depends=vcpkg_depends,
+                    compiler=self.platform.cxx,
+                    inputs=[*self.cmake.get_configure_inputs(self), query],
+                    outputs=self.cmake.get_configure_outputs(),
+                    env=self.cmake.get_configure_env(),
+                )
+            )
+            self._steps.append(HatchCppBuildStep(name="cmake:build", kind="cmake-build", command=build, depends=["cmake:configure"]))
+            self._steps.append(HatchCppBuildStep(name="cmake:install", kind="cmake-install", command=install, depends=["cmake:build"]))
 
+        self.commands = [step.command for step in self._steps]
         return self.commands
 
+    def get_interpreters(self, library: HatchCppLibrary | None = None) -> list[HatchCppInterpreterProbe]:
+        """Return the interpreters to build ``library`` for, or that the wheel is for.
+
+        Generic and limited API libraries do not depend on the interpreter, so they are built once.
+        """
+        if not self.interpreters or (library is not None and not _is_interpreter_specific(library)):
+            return [probe_interpreter()]
+        probes = {}
+        for interpreter in self.interpreters:
+            probe = probe_interpreter(interpreter)
+            probes.setdefault(probe.ext_suffix, probe)
+        return list(probes.values())
+
+    def get_qualified_name(self, library: HatchCppLibrary, interpreter: HatchCppInterpreterProbe) -> str:
+        """Return ``library``'s filename for ``interpreter``, which only names pybind11 and nanobind extensions with ``interpreters``."""
+        return library.get_qualified_name(self.platform.platform, interpreter if self.interpreters else None)
+
+    def _generate_vcpkg(self) -> list[HatchCppBuildStep]:
+        steps = []
+        for index, command in enumerate(self.vcpkg.generate(self)):
+            steps.append(HatchCppBuildStep(name=f"vcpkg:{index}", kind="vcpkg", command=command, depends=[f"vcpkg:{index - 1}"] if index else []))
+        return steps
+
+    def _generate_library(
+        self, library_index: int, library: HatchCppLibrary, depends: list[str], interpreter: HatchCppInterpreterProbe
+    ) -> list[HatchCppBuildStep]:
+        build_dir = shared_dir = Path("build/hatch-cpp")
+        if self.interpreters and _is_interpreter_specific(library):
+            # Each interpreter's objects are kept apart so that they build concurrently and stay up to date side by side
+            build_dir = build_dir / interpreter.abi_tag
+        compile_flags = self.platform.get_compile_flags(library, self.build_type, interpreter)
+        link_flags = self.platform.get_link_flags(library, self.build_type, interpreter if self.interpreters else None)
+        pgo_inputs = []
+        if self._pgo_phase == "generate":
+            pgo_compile_flags, pgo_link_flags = self.pgo.get_generate_flags(self.platform.toolchain)
+            compile_flags += " " + " ".join(pgo_compile_flags)
+            link_flags += " " + " ".join(pgo_link_flags)
+        elif self._pgo_phase == "use":
+            compile_flags += " " + " ".join(self.pgo.get_use_flags(self.platform.toolchain))
+            # Objects are rebuilt whenever a new profile is collected
+            pgo_inputs = [self.pgo.get_record_path()]
+        compiler = self.platform.cc if library.language == "c" else self.platform.cxx
+        steps = []
+
+        # Precompile the heavy binding headers once, with the same flags as the sources
+        source_flags = preprocess_flags = compile_flags
+        source_depends = depends
+        pch_inputs = []
+        if library.precompiled_headers and self.platform.toolchain == "msvc":
+            log.warning("Precompiled headers are not supported with msvc; compiling %s without them.", library.name)
+        elif library.precompiled_headers and library.get_precompiled_header_includes():
+            header = build_dir / f"{library_index}-pch.{'h' if library.language == 'c' else 'hpp'}"
+            pch = self.platform.get_precompiled_header_path(header)
+            self._generated_files[header] = "".join(f"#include <{include}>\n" for include in library.get_precompiled_header_includes())
+            steps.append(
+                HatchCppBuildStep(
+                    name=f"pch:{pch}",
+                    kind="pch",
+                    command=self.platform.get_precompiled_header_command(compiler, library.language, header, compile_flags, pch),
+                    depends=depends,
+                    compiler=compiler,
+                    inputs=[header],
+                    outputs=[pch],
+                    depfile=self.platform.get_depfile_path(pch),
+                )
+            )
+            depends = [f"pch:{pch}"]
+            pch_inputs = [pch]
+            source_flags = compile_flags + self.platform.get_precompiled_header_flags(header, pch)
+            preprocess_flags = compile_flags + f" -include {header}"
+
+        objects = []
+        compile_steps = []
+        for source_index, batch in enumerate(library.get_unity_batches()):
+            if build_dir != shared_dir and batch[0] in library.interpreter_independent_sources:
+                # Every interpreter links the same object, compiled without the interpreter's precompiled header
+                source = batch[0]
+                obj = self.platform.get_object_path(shared_dir, f"{library_index}-{source_index}-{Path(source).stem}")
+                objects.append(obj)
+                compile_steps.append(self._compile_step(compiler, source, obj, compile_flags, compile_flags, source_depends, pgo_inputs))
+                continue
+            if len(batch) == 1:
+                source = batch[0]
+                obj = self.platform.get_object_path(build_dir, f"{library_index}-{source_index}-{Path(source).stem}")
+            else:
+                # Merge the batch into one translation unit so that shared headers are parsed once
+                unity = build_dir / f"{library_index}-unity-{source_index}.{'c' if library.language == 'c' else 'cpp'}"
+                self._generated_files[unity] = "".join(f'#include "{Path(source).resolve().as_posix()}"\n' for source in batch)
+                source = str(unity)
+                obj = self.platform.get_object_path(build_dir, f"{library_index}-{source_index}-unity")
+            objects.append(obj)
+            compile_steps.append(self._compile_step(compiler, source, obj, source_flags, preprocess_flags, depends, [*pch_inputs, *pgo_inputs]))
+
+        output = Path(self.get_qualified_name(library, interpreter))
+        link_depends = [step.name for step in compile_steps]
+        link_inputs = [*objects, *(Path(obj) for obj in library.get_effective_extra_objects(self.platform.platform))]
+        runtime_flags = ""
+        if library.binding == "nanobind" and library.nanobind_runtime == "embedded":
+            # nanobind's runtime is a unity build of its own, so it is compiled apart from any unity batches
+            obj = self.platform.get_object_path(build_dir, f"{library_index}-nanobind")
+            objects.append(obj)
+            compile_steps.append(self._compile_step(compiler, str(_nanobind_source()), obj, compile_flags, compile_flags, depends, pgo_inputs))
+            link_depends.append(compile_steps[-1].name)
+            link_inputs.append(obj)
+        elif library.binding == "nanobind":
+            runtime_steps, runtime = self._generate_nanobind_runtime(library, compiler, output.parent, depends, interpreter)
+            # Libraries sharing the runtime share its steps
+            known = {step.name for step in self._steps}
+            steps.extend(step for step in runtime_steps if step.name not in known)
+            link_depends.extend(step.name for step in runtime_steps if step.kind == "link")
+            link_inputs.append(runtime)
+            runtime_flags = " " + self.platform.get_library_link_flags(runtime, library.nanobind_runtime == "shared")
+
+        link_step = HatchCppBuildStep(
+            name=f"link:{output}",
+            kind="link",
+            command=f"{compiler} {' '.join(str(obj) for obj in objects)}{runtime_flags} {link_flags}",
+            depends=link_depends,
+            compiler=compiler,
+            inputs=link_inputs,
+            outputs=[output],
+        )
+        # The interpreters after the first reuse the compiles they share with it
+        known = {step.name for step in self._steps}
+        return [*steps, *(step for step in compile_steps if step.name not in known), link_step]
+
+    def _compile_step(
+        self, compiler: str, source: str, obj: Path, flags: str, preprocess_flags: str, depends: list[str], extra_inputs: list[Path]
+    ) -> HatchCppBuildStep:
+        depfile = self.platform.get_depfile_path(obj)
+        return HatchCppBuildStep(
+            name=f"compile:{obj}",
+            kind="compile",
+            command=self.platform.get_compile_command(compiler, source, flags, obj),
+            depends=depends,
+            compiler=compiler,
+            # Without a depfile the headers a source includes are unknown, so the step is never skipped
+            inputs=[Path(source), *extra_inputs] if depfile else [],
+            outputs=[obj],
+            depfile=depfile,
+            # The compile cache cannot see profile data, so profile-guided compiles bypass it
+            preprocess=None if self._pgo_phase else self.platform.get_preprocess_command(compiler, source, preprocess_flags),
+        )
+
+    def _generate_nanobind_runtime(
+        self, library: HatchCppLibrary, compiler: str, destination: Path, depends: list[str], interpreter: HatchCppInterpreterProbe
+    ) -> tuple[list[HatchCppBuildStep], Path]:
+        """Build libnanobind once per toolchain, flag set and nanobind version into the user cache.
+
+        Returns the steps still to run and the library to link against.
+        """
+        shared = library.nanobind_runtime == "shared"
+        if shared and self.platform.platform == "emscripten":
+            raise ValueError("A shared nanobind runtime is not supported with emscripten; use nanobind-runtime = 'static'.")
+        runtime_library = HatchCppLibrary(
+            name="nanobind",
+            sources=[],
+            binding="nanobind",
+            std=library.std,
+            py_limited_api=library.py_limited_api,
+            nanobind_runtime=library.nanobind_runtime,
+            define_macros=["NB_BUILD"] if shared else [],
+        )
+        flags = self.platform.get_compile_flags(runtime_library, self.build_type, interpreter)
+        key = sha256(
+            "\0".join(
+                (
+                    interpreter.nanobind_version,
+                    library.nanobind_runtime,
+                    self.platform.platform,
+                    self.platform.toolchain,
+                    compiler_identity(compiler),
+                    flags,
+                )
+            ).encode()
+        ).hexdigest()[:16]
+        directory = user_cache_dir() / "nanobind" / key
+        runtime = self.platform.get_library_path(directory, f"nanobind-{key}", shared)
+
+        steps = []
+        if not runtime.exists():
+            # Other builds share the cache, so the runtime is built apart and only moved into place once complete
+            staging = directory / f"{getpid()}.{get_ident()}.tmp"
+            staged = staging / runtime.name
+            obj = self.platform.get_object_path(staging, "nb_combined")
+            command = (
+                self.platform.get_shared_library_command(compiler, [obj], staged, interpreter)
+                if shared
+                else self.platform.get_static_library_command([obj], staged)
+            )
+            steps.append(
+                HatchCppBuildStep(
+                    name=f"compile:{obj}",
+                    kind="compile",
+                    command=self.platform.get_compile_command(compiler, str(_nanobind_source()), flags, obj),
+                    depends=depends,
+                    compiler=compiler,
+                    outputs=[obj],
+                )
+            )
+            steps.append(HatchCppBuildStep(name=f"link:{runtime}", kind="link", command=command, depends=[f"compile:{obj}"], outputs=[staged]))
+            # msvc writes the import library extensions link against next to the DLL
+            published = [runtime.with_suffix(".lib"), runtime] if shared and self.platform.toolchain == "msvc" else [runtime]
+            self._staged_runtimes[steps[-1].name] = [(staging / path.name, path) for path in published]
+        if shared:
+            # Extensions find the shared runtime next to themselves
+            copy = destination / runtime.name
+            steps.append(
+                HatchCppBuildStep(
+                    name=f"copy:{copy}",
+                    kind="copy",
+                    command=self.platform.get_copy_command(runtime, copy),
+                    depends=[step.name for step in steps if step.kind == "link"] or depends,
+                    inputs=[runtime],
+                    outputs=[copy],
+                )
+            )
+            self._runtime_files.append(copy)
+        return steps, runtime
+
+    def _write_generated_files(self):
+        for path, content in self._generated_files.items():
+            # Leave unchanged files alone so that their mtime does not invalidate fingerprints
+            if not path.exists() or path.read_text() != content:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                path.write_text(content)
+
     def execute(self):
-        if self.platform.platform == "emscripten" and "vanilla" in self._active_toolchains:
+        if "vanilla" in self._active_toolchains:
             Path("build/hatch-cpp").mkdir(parents=True, exist_ok=True)
-        for command in self.commands:
-            ret = system_call(command)
-            if ret != 0:
-                raise RuntimeError(f"hatch-cpp build command failed with exit code {ret}: {command}")
+        self._fingerprints = HatchCppFingerprints.load(Path("build/hatch-cpp/fingerprints.json"))
+        self._executor = HatchCppExecutor()
+        self._results = []
+        try:
+            if self.pgo.enabled and "vanilla" in self._active_toolchains and self.platform.toolchain in ("gcc", "clang"):
+                self._execute_pgo()
+            else:
+                if self.pgo.enabled:
+                    log.warning("Profile-guided optimization is only supported for gcc and clang libraries; building without it.")
+                self._run_plan()
+        finally:
+            if "vanilla" in self._active_toolchains or "cmake" in self._active_toolchains:
+                self._fingerprints.save()
+            if self.compile_cache.enabled:
+                self.compile_cache.evict()
+                log.warning(self.compile_cache.summary())
+            if "vcpkg" in self._active_toolchains:
+                summary = self.vcpkg.get_binary_cache_summary("".join(result.stdout for result in self._results if result.kind == "vcpkg"))
+                if summary:
+                    log.warning(summary)
+            if self.verbose:
+                self._log_timings()
         return self.commands
 
+    def _run_plan(self):
+        for step in self._steps:
+            for output in step.outputs:
+                output.parent.mkdir(parents=True, exist_ok=True)
+        self._write_generated_files()
+        steps = self._steps
+        vcpkg_steps = [step for step in steps if step.kind == "vcpkg"]
+        if vcpkg_steps:
+            # vcpkg steps are a chain that every other step waits for, so they run first
+            if self.vcpkg.vcpkg_home:
+                # Builds sharing a vcpkg home take turns with it. Another build may have prepared the
+                # worktree and tool while this one waited, so the vcpkg steps are planned again under the lock.
+                with self.vcpkg.lock():
+                    self._run_vcpkg(self._generate_vcpkg())
+            else:
+                self._run_vcpkg(vcpkg_steps)
+            steps = [
+                step.model_copy(update={"depends": [name for name in step.depends if not name.startswith("vcpkg:")]})
+                for step in steps
+                if step.kind != "vcpkg"
+            ]
+        run_steps(steps, self._run_step, self.jobs, cancel=self._executor.cancel)
+
+    def _run_vcpkg(self, steps: list[HatchCppBuildStep]):
+        if not steps:
+            return
+        before = self.vcpkg.get_footprint()
+        # vcpkg refuses a files binary source that does not exist yet
+        binary_cache = self.vcpkg.get_binary_cache_dir()
+        if binary_cache is not None:
+            binary_cache.mkdir(parents=True, exist_ok=True)
+        run_steps(steps, self._run_step, 1, cancel=self._executor.cancel)
+        self.vcpkg.record_install(self.platform.platform)
+        self.vcpkg.clean()
+        log.warning(self.vcpkg.get_footprint_summary(before, self.vcpkg.get_footprint()))
+
+    def _execute_pgo(self):
+        commands = self.commands
+        key = self._pgo_key(commands)
+        try:
+            if self.pgo.is_trained(key):
+                log.warning("hatch-cpp reusing the profile in %s", self.pgo.profile_dir)
+            else:
+                # Phase one: build instrumented libraries and collect a profile by running the training command against them
+                self.pgo.reset()
+                self._pgo_phase = "generate"
+                self.generate()
+                self._run_plan()
+                run_steps([self.pgo.get_training_step()], self._run_step, 1, cancel=self._executor.cancel)
+                merge = self.pgo.get_merge_step(self.platform.toolchain, self.platform.platform)
+                if merge:
+                    run_steps([merge], self._run_step, 1, cancel=self._executor.cancel)
+                # The instrumented build wrote the depfiles, so the key now covers the headers as well
+                self.pgo.record(self._pgo_key(commands))
+            # Phase two: rebuild with the profile
+            self._pgo_phase = "use"
+            self.generate()
+            self._run_plan()
+        finally:
+            self._pgo_phase = ""
+
+    def _pgo_key(self, commands: list[str]) -> str:
+        """Key a profile on everything it was collected from: the build commands, the compilers, the sources, the headers and the training command."""
+        digest = sha256()
+        parts = [self.pgo.training_command, compiler_identity(self.platform.cc), compiler_identity(self.platform.cxx), *commands]
+        inputs = {Path(source) for library in self.libraries for source in library.sources}
+        for step in self._steps:
+            # The headers a source includes are known from the depfile of its last build
+            if step.kind in ("compile", "pch") and step.depfile is not None and step.depfile.exists():
+                inputs.update(path for path in parse_depfile(step.depfile) if path.exists())
+        parts.extend(f"{path}:{hash_file(path)}" for path in sorted(inputs))
+        for part in parts:
+            digest.update(part.encode())
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def _run_step(self, step: HatchCppBuildStep) -> int:
+        if self.incremental and self._fingerprints.is_up_to_date(step):
+            log.info("hatch-cpp up to date: %s", " ".join(str(output) for output in step.outputs))
+            self._results.append(HatchCppStepResult(name=step.name, kind=step.kind, command=step.command, skipped=True, start=time()))
+            return 0
+        self._fingerprints.forget(step)
+        if self.compile_cache.enabled and step.preprocess:
+            result = self.compile_cache.run(step, self._executor)
+        else:
+            result = self._executor.run(step)
+        self._results.append(result)
+        # Replay the captured output in one piece so that concurrent steps do not interleave
+        with self._output_lock:
+            print(result.stdout, end="", file=sys.stdout, flush=True)
+            print(result.stderr, end="", file=sys.stderr, flush=True)
+        if result.returncode == 0:
+            self._fingerprints.record(step)
+            self._publish_runtime(step)
+        return result.returncode
+
+    def _publish_runtime(self, step: HatchCppBuildStep) -> None:
+        """Move a nanobind runtime built by ``step`` from its staging directory into the shared cache."""
+        staged = self._staged_runtimes.get(step.name)
+        if not staged:
+            return
+        runtime = staged[-1][1]
+        with file_lock(runtime.parent / ".lock"):
+            # Another build may have published the same runtime meanwhile; the runtime itself goes last as it marks the set complete
+            if not runtime.exists():
+                for source, destination in staged:
+                    replace(source, destination)
+        rmtree(staged[-1][0].parent, ignore_errors=True)
+
+    def _log_timings(self):
+        ran = [result for result in self._results if not result.skipped and not result.cached]
+        log.warning(
+            "hatch-cpp ran %d steps (%d up to date, %d from cache) using %.2fs of CPU time",
+            len(ran),
+            sum(result.skipped for result in self._results),
+            sum(result.cached for result in self._results),
+            sum(result.cpu_time or 0 for result in ran),
+        )
+        for result in sorted(ran, key=lambda result: result.wall_time, reverse=True)[:5]:
+            rss = f", {result.max_rss / 2**20:.0f} MiB peak" if result.max_rss else ""
+            log.warning("  %.2fs wall, %.2fs CPU%s: %s", result.wall_time, result.cpu_time or 0, rss, result.name)
+
     def cleanup(self):
         if self.platform.platform == "win32":
             for temp_obj in Path(".").glob("*.obj"):
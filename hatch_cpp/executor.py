@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+from contextlib import suppress
+from os import environ, waitstatus_to_exitcode
+from shlex import split
+from subprocess import Popen
+from sys import platform as sys_platform
+from tempfile import TemporaryFile
+from threading import Lock
+from time import perf_counter, time
+
+from pydantic import BaseModel, Field, PrivateAttr
+
+from .steps import HatchCppBuildStep, StepKind
+
+__all__ = (
+    "HatchCppExecutor",
+    "HatchCppStepResult",
+)
+
+
+class HatchCppStepResult(BaseModel):
+    """The outcome of running one build step."""
+
+    name: str
+    kind: StepKind
+    command: str
+    returncode: int = 0
+    skipped: bool = Field(default=False, description="Whether the step was skipped because its outputs were up to date.")
+    cached: bool = Field(default=False, description="Whether the step's outputs were restored from the compile cache.")
+    start: float = Field(default=0.0, description="Start time, in seconds since the epoch.")
+    wall_time: float = Field(default=0.0, description="Elapsed time in seconds.")
+    cpu_time: float | None = Field(default=None, description="User plus system CPU time of the process in seconds, where available.")
+    max_rss: int | None = Field(default=None, description="Peak resident set size of the process in bytes, where available.")
+    stdout: str = ""
+    stderr: str = ""
+
+
+class HatchCppExecutor(BaseModel):
+    """Runs build step commands as argv lists, without a shell, capturing output and resource usage."""
+
+    _lock: Lock = PrivateAttr(default_factory=Lock)
+    _running: set[Popen] = PrivateAttr(default_factory=set)
+    _cancelled: bool = PrivateAttr(default=False)
+
+    def get_argv(self, command: str) -> list[str] | str:
+        # CreateProcess parses the command line itself on Windows, so it is passed through unsplit
+        if sys_platform == "win32":
+            return command
+        return split(command)
+
+    def run(self, step: HatchCppBuildStep) -> HatchCppStepResult:
+        result = HatchCppStepResult(name=step.name, kind=step.kind, command=step.command, start=time())
+        begin = perf_counter()
+        with TemporaryFile() as stdout, TemporaryFile() as stderr:
+            with self._lock:
+                if self._cancelled:
+                    raise RuntimeError(f"hatch-cpp build cancelled before running: {step.command}")
+                try:
+                    process = Popen(self.get_argv(step.command), stdout=stdout, stderr=stderr, env={**environ, **step.env} if step.env else None)
+                except OSError as e:
+                    raise RuntimeError(f"hatch-cpp could not run build command ({e}): {step.command}") from e
+                self._running.add(process)
+            try:
+                if sys_platform == "win32":
+                    result.returncode = process.wait()
+                else:
+                    from os import wait4
+
+                    _, status, usage = wait4(process.pid, 0)
+                    process.returncode = result.returncode = waitstatus_to_exitcode(status)
+                    result.cpu_time = usage.ru_utime + usage.ru_stime
+                    # ru_maxrss is reported in kilobytes on Linux and in bytes on macOS
+                    result.max_rss = usage.ru_maxrss if sys_platform == "darwin" else usage.ru_maxrss * 1024
+            finally:
+                with self._lock:
+                    self._running.discard(process)
+            result.wall_time = perf_counter() - begin
+            stdout.seek(0)
+            stderr.seek(0)
+            result.stdout = stdout.read().decode(errors="replace")
+            result.stderr = stderr.read().decode(errors="replace")
+        return result
+
+    def cancel(self) -> None:
+        """Terminate running commands and refuse to start new ones."""
+        with self._lock:
+            self._cancelled = True
+            for process in self._running:
+                # Popen.terminate() polls first, which could reap the child before run() collects its usage
+                if sys_platform == "win32":
+                    process.terminate()
+                else:
+                    from os import kill
+                    from signal import SIGTERM
+
+                    with suppress(ProcessLookupError):
+                        kill(process.pid, SIGTERM)
@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+from functools import cache
+from hashlib import sha256
+from json import dumps, loads
+from pathlib import Path
+from re import split
+from shlex import split as shell_split
+from shutil import which
+from threading import Lock
+
+from pydantic import BaseModel, Field, PrivateAttr
+
+from .steps import HatchCppBuildStep
+
+__all__ = (
+    "HatchCppFingerprints",
+    "compiler_identity",
+    "hash_file",
+    "parse_depfile",
+)
+
+
+def hash_file(path: Path) -> str:
+    """Return the sha256 hex digest of a file's contents."""
+    digest = sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@cache
+def compiler_identity(compiler: str) -> str:
+    """Identify a compiler command (including wrappers like ccache) by resolved path, size and mtime."""
+    parts = []
+    for token in shell_split(compiler):
+        resolved = which(token)
+        if resolved is None:
+            parts.append(token)
+            continue
+        stat = Path(resolved).stat()
+        parts.append(f"{resolved}:{stat.st_size}:{stat.st_mtime_ns}")
+    return " ".join(parts)
+
+
+def parse_depfile(path: Path) -> list[Path]:
+    """Parse the prerequisites out of a Makefile-style depfile as written by ``-MMD``."""
+    text = Path(path).read_text().replace("\\\r\n", " ").replace("\\\n", " ")
+    prerequisites = []
+    for rule in text.splitlines():
+        # The target ends at the first colon followed by whitespace, which skips Windows drive letters
+        parts = split(r":\s", rule, maxsplit=1)
+        if len(parts) != 2:
+            continue
+        for token in split(r"(?<!\\)\s+", parts[1].strip()):
+            if token:
+                prerequisites.append(Path(token.replace("\\ ", " ").replace("$$", "$")))
+    return prerequisites
+
+
+class _InputRecord(BaseModel):
+    mtime_ns: int
+    size: int
+    digest: str
+
+
+class _StepRecord(BaseModel):
+    command: str
+    compiler: str
+    env: dict[str, str] = Field(default_factory=dict)
+    inputs: dict[str, _InputRecord] = Field(default_factory=dict)
+
+
+class HatchCppFingerprints(BaseModel):
+    """Per-output fingerprints used to skip build steps whose inputs are unchanged.
+
+    A step is up to date when its command (and thus its effective flags), its environment,
+    the identity of its compiler and the contents of every input it read last time,
+    including the headers listed in its depfile, are unchanged and all of its outputs exist.
+    """
+
+    path: Path
+    entries: dict[str, _StepRecord] = Field(default_factory=dict)
+
+    _lock: Lock = PrivateAttr(default_factory=Lock)
+
+    @classmethod
+    def load(cls, path: Path) -> HatchCppFingerprints:
+        try:
+            return cls(path=path, entries=loads(Path(path).read_text()).get("entries", {}))
+        except (OSError, ValueError):
+            return cls(path=path)
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            self.path.write_text(dumps({"entries": {key: value.model_dump() for key, value in self.entries.items()}}, indent=1))
+
+    def _key(self, step: HatchCppBuildStep) -> str | None:
+        if not step.outputs or (step.depfile is None and not step.inputs):
+            return None
+        return str(step.outputs[0])
+
+    def is_up_to_date(self, step: HatchCppBuildStep) -> bool:
+        key = self._key(step)
+        record = self.entries.get(key) if key else None
+        if record is None or record.command != step.command or record.compiler != compiler_identity(step.compiler or "") or record.env != step.env:
+            return False
+        if not all(output.exists() for output in step.outputs):
+            return False
+        for name, expected in record.inputs.items():
+            try:
+                stat = Path(name).stat()
+            except OSError:
+                return False
+            if stat.st_mtime_ns == expected.mtime_ns and stat.st_size == expected.size:
+                continue
+            if stat.st_size != expected.size or hash_file(Path(name)) != expected.digest:
+                return False
+            # Touched but unchanged: remember the new mtime so that later builds skip hashing it again
+            with self._lock:
+                expected.mtime_ns = stat.st_mtime_ns
+        return True
+
+    def record(self, step: HatchCppBuildStep) -> None:
+        key = self._key(step)
+        if key is None:
+            return
+        inputs = list(step.inputs)
+        if step.depfile is not None and step.depfile.exists():
+            inputs.extend(parse_depfile(step.depfile))
+        records = {}
+        for path in inputs:
+            try:
+                stat = path.stat()
+                records[str(path)] = _InputRecord(mtime_ns=stat.st_mtime_ns, size=stat.st_size, digest=hash_file(path))
+            except OSError:
+                # An input listed by a stale depfile is gone, so the step cannot be known to be up to date
+                self.forget(step)
+                return
+        with self._lock:
+            self.entries[key] = _StepRecord(command=step.command, compiler=compiler_identity(step.compiler or ""), env=step.env, inputs=records)
+
+    def forget(self, step: HatchCppBuildStep) -> None:
+        key = self._key(step)
+        with self._lock:
+            self.entries.pop(key, None)
@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+from json import dumps, loads
+from os import environ, pathsep
+from pathlib import Path
+from shlex import split
+from shutil import rmtree
+from sys import executable
+
+from pydantic import AliasChoices, BaseModel, Field
+
+from .steps import HatchCppBuildStep
+from .toolchains import CompilerToolchain, Platform
+
+__all__ = ("HatchCppPgo",)
+
+_PROFDATA = "hatch-cpp.profdata"
+_RECORD = "profile.json"
+
+
+class HatchCppPgo(BaseModel):
+    """Two-phase profile-guided optimization of the vanilla toolchain's libraries.
+
+    Libraries are first built instrumented and exercised by ``training_command``; the
+    collected profile is then used to rebuild them. Profiles are kept in ``profile_dir``
+    and reused by later builds until the training key (sources, flags and training
+    command) changes.
+    """
+
+    enabled: bool = Field(default=False, description="Build with profile-guided optimization.")
+    training_command: str = Field(
+        default="",
+        alias=AliasChoices("training_command", "training-command"),
+        description="Command exercising the instrumented libraries; a leading .py script is run with the build's Python.",
+    )
+    profile_dir: str = Field(
+        default="build/hatch-cpp/pgo",
+        alias=AliasChoices("profile_dir", "profile-dir"),
+        description="Directory holding the collected profile, reused by later builds.",
+    )
+    profdata: str = Field(default="", description="llvm-profdata command used to merge clang profiles; defaults to llvm-profdata.")
+
+    @property
+    def directory(self) -> Path:
+        # Instrumented libraries write their profile relative to the training process, so the path must be absolute
+        return Path(self.profile_dir).resolve()
+
+    def get_generate_flags(self, toolchain: CompilerToolchain) -> tuple[list[str], list[str]]:
+        """Return the compile and link flags of the instrumented build."""
+        if toolchain == "clang":
+            flag = f"-fprofile-instr-generate={self.directory / 'hatch-cpp-%p.profraw'}"
+            return [flag], [flag]
+        flag = f"-fprofile-generate={self.directory}"
+        # Training may exercise the libraries from several threads
+        return [flag, "-fprofile-update=atomic"], [flag]
+
+    def get_use_flags(self, toolchain: CompilerToolchain) -> list[str]:
+        """Return the compile flags of the optimized build."""
+        if toolchain == "clang":
+            return [f"-fprofile-instr-use={self.directory / _PROFDATA}", "-Wno-profile-instr-out-of-date", "-Wno-profile-instr-unprofiled"]
+        return [f"-fprofile-use={self.directory}", "-Wno-missing-profile", "-Wno-error=coverage-mismatch"]
+
+    def is_trained(self, key: str) -> bool:
+        """Whether the stored profile was collected for ``key``."""
+        record = self.get_record_path()
+        if not record.exists():
+            return False
+        return loads(record.read_text()).get("key") == key
+
+    def reset(self) -> None:
+        """Drop any stored profile before collecting a new one."""
+        rmtree(self.directory, ignore_errors=True)
+        self.directory.mkdir(parents=True)
+
+    def record(self, key: str) -> None:
+        self.get_record_path().write_text(dumps({"key": key}))
+
+    def get_record_path(self) -> Path:
+        """Return the file rewritten whenever a new profile is collected."""
+        return self.directory / _RECORD
+
+    def get_training_step(self) -> HatchCppBuildStep:
+        if not self.training_command:
+            raise ValueError("pgo requires a training-command to exercise the instrumented build.")
+        command = self.training_command
+        if split(command)[0].endswith(".py"):
+            command = f"{executable} {command}"
+        # Make the freshly built libraries importable from the project root
+        python_path = pathsep.join(path for path in (str(Path.cwd()), environ.get("PYTHONPATH", "")) if path)
+        return HatchCppBuildStep(name="pgo:train", kind="pgo-train", command=command, env={"PYTHONPATH": python_path})
+
+    def get_merge_step(self, toolchain: CompilerToolchain, platform: Platform) -> HatchCppBuildStep | None:
+        """Return the step merging raw clang profiles, or None when the toolchain needs no merge."""
+        if toolchain != "clang":
+            # gcc accumulates counters across runs into its .gcda files
+            return None
+        profdata = self.profdata or ("xcrun llvm-profdata" if platform == "darwin" else "llvm-profdata")
+        raw = " ".join(str(path) for path in sorted(self.directory.glob("*.profraw")))
+        if not raw:
+            raise RuntimeError(f"hatch-cpp pgo training did not write any profiles to {self.directory}: {self.training_command}")
+        output = self.directory / _PROFDATA
+        return HatchCppBuildStep(name="pgo:merge", kind="pgo-merge", command=f"{profdata} merge -output={output} {raw}", outputs=[output])
@@ -10,17 +10,19 @@ from hatch_build import parse_extra_args_model
 from hatchling.builders.hooks.plugin.interface import BuildHookInterface
 
 from .config import HatchCppBuildConfig, HatchCppBuildPlan, log
-from .utils import import_string
+from .toolchains import HatchCppInterpreterProbe
+from .trace import HatchCppTracer
+from .utils import find_files, import_string
 
 __all__ = ("HatchCppBuildHook",)
 
 
-def _wheel_tag(platform: str, machine: str, version_major: int, version_minor: int, abi3: bool) -> str:
+def _platform_tag(platform: str, machine: str) -> str:
     if platform == "emscripten":
         abi_version = environ.get("PYODIDE_ABI_VERSION")
         if not abi_version:
             raise ValueError("PYODIDE_ABI_VERSION is required for Emscripten wheel tags.")
-        return f"cp{version_major}{version_minor}-cp{version_major}{version_minor}-pyemscripten_{abi_version}_wasm32"
+        return f"pyemscripten_{abi_version}_wasm32"
 
     if platform == "darwin":
         os_name = "macosx_11_0"
@@ -28,8 +30,21 @@ def _wheel_tag(platform: str, machine: str, version_major: int, version_minor: i
         os_name = "linux"
     else:
         os_name = "win"
+    return f"{os_name}_{machine}"
+
+
+def _wheel_tag(platform: str, machine: str, version_major: int, version_minor: int, abi3: bool) -> str:
+    if platform == "emscripten":
+        return f"cp{version_major}{version_minor}-cp{version_major}{version_minor}-{_platform_tag(platform, machine)}"
     abi = "abi3" if abi3 else f"cp{version_major}{version_minor}"
-    return f"cp{version_major}{version_minor}-{abi}-{os_name}_{machine}"
+    return f"cp{version_major}{version_minor}-{abi}-{_platform_tag(platform, machine)}"
+
+
+def _interpreters_wheel_tag(platform: str, machine: str, interpreters: list[HatchCppInterpreterProbe]) -> str:
+    """Return the compressed tag set of a wheel holding extensions for several interpreters, e.g. cp311.cp312-cp311.cp312-linux_x86_64."""
+    python_tags = ".".join(dict.fromkeys(interpreter.python_tag for interpreter in interpreters))
+    abi_tags = ".".join(dict.fromkeys(interpreter.abi_tag for interpreter in interpreters))
+    return f"{python_tags}-{abi_tags}-{_platform_tag(platform, machine)}"
 
 
 class HatchCppBuildHook(BuildHookInterface[HatchCppBuildConfig]):
@@ -51,23 +66,27 @@ class HatchCppBuildHook(BuildHookInterface[HatchCppBuildConfig]):
             self._logger.info("ignoring target name %s", self.target_name)
             return
 
+        tracer = HatchCppTracer()
+
         # Get build config class or use default
         build_config_class = import_string(self.config["build-config-class"]) if "build-config-class" in self.config else HatchCppBuildConfig
 
         # Instantiate build config
-        config = build_config_class(name=project_name, **self.config)
+        with tracer.span("validate config"):
+            config = build_config_class(name=project_name, **self.config)
 
         # Get build plan class or use default
         build_plan_class = import_string(self.config["build-plan-class"]) if "build-plan-class" in self.config else HatchCppBuildPlan
 
-        # Instantiate builder
-        build_plan = build_plan_class(**config.model_dump())
+        with tracer.span("generate plan"):
+            # Instantiate builder
+            build_plan = build_plan_class(**config.model_dump())
 
-        # Parse override args
-        parse_extra_args_model(build_plan)
+            # Parse override args
+            parse_extra_args_model(build_plan)
 
-        # Generate commands
-        build_plan.generate()
+            # Generate commands
+            build_plan.generate()
 
         # Log commands if in verbose mode
         if build_plan.verbose:
@@ -78,44 +97,71 @@ class HatchCppBuildHook(BuildHookInterface[HatchCppBuildConfig]):
             self._logger.warning("Skipping build")
             return
 
+        try:
+            self._build(build_plan, build_data, tracer)
+        finally:
+            if build_plan.trace_file:
+                tracer.write(build_plan.trace_file)
+                self._logger.warning(f"Wrote build trace: {build_plan.trace_file}")
+
+    def _build(self, build_plan: HatchCppBuildPlan, build_data: dict[str, Any], tracer: HatchCppTracer) -> None:
         # Execute build plan
-        build_plan.execute()
+        try:
+            with tracer.span("execute"):
+                build_plan.execute()
+        finally:
+            tracer.add_results(build_plan.results)
 
         # Perform any cleanup actions
         build_plan.cleanup()
 
+        build_data["pure_python"] = False
+        machine = platform_machine()
+        version_major = version_info.major
+        version_minor = version_info.minor
         if build_plan.libraries:
+            abi3 = all(lib.py_limited_api for lib in build_plan.libraries)
+            with tracer.span("tag wheel"):
+                if build_plan.interpreters and not abi3:
+                    build_data["tag"] = _interpreters_wheel_tag(build_plan.platform.platform, machine, build_plan.get_interpreters())
+                else:
+                    build_data["tag"] = _wheel_tag(build_plan.platform.platform, machine, version_major, version_minor, abi3)
+
             # force include libraries
-            for library in build_plan.libraries:
-                name = library.get_qualified_name(build_plan.platform.platform)
-                build_data["force_include"][name] = name
-
-            build_data["pure_python"] = False
-            machine = platform_machine()
-            version_major = version_info.major
-            version_minor = version_info.minor
-            build_data["tag"] = _wheel_tag(
-                build_plan.platform.platform,
-                machine,
-                version_major,
-                version_minor,
-                all(lib.py_limited_api for lib in build_plan.libraries),
-            )
+            with tracer.span("discover force-include"):
+                for library in build_plan.libraries:
+                    for interpreter in build_plan.get_interpreters(library):
+                        name = build_plan.get_qualified_name(library, interpreter)
+                        build_data["force_include"][name] = name
+                for path in build_plan.runtime_files:
+                    build_data["force_include"][str(path)] = str(path)
         else:
-            build_data["pure_python"] = False
-            machine = platform_machine()
-            version_major = version_info.major
-            version_minor = version_info.minor
-            build_data["tag"] = _wheel_tag(build_plan.platform.platform, machine, version_major, version_minor, False)
+            with tracer.span("tag wheel"):
+                build_data["tag"] = _wheel_tag(build_plan.platform.platform, machine, version_major, version_minor, False)
 
             # force include libraries
-            for path in Path(".").rglob("*"):
-                if path.is_dir():
-                    continue
-                if str(path).startswith(str(build_plan.cmake.build)) or str(path).startswith("dist"):
-                    continue
-                if path.suffix in (".pyd", ".dll", ".so", ".dylib"):
-                    build_data["force_include"][str(path)] = str(path)
+            with tracer.span("discover force-include"):
+                artifacts = build_plan.cmake.get_artifacts(build_plan.build_type)
+                if artifacts is not None:
+                    build_data["force_include"].update(artifacts)
+                else:
+                    self._discover_libraries(build_plan, build_data)
 
         for path in build_data["force_include"]:
             self._logger.info(f"Force include: {path}")
+
+    def _discover_libraries(self, build_plan: HatchCppBuildPlan, build_data: dict[str, Any]) -> None:
+        """Find built libraries by scanning the package directories, for CMake builds without a File API reply."""
+        roots = [Path(path) for path in build_plan.cmake.artifact_dirs or self.build_config.packages] or [Path(".")]
+        prune = [build_plan.cmake.build]
+        if build_plan.vcpkg:
+            prune.append(build_plan.vcpkg.get_vcpkg_root())
+        libraries, visited = find_files(roots, (".pyd", ".dll", ".so", ".dylib"), prune)
+        self._logger.warning(
+            "No CMake File API reply in %s; scanned %d entries under %s for libraries.",
+            build_plan.cmake.build,
+            visited,
+            ", ".join(str(root) for root in roots),
+        )
+        for path in libraries:
+            build_data["force_include"][str(path)] = str(path)
@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+from collections.abc import Callable
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+
+from .steps import HatchCppBuildStep
+
+__all__ = ("run_steps",)
+
+
+def _check_graph(steps: list[HatchCppBuildStep]) -> None:
+    names = [step.name for step in steps]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Build step names must be unique: {names}")
+    for step in steps:
+        for dependency in step.depends:
+            if dependency not in names:
+                raise ValueError(f"Build step {step.name} depends on unknown step {dependency}")
+
+
+def run_steps(
+    steps: list[HatchCppBuildStep],
+    run: Callable[[HatchCppBuildStep], int],
+    jobs: int,
+    cancel: Callable[[], None] | None = None,
+) -> None:
+    """Run a DAG of build steps, starting each as soon as its dependencies have succeeded.
+
+    Up to ``jobs`` steps run at once, in plan order among those that are ready. The first
+    failing step stops the build: steps that have not started are cancelled, ``cancel`` is
+    called so that running siblings can be interrupted, and its error is raised once the
+    running steps have returned.
+    """
+    _check_graph(steps)
+    waiting_on = {step.name: set(step.depends) for step in steps}
+    dependents: dict[str, list[str]] = {step.name: [] for step in steps}
+    for step in steps:
+        for dependency in step.depends:
+            dependents[dependency].append(step.name)
+
+    pending = list(steps)
+    running: dict[Future, HatchCppBuildStep] = {}
+    failure: BaseException | None = None
+    cancelled = False
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+
+        def submit_ready():
+            for step in [step for step in pending if not waiting_on[step.name]]:
+                pending.remove(step)
+                running[pool.submit(run, step)] = step
+
+        submit_ready()
+        while running:
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                step = running.pop(future)
+                if future.cancelled():
+                    continue
+                error = future.exception()
+                if error is not None:
+                    failure = failure or error
+                    continue
+                ret = future.result()
+                if ret != 0:
+                    failure = failure or RuntimeError(f"hatch-cpp build command failed with exit code {ret}: {step.command}")
+                    continue
+                for dependent in dependents[step.name]:
+                    waiting_on[dependent].discard(step.name)
+            if failure is not None:
+                if not cancelled:
+                    cancelled = True
+                    for future in running:
+                        future.cancel()
+                    if cancel is not None:
+                        cancel()
+                pending.clear()
+                continue
+            submit_ready()
+
+    if failure is not None:
+        raise failure
+    if pending:
+        raise ValueError(f"Build steps have cyclic dependencies: {[step.name for step in pending]}")
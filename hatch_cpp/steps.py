@@ -0,0 +1,28 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Literal
+
+from pydantic import BaseModel, Field
+
+__all__ = (
+    "HatchCppBuildStep",
+    "StepKind",
+)
+
+StepKind = Literal["vcpkg", "cmake-configure", "cmake-build", "cmake-install", "pch", "compile", "link", "copy", "pgo-train", "pgo-merge"]
+
+
+class HatchCppBuildStep(BaseModel):
+    """A single command of a build plan, with the steps it depends on and the files it reads and writes."""
+
+    name: str
+    kind: StepKind
+    command: str
+    depends: list[str] = Field(default_factory=list, description="Names of steps that must finish before this one starts.")
+    compiler: str | None = Field(default=None, description="Compiler invoked by the command, used to identify the toolchain for up-to-date checks.")
+    inputs: list[Path] = Field(default_factory=list, description="Files the command reads, used for up-to-date checks.")
+    outputs: list[Path] = Field(default_factory=list, description="Files the command writes, used for up-to-date checks.")
+    depfile: Path | None = Field(default=None, description="Makefile-style dependency file written by the compiler (-MMD).")
+    env: dict[str, str] = Field(default_factory=dict, description="Environment variables set for the command on top of the build's environment.")
+    preprocess: str | None = Field(default=None, description="Command printing the preprocessed source, used to key the compile cache.")
@@ -0,0 +1,40 @@
+import pytest
+
+from hatch_cpp import HatchCppBuildPlan, HatchCppLibrary, HatchCppPgo, HatchCppPlatform
+
+_COMPILERS = {"gcc": ("gcc", "g++"), "clang": ("clang", "clang++"), "msvc": ("cl", "cl")}
+
+
+def _platform(toolchain="gcc", platform=None):
+    compiler = _COMPILERS[toolchain]
+    return HatchCppPlatform(
+        cc=compiler[0],
+        cxx=compiler[1],
+        ld="ld",
+        platform=platform or ("win32" if toolchain == "msvc" else "linux"),
+        toolchain=toolchain,
+        disable_ccache=True,
+    )
+
+
+@pytest.fixture
+def make_platform():
+    """Return a factory for a toolchain's platform, on windows for msvc and linux otherwise."""
+    return _platform
+
+
+@pytest.fixture
+def make_plan():
+    """Return a factory for a plan building ``libraries``, or else a project/extension library with ``library_args``."""
+
+    def make_plan(*libraries, toolchain="gcc", pgo: HatchCppPgo | None = None, interpreters=(), **library_args):
+        return HatchCppBuildPlan(
+            name="project",
+            libraries=list(libraries) or [HatchCppLibrary(name="project/extension", **library_args)],
+            platform=_platform(toolchain),
+            pgo=pgo or HatchCppPgo(),
+            interpreters=list(interpreters),
+            vcpkg=None,
+        )
+
+    return make_plan
@@ -0,0 +1,83 @@
+from os import utime
+from pathlib import Path
+from shutil import copyfile, rmtree
+
+from hatch_cpp import HatchCppBuildPlan, HatchCppLibrary, HatchCppPlatform, cache
+from hatch_cpp.cache import HatchCppCompileCache, normalize_compile_command
+from hatch_cpp.steps import HatchCppBuildStep
+
+
+class TestCompileCache:
+    def test_normalize_compile_command(self):
+        step = HatchCppBuildStep(
+            name="compile:a.o",
+            kind="compile",
+            command="ccache g++ -c src/a.cpp -Iinclude -DFOO=1 -UBAR -fPIC -O2 -std=c++17 -MMD -MF build/a.d -o build/a.o",
+            compiler="ccache g++",
+            inputs=[Path("src/a.cpp")],
+        )
+        assert normalize_compile_command(step) == ["-fPIC", "-O2", "-std=c++17"]
+
+    def test_max_size_accepts_suffixes(self):
+        assert HatchCppCompileCache(max_size="2M").max_size == 2 * 1024 * 1024
+
+    def test_evicts_least_recently_used(self, tmp_path):
+        compile_cache = HatchCppCompileCache(directory=tmp_path, max_size=250)
+        for index, name in enumerate(("aa01", "bb02", "cc03")):
+            obj = tmp_path / name[:2] / f"{name}.o"
+            obj.parent.mkdir()
+            obj.write_bytes(b"x" * 100)
+            utime(obj, (1000 + index, 1000 + index))
+
+        assert compile_cache.evict() == 100
+        assert not (tmp_path / "aa" / "aa01.o").exists()
+        assert (tmp_path / "bb" / "bb02.o").exists()
+        assert (tmp_path / "cc" / "cc03.o").exists()
+
+    def test_rebuild_restores_objects(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "a.h").write_text("int value();\n")
+        (tmp_path / "a.c").write_text('#include "a.h"\nint value() { return 1; }\n')
+
+        def build():
+            build_plan = HatchCppBuildPlan(
+                name="project",
+                libraries=[HatchCppLibrary(name="lib", sources=["a.c"], language="c", binding="generic")],
+                platform=HatchCppPlatform(cc="gcc", cxx="g++", ld="ld", platform="linux", toolchain="gcc", disable_ccache=True),
+                vcpkg=None,
+                compile_cache={"enabled": True, "directory": str(tmp_path / "cache")},
+            )
+            build_plan.generate()
+            build_plan.execute()
+            return build_plan
+
+        first = build()
+        assert (first.compile_cache.hits, first.compile_cache.misses) == (0, 1)
+
+        rmtree(tmp_path / "build")
+        second = build()
+        assert (second.compile_cache.hits, second.compile_cache.misses) == (1, 0)
+        assert [result.cached for result in second.results if result.kind == "compile"] == [True]
+        assert Path("build/hatch-cpp/0-0-a.o").exists()
+
+        # The restored depfile keeps incremental rebuilds working
+        third = build()
+        assert all(result.skipped for result in third.results)
+
+        # Changing the header changes the preprocessed source and misses
+        (tmp_path / "a.h").write_text("int value();\nint other();\n")
+        fourth = build()
+        assert (fourth.compile_cache.hits, fourth.compile_cache.misses) == (0, 1)
+
+        # An entry evicted by another build between the lookup and the copy is a miss
+        rmtree(tmp_path / "build")
+
+        def evicted(source, destination):
+            if Path(source).is_relative_to(tmp_path / "cache"):
+                Path(source).unlink()
+            return copyfile(source, destination)
+
+        monkeypatch.setattr(cache, "copyfile", evicted)
+        fifth = build()
+        assert (fifth.compile_cache.hits, fifth.compile_cache.misses) == (0, 1)
+        assert Path("build/hatch-cpp/0-0-a.o").exists()
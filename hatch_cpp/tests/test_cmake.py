@@ -0,0 +1,106 @@
+from pathlib import Path
+from shutil import which
+
+import pytest
+
+from hatch_cpp import HatchCppBuildPlan, HatchCppCmakeConfiguration, HatchCppPlatform
+
+CMAKELISTS = """
+cmake_minimum_required(VERSION 3.20)
+project(p C)
+add_library(extension MODULE extension.c)
+add_library(helper STATIC extension.c)
+add_library(unused SHARED extension.c)
+install(TARGETS extension helper LIBRARY DESTINATION project ARCHIVE DESTINATION lib)
+install(FILES vendored/libdep.so DESTINATION project)
+"""
+
+
+@pytest.mark.skipif(not which("cmake"), reason="cmake not available")
+class TestFileApi:
+    def test_artifacts(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "CMakeLists.txt").write_text(CMAKELISTS)
+        (tmp_path / "extension.c").write_text("int extension(void) { return 0; }\n")
+        (tmp_path / "vendored").mkdir()
+        (tmp_path / "vendored" / "libdep.so").write_text("")
+        # Stale artifacts elsewhere in the tree are not picked up
+        (tmp_path / "old").mkdir()
+        (tmp_path / "old" / "extension.so").write_text("")
+
+        cmake = HatchCppCmakeConfiguration(root="CMakeLists.txt")
+        assert cmake.get_artifacts("release") is None
+
+        platform = HatchCppPlatform(cc="gcc", cxx="g++", ld="ld", platform="linux", toolchain="gcc", disable_ccache=True)
+        build_plan = HatchCppBuildPlan(name="project", cmake=cmake, platform=platform, vcpkg=None)
+        build_plan.generate()
+        build_plan.execute()
+
+        artifacts = cmake.get_artifacts("release")
+        assert artifacts == {"project/libextension.so": "project/libextension.so", "project/libdep.so": "project/libdep.so"}
+
+    def test_artifacts_outside_project(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "src").mkdir()
+        (tmp_path / "src" / "CMakeLists.txt").write_text(CMAKELISTS.replace("install(FILES vendored/libdep.so DESTINATION project)", ""))
+        (tmp_path / "src" / "extension.c").write_text("int extension(void) { return 0; }\n")
+
+        install = tmp_path.parent / f"{tmp_path.name}-install"
+        cmake = HatchCppCmakeConfiguration(root="src/CMakeLists.txt", install=install)
+        platform = HatchCppPlatform(cc="gcc", cxx="g++", ld="ld", platform="linux", toolchain="gcc", disable_ccache=True)
+        build_plan = HatchCppBuildPlan(name="project", cmake=cmake, platform=platform, vcpkg=None)
+        build_plan.generate()
+        build_plan.execute()
+
+        # Files installed outside the project keep their absolute path, and land in the wheel relative to the prefix
+        assert cmake.get_artifacts("release") == {str(install.resolve() / "project" / "libextension.so"): "project/libextension.so"}
+        assert Path(next(iter(cmake.get_artifacts("release")))).is_file()
+
+    def test_artifacts_in_subdirectory(self, tmp_path, monkeypatch, caplog):
+        monkeypatch.chdir(tmp_path)
+        outside = tmp_path.parent / f"{tmp_path.name}-outside"
+        (tmp_path / "src" / "vendored").mkdir(parents=True)
+        (tmp_path / "src" / "vendored" / "libdep.so").write_text("")
+        (tmp_path / "src" / "CMakeLists.txt").write_text(CMAKELISTS.replace("DESTINATION project)", f"DESTINATION {outside.as_posix()})"))
+        (tmp_path / "src" / "extension.c").write_text("int extension(void) { return 0; }\n")
+
+        cmake = HatchCppCmakeConfiguration(root="src/CMakeLists.txt")
+        platform = HatchCppPlatform(cc="gcc", cxx="g++", ld="ld", platform="linux", toolchain="gcc", disable_ccache=True)
+        build_plan = HatchCppBuildPlan(name="project", cmake=cmake, platform=platform, vcpkg=None)
+        build_plan.generate()
+        build_plan.execute()
+
+        # Files installed into the project keep their path relative to it, as when the project is scanned for libraries
+        assert cmake.get_artifacts("release") == {"src/project/libextension.so": "src/project/libextension.so"}
+        # Files installed to an absolute path outside the project are reported rather than silently dropped
+        assert "libdep.so" in caplog.text
+
+
+class TestConfigureInputs:
+    def test_project_scripts_only(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        for path in (
+            "CMakeLists.txt",
+            "CMakePresets.json",
+            "cmake/flags.cmake",
+            "src/CMakeLists.txt",
+            "build/generated.cmake",
+            "out/CMakeCache.txt",
+            "out/CMakeFiles/compiler.cmake",
+            ".venv/pyvenv.cfg",
+            ".venv/lib/CMakeLists.txt",
+            ".git/hooks.cmake",
+        ):
+            (tmp_path / path).parent.mkdir(parents=True, exist_ok=True)
+            (tmp_path / path).write_text("")
+
+        cmake = HatchCppCmakeConfiguration(root="CMakeLists.txt")
+        platform = HatchCppPlatform(cc="gcc", cxx="g++", ld="ld", platform="linux", toolchain="gcc", disable_ccache=True)
+        build_plan = HatchCppBuildPlan(name="project", cmake=cmake, platform=platform, vcpkg=None)
+        # Build trees, virtual environments and version control directories are skipped
+        assert cmake.get_configure_inputs(build_plan) == [
+            Path("CMakeLists.txt"),
+            Path("CMakePresets.json"),
+            Path("cmake/flags.cmake"),
+            Path("src/CMakeLists.txt"),
+        ]
@@ -0,0 +1,52 @@
+from sys import executable, platform
+from threading import Thread
+from time import sleep
+
+import pytest
+
+from hatch_cpp.executor import HatchCppExecutor
+from hatch_cpp.steps import HatchCppBuildStep
+
+
+def _step(command):
+    return HatchCppBuildStep(name="step", kind="compile", command=command)
+
+
+@pytest.mark.skipif(platform == "win32", reason="POSIX argv splitting")
+class TestExecutor:
+    def test_captures_output_and_usage(self):
+        result = HatchCppExecutor().run(_step(f"{executable} -c \"import sys; print('out'); print('err', file=sys.stderr)\""))
+
+        assert result.returncode == 0
+        assert result.stdout.strip() == "out"
+        assert result.stderr.strip() == "err"
+        assert result.wall_time > 0
+        assert result.cpu_time is not None and result.cpu_time > 0
+        assert result.max_rss is not None and result.max_rss > 1024 * 1024
+
+    def test_runs_without_shell(self):
+        result = HatchCppExecutor().run(_step(r"echo \$ORIGIN '$HOME' && true"))
+        assert result.stdout.strip() == "$ORIGIN $HOME && true"
+
+    def test_returncode(self):
+        result = HatchCppExecutor().run(_step(f"{executable} -c 'raise SystemExit(3)'"))
+        assert result.returncode == 3
+
+    def test_missing_executable(self):
+        with pytest.raises(RuntimeError, match="could not run"):
+            HatchCppExecutor().run(_step("hatch-cpp-no-such-compiler -c a.cpp"))
+
+    def test_cancel_terminates_running(self):
+        executor = HatchCppExecutor()
+        results = []
+        thread = Thread(target=lambda: results.append(executor.run(_step(f"{executable} -c 'import time; time.sleep(30)'"))))
+        thread.start()
+        while not executor._running:
+            sleep(0.01)
+        executor.cancel()
+        thread.join(timeout=10)
+
+        assert results[0].returncode != 0
+        assert results[0].wall_time < 30
+        with pytest.raises(RuntimeError, match="cancelled"):
+            executor.run(_step("true"))
@@ -1,6 +1,7 @@
-from os import listdir
+import contextlib
+from json import loads
+from os import listdir, remove
 from pathlib import Path
-from shutil import rmtree
 from subprocess import check_call
 from sys import modules, path, platform
 
@@ -9,8 +10,10 @@ class TestHatchBuild:
     def test_hatch_build(self):
         project = "test_project_hatch_build"
 
-        rmtree(f"hatch_cpp/tests/{project}/project/extension.so", ignore_errors=True)
-        rmtree(f"hatch_cpp/tests/{project}/project/extension.pyd", ignore_errors=True)
+        with contextlib.suppress(FileNotFoundError):
+            remove(f"hatch_cpp/tests/{project}/project/extension.so")
+        with contextlib.suppress(FileNotFoundError):
+            remove(f"hatch_cpp/tests/{project}/project/extension.pyd")
         modules.pop("project", None)
         modules.pop("project.extension", None)
 
@@ -44,3 +47,24 @@ class TestHatchBuild:
         import project.extension
 
         assert project.extension.hello() == "A string"
+
+    def test_hatch_build_trace_file(self):
+        project = "test_project_basic"
+        trace_file = Path(f"hatch_cpp/tests/{project}/build/trace.json")
+        trace_file.unlink(missing_ok=True)
+
+        check_call(
+            [
+                "hatch-build",
+                "--hooks-only",
+                "--",
+                "--trace-file=build/trace.json",
+            ],
+            cwd=f"hatch_cpp/tests/{project}",
+        )
+
+        trace = loads(trace_file.read_text())
+        names = [event["name"] for event in trace["traceEvents"] if event["ph"] == "X"]
+        assert {"validate config", "generate plan", "execute", "tag wheel", "discover force-include"} <= set(names)
+        assert any(name.startswith("compile:") for name in names)
+        assert any(name.startswith("link:") for name in names)
@@ -0,0 +1,190 @@
+from os import utime
+from pathlib import Path
+from shutil import rmtree, which
+
+import pytest
+
+from hatch_cpp import HatchCppBuildPlan, HatchCppCmakeConfiguration, HatchCppLibrary, HatchCppPlatform, incremental
+from hatch_cpp.executor import HatchCppExecutor
+from hatch_cpp.incremental import HatchCppFingerprints, parse_depfile
+from hatch_cpp.steps import HatchCppBuildStep
+
+
+class TestParseDepfile:
+    def test_parse_continuations_and_escapes(self, tmp_path):
+        depfile = tmp_path / "a.d"
+        depfile.write_text("build/a.o: src/a.cpp include/a.hpp \\\n include/with\\ space.hpp \\\n /usr/include/stdio.h\n")
+        assert parse_depfile(depfile) == [
+            Path("src/a.cpp"),
+            Path("include/a.hpp"),
+            Path("include/with space.hpp"),
+            Path("/usr/include/stdio.h"),
+        ]
+
+    def test_parse_windows_drive_letters(self, tmp_path):
+        depfile = tmp_path / "a.d"
+        depfile.write_text("C:/build/a.o: C:/src/a.cpp\n")
+        assert parse_depfile(depfile) == [Path("C:/src/a.cpp")]
+
+
+class TestFingerprints:
+    def _step(self, tmp_path, command="cc -c a.c -o a.o"):
+        return HatchCppBuildStep(
+            name="compile:a.o",
+            kind="compile",
+            command=command,
+            inputs=[tmp_path / "a.c"],
+            outputs=[tmp_path / "a.o"],
+            depfile=tmp_path / "a.d",
+        )
+
+    def test_up_to_date_after_record(self, tmp_path):
+        (tmp_path / "a.c").write_text('#include "a.h"\n')
+        (tmp_path / "a.h").write_text("int x;\n")
+        (tmp_path / "a.o").write_text("")
+        (tmp_path / "a.d").write_text(f"a.o: {tmp_path / 'a.c'} {tmp_path / 'a.h'}\n")
+        fingerprints = HatchCppFingerprints(path=tmp_path / "fingerprints.json")
+        step = self._step(tmp_path)
+
+        assert not fingerprints.is_up_to_date(step)
+        fingerprints.record(step)
+        assert fingerprints.is_up_to_date(step)
+
+        # Survives a round trip to disk
+        fingerprints.save()
+        assert HatchCppFingerprints.load(tmp_path / "fingerprints.json").is_up_to_date(step)
+
+        # Changed flags invalidate
+        assert not fingerprints.is_up_to_date(self._step(tmp_path, command="cc -O2 -c a.c -o a.o"))
+
+        # Changed header content invalidates
+        (tmp_path / "a.h").write_text("int y;\n")
+        assert not fingerprints.is_up_to_date(step)
+
+    def test_touched_input_refreshes_mtime(self, tmp_path, monkeypatch):
+        (tmp_path / "a.c").write_text('#include "a.h"\n')
+        (tmp_path / "a.h").write_text("int x;\n")
+        (tmp_path / "a.o").write_text("")
+        (tmp_path / "a.d").write_text(f"a.o: {tmp_path / 'a.c'} {tmp_path / 'a.h'}\n")
+        fingerprints = HatchCppFingerprints(path=tmp_path / "fingerprints.json")
+        step = self._step(tmp_path)
+        fingerprints.record(step)
+
+        utime(tmp_path / "a.h", ns=(0, 0))
+        assert fingerprints.is_up_to_date(step)
+        fingerprints.save()
+
+        # The new mtime is stored, so the header is not hashed again
+        def fail(path):
+            raise AssertionError(f"hashed {path}")
+
+        monkeypatch.setattr(incremental, "hash_file", fail)
+        assert HatchCppFingerprints.load(tmp_path / "fingerprints.json").is_up_to_date(step)
+
+    def test_missing_output_invalidates(self, tmp_path):
+        (tmp_path / "a.c").write_text("int x;\n")
+        (tmp_path / "a.o").write_text("")
+        fingerprints = HatchCppFingerprints(path=tmp_path / "fingerprints.json")
+        step = self._step(tmp_path)
+        fingerprints.record(step)
+        (tmp_path / "a.o").unlink()
+        assert not fingerprints.is_up_to_date(step)
+
+    def test_missing_input_is_not_recorded(self, tmp_path):
+        (tmp_path / "a.c").write_text("int x;\n")
+        (tmp_path / "a.o").write_text("")
+        (tmp_path / "a.d").write_text(f"a.o: {tmp_path / 'a.c'} {tmp_path / 'deleted.h'}\n")
+        fingerprints = HatchCppFingerprints(path=tmp_path / "fingerprints.json")
+        step = self._step(tmp_path)
+        fingerprints.record(step)
+        assert not fingerprints.is_up_to_date(step)
+
+    def test_untracked_steps_never_up_to_date(self, tmp_path):
+        fingerprints = HatchCppFingerprints(path=tmp_path / "fingerprints.json")
+        step = HatchCppBuildStep(name="cmake:build", kind="cmake-build", command="cmake --build build")
+        fingerprints.record(step)
+        assert not fingerprints.is_up_to_date(step)
+
+    def test_rebuild_skips_unchanged(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "a.h").write_text("int value();\n")
+        (tmp_path / "a.c").write_text('#include "a.h"\nint value() { return 1; }\n')
+        (tmp_path / "b.c").write_text('#include "a.h"\nint other() { return value(); }\n')
+        calls = []
+        original = HatchCppExecutor.run
+
+        def run(self, step):
+            calls.append(step.command)
+            return original(self, step)
+
+        monkeypatch.setattr(HatchCppExecutor, "run", run)
+
+        def build():
+            calls.clear()
+            build_plan = HatchCppBuildPlan(
+                name="project",
+                libraries=[HatchCppLibrary(name="lib", sources=["a.c", "b.c"], language="c", binding="generic")],
+                platform=HatchCppPlatform(cc="gcc", cxx="g++", ld="ld", platform="linux", toolchain="gcc", disable_ccache=True),
+                vcpkg=None,
+            )
+            build_plan.generate()
+            build_plan.execute()
+            return list(calls)
+
+        assert len(build()) == 3
+        assert build() == []
+
+        # Touching without changing content does not rebuild
+        (tmp_path / "a.c").write_text((tmp_path / "a.c").read_text())
+        assert build() == []
+
+        # Changing the shared header recompiles both objects; identical objects skip the link
+        (tmp_path / "a.h").write_text("int value();\nint unused();\n")
+        rebuilt = build()
+        assert len(rebuilt) == 2
+        assert all(" -c " in command for command in rebuilt)
+
+        # Changing one source recompiles it and relinks
+        (tmp_path / "b.c").write_text('#include "a.h"\nint other() { return value() + 1; }\n')
+        rebuilt = build()
+        assert len(rebuilt) == 2
+        assert " -c b.c " in rebuilt[0]
+        assert " -c " not in rebuilt[1]
+
+
+@pytest.mark.skipif(not which("cmake"), reason="cmake not available")
+class TestCmakeConfigure:
+    def _plan(self):
+        platform = HatchCppPlatform(cc="gcc", cxx="g++", ld="ld", platform="linux", toolchain="gcc", disable_ccache=True)
+        build_plan = HatchCppBuildPlan(name="project", cmake=HatchCppCmakeConfiguration(root="CMakeLists.txt"), platform=platform, vcpkg=None)
+        build_plan.generate()
+        return build_plan
+
+    def _ran(self, build_plan):
+        build_plan.execute()
+        return [result.kind for result in build_plan.results if not result.skipped]
+
+    def test_reconfigure_only_when_inputs_change(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        monkeypatch.delenv("CFLAGS", raising=False)
+        (tmp_path / "cmake").mkdir()
+        (tmp_path / "cmake" / "flags.cmake").write_text("set(FLAGS_SET ON)\n")
+        (tmp_path / "CMakeLists.txt").write_text(
+            "cmake_minimum_required(VERSION 3.20)\nproject(p C)\ninclude(cmake/flags.cmake)\nadd_library(p STATIC a.c)\ninstall(TARGETS p DESTINATION lib)\n"
+        )
+        (tmp_path / "a.c").write_text("int a(void) { return 0; }\n")
+
+        assert self._ran(self._plan()) == ["cmake-configure", "cmake-build", "cmake-install"]
+        assert self._ran(self._plan()) == ["cmake-build", "cmake-install"]
+
+        # Included CMake scripts and the environment are part of the fingerprint
+        (tmp_path / "cmake" / "flags.cmake").write_text("set(FLAGS_SET OFF)\n")
+        assert "cmake-configure" in self._ran(self._plan())
+        monkeypatch.setenv("CFLAGS", "-O1")
+        assert "cmake-configure" in self._ran(self._plan())
+        assert "cmake-configure" not in self._ran(self._plan())
+
+        # A wiped build directory is configured again
+        rmtree(tmp_path / "build" / "CMakeFiles")
+        (tmp_path / "build" / "CMakeCache.txt").unlink()
+        assert "cmake-configure" in self._ran(self._plan())
@@ -0,0 +1,132 @@
+from pathlib import Path
+from shutil import which
+from subprocess import DEVNULL, call, check_output
+from sys import executable, version_info
+
+import pytest
+
+from hatch_cpp import HatchCppLibrary, config, probe_interpreter
+from hatch_cpp.plugin import _interpreters_wheel_tag
+from hatch_cpp.toolchains.probe import _wheel_tags
+
+EXTENSION = """
+#include <Python.h>
+
+static PyObject* version(PyObject*, PyObject*) { return PyUnicode_FromString(PY_VERSION); }
+
+static PyMethodDef methods[] = {{"version", version, METH_NOARGS, ""}, {nullptr, nullptr, 0, nullptr}};
+static PyModuleDef module = {PyModuleDef_HEAD_INIT, "extension", "", -1, methods};
+PyMODINIT_FUNC PyInit_extension(void) { return PyModule_Create(&module); }
+"""
+
+
+def _other_interpreter() -> str | None:
+    """Find another working interpreter to build for, next to the one running the tests."""
+    for minor in range(10, 15):
+        path = which(f"python3.{minor}")
+        # pyenv shims exist for versions that are not selected
+        if minor != version_info.minor and path and call([path, "-c", ""], stdout=DEVNULL, stderr=DEVNULL) == 0:
+            return path
+    return None
+
+
+OTHER = _other_interpreter()
+
+
+class TestInterpreters:
+    def test_wheel_tags(self):
+        assert _wheel_tags("cpython", 3, 12, "cpython-312-x86_64-linux-gnu") == ("cp312", "cp312")
+        assert _wheel_tags("cpython", 3, 13, "cpython-313t-darwin") == ("cp313", "cp313t")
+        assert _wheel_tags("cpython", 3, 13, "cp313-win_amd64") == ("cp313", "cp313")
+        assert _wheel_tags("cpython", 3, 12, None) == ("cp312", "cp312")
+        assert _wheel_tags("pypy", 3, 10, "pypy310-pp73-x86_64-linux-gnu") == ("pp310", "pypy310_pp73")
+
+    def test_fat_wheel_tag(self):
+        interpreters = [
+            probe_interpreter().model_copy(update={"python_tag": "cp312", "abi_tag": "cp312"}),
+            probe_interpreter().model_copy(update={"python_tag": "pp310", "abi_tag": "pypy310_pp73"}),
+        ]
+        assert _interpreters_wheel_tag("linux", "x86_64", interpreters) == "cp312.pp310-cp312.pypy310_pp73-linux_x86_64"
+
+    @pytest.mark.parametrize("binding", ["pybind11", "nanobind"])
+    def test_binding_extensions_per_interpreter(self, make_plan, monkeypatch, binding):
+        probes = {
+            "": probe_interpreter(),
+            "python3.12": probe_interpreter().model_copy(update={"ext_suffix": ".cpython-312-x86_64-linux-gnu.so", "abi_tag": "cp312"}),
+            "python3.13": probe_interpreter().model_copy(update={"ext_suffix": ".cpython-313-x86_64-linux-gnu.so", "abi_tag": "cp313"}),
+        }
+        monkeypatch.setattr(config, "probe_interpreter", lambda interpreter="": probes[interpreter])
+        build_plan = make_plan(sources=["cpp/a.cpp"], binding=binding, interpreters=["python3.12", "python3.13"])
+        build_plan.generate()
+
+        links = [step for step in build_plan._steps if step.kind == "link"]
+        assert [step.name for step in links] == [
+            "link:project/extension.cpython-312-x86_64-linux-gnu.so",
+            "link:project/extension.cpython-313-x86_64-linux-gnu.so",
+        ]
+        for link, abi_tag in zip(links, ("cp312", "cp313")):
+            assert all(Path(step.split(":", 1)[1]).parent.name == abi_tag for step in link.depends)
+
+        # A build for the running interpreter keeps the plain name
+        build_plan = make_plan(sources=["cpp/a.cpp"], binding=binding)
+        build_plan.generate()
+        assert [step.name for step in build_plan._steps if step.kind == "link"] == ["link:project/extension.so"]
+
+    def test_interpreter_independent_sources(self, make_plan, monkeypatch):
+        probes = {
+            "": probe_interpreter(),
+            "python3.12": probe_interpreter().model_copy(update={"ext_suffix": ".cpython-312-x86_64-linux-gnu.so", "abi_tag": "cp312"}),
+            "python3.13": probe_interpreter().model_copy(update={"ext_suffix": ".cpython-313-x86_64-linux-gnu.so", "abi_tag": "cp313"}),
+        }
+        monkeypatch.setattr(config, "probe_interpreter", lambda interpreter="": probes[interpreter])
+        build_plan = make_plan(
+            sources=["cpp/a.cpp", "cpp/b.cpp"],
+            binding="pybind11",
+            interpreter_independent_sources=["cpp/b.cpp"],
+            unity_build=True,
+            interpreters=["python3.12", "python3.13"],
+        )
+        build_plan.generate()
+
+        compiles = [step.outputs[0] for step in build_plan._steps if step.kind == "compile"]
+        assert compiles == [Path("build/hatch-cpp/cp312/0-0-a.o"), Path("build/hatch-cpp/0-1-b.o"), Path("build/hatch-cpp/cp313/0-0-a.o")]
+        for link in (step for step in build_plan._steps if step.kind == "link"):
+            assert "compile:build/hatch-cpp/0-1-b.o" in link.depends
+            assert Path("build/hatch-cpp/0-1-b.o") in link.inputs
+
+    def test_missing_interpreter(self):
+        with pytest.raises(ValueError):
+            probe_interpreter("hatch-cpp-no-such-python")
+
+    @pytest.mark.skipif(not which("gcc") or OTHER is None, reason="gcc and a second Python interpreter are required")
+    def test_build_for_several_interpreters(self, make_plan, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "project").mkdir()
+        (tmp_path / "project" / "__init__.py").touch()
+        (tmp_path / "extension.cpp").write_text(EXTENSION)
+        (tmp_path / "helper.cpp").write_text("int helper() { return 1; }\n")
+        build_plan = make_plan(
+            HatchCppLibrary(name="project/extension", sources=["extension.cpp"]),
+            HatchCppLibrary(name="project/helper", sources=["helper.cpp"], binding="generic"),
+            interpreters=[executable, OTHER, OTHER],
+        )
+        build_plan.generate()
+
+        interpreters = build_plan.get_interpreters()
+        assert [interpreter.ext_suffix for interpreter in interpreters] == [probe_interpreter().ext_suffix, probe_interpreter(OTHER).ext_suffix]
+        # The generic library does not depend on the interpreter and is built once
+        assert len(build_plan.get_interpreters(build_plan.libraries[1])) == 1
+        assert sorted(step.name for step in build_plan._steps if step.kind == "link") == sorted(
+            [
+                f"link:project/extension{interpreters[0].ext_suffix}",
+                f"link:project/extension{interpreters[1].ext_suffix}",
+                "link:project/helper.so",
+            ]
+        )
+        build_plan.execute()
+
+        for interpreter, python in zip(interpreters, (executable, OTHER)):
+            assert (tmp_path / f"project/extension{interpreter.ext_suffix}").exists()
+            output = check_output([python, "-c", "import platform, project.extension as e; print(e.version() == platform.python_version())"])
+            assert output.strip() == b"True"
+        assert (tmp_path / "build" / "hatch-cpp" / interpreters[1].abi_tag).is_dir()
@@ -0,0 +1,148 @@
+from importlib.util import module_from_spec, spec_from_file_location
+from pathlib import Path
+
+import pytest
+
+from hatch_cpp import HatchCppLibrary
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("HATCH_CPP_CACHE_DIR", str(tmp_path / "cache"))
+    return tmp_path / "cache"
+
+
+class TestNanobindRuntime:
+    def test_compile_flags_do_not_mutate_sources(self, make_platform):
+        library = HatchCppLibrary(name="project/extension", sources=["cpp/a.cpp"], binding="nanobind")
+        platform = make_platform()
+        assert platform.get_compile_flags(library) == platform.get_compile_flags(library)
+        assert library.sources == ["cpp/a.cpp"]
+
+    def test_embedded(self, make_plan):
+        build_plan = make_plan(HatchCppLibrary(name="project/extension", sources=["cpp/a.cpp", "cpp/b.cpp"], binding="nanobind", unity_build=True))
+        build_plan.generate()
+
+        compile_ab, compile_nb, link = build_plan._steps
+        assert compile_ab.outputs == [Path("build/hatch-cpp/0-0-unity.o")]
+        # The runtime is kept out of unity batches
+        assert "nb_combined.cpp" not in build_plan._generated_files[Path("build/hatch-cpp/0-unity-0.cpp")]
+        assert compile_nb.command.startswith("g++ -c ")
+        assert "src/nb_combined.cpp" in compile_nb.command
+        assert compile_nb.outputs == [Path("build/hatch-cpp/0-nanobind.o")]
+        assert link.depends == [compile_ab.name, compile_nb.name]
+        assert "build/hatch-cpp/0-0-unity.o build/hatch-cpp/0-nanobind.o" in link.command
+        assert build_plan.runtime_files == []
+
+    def test_static_runtime_is_shared_between_libraries(self, make_plan, cache_dir):
+        build_plan = make_plan(
+            HatchCppLibrary(name="project/one", sources=["cpp/a.cpp"], binding="nanobind", nanobind_runtime="static"),
+            HatchCppLibrary.model_validate({"name": "project/two", "sources": ["cpp/b.cpp"], "binding": "nanobind", "nanobind-runtime": "static"}),
+        )
+        build_plan.generate()
+
+        compile_nb, archive, compile_a, link_one, _, link_two = build_plan._steps
+        # The runtime is built in a staging directory and moved into the cache once complete
+        staged = archive.outputs[0]
+        runtime = staged.parent.parent / staged.name
+        assert compile_nb.outputs[0].parent == staged.parent
+        assert runtime.parent.parent == cache_dir / "nanobind"
+        assert archive.command.startswith(f"ar rcs {staged} ")
+        assert runtime.name.startswith("libnanobind-")
+        assert runtime.suffix == ".a"
+        for link in (link_one, link_two):
+            assert archive.name in link.depends
+            assert f" {runtime} " in link.command
+        assert "-DNB_SHARED" not in compile_a.command
+        assert build_plan.runtime_files == []
+
+    def test_runtime_key(self, make_plan, cache_dir):
+        def runtime(**library_args):
+            build_plan = make_plan(HatchCppLibrary(name="project/extension", sources=["cpp/a.cpp"], binding="nanobind", **library_args))
+            build_plan.generate()
+            return build_plan._steps[1].outputs[0]
+
+        assert runtime(nanobind_runtime="static") == runtime(nanobind_runtime="static", include_dirs=["cpp"])
+        assert runtime(nanobind_runtime="static") != runtime(nanobind_runtime="static", std="c++20")
+        assert runtime(nanobind_runtime="static") != runtime(nanobind_runtime="shared")
+
+    def test_emscripten_static_runtime(self, make_plan, cache_dir):
+        build_plan = make_plan(HatchCppLibrary(name="project/extension", sources=["cpp/a.cpp"], binding="nanobind", nanobind_runtime="static"))
+        build_plan.platform.platform = "emscripten"
+        build_plan.generate()
+        assert build_plan._steps[1].command.startswith("emar rcs ")
+
+    def test_publish_keeps_runtime_of_other_build(self, make_plan, cache_dir):
+        build_plan = make_plan(HatchCppLibrary(name="project/extension", sources=["cpp/a.cpp"], binding="nanobind", nanobind_runtime="static"))
+        build_plan.generate()
+        archive = build_plan._steps[1]
+        staged = archive.outputs[0]
+        runtime = staged.parent.parent / staged.name
+        staged.parent.mkdir(parents=True)
+        staged.write_text("ours")
+        runtime.write_text("theirs")
+
+        build_plan._publish_runtime(archive)
+        assert runtime.read_text() == "theirs"
+        assert not staged.parent.exists()
+
+        # Without a competing build, the staged runtime is moved into place
+        runtime.unlink()
+        staged.parent.mkdir()
+        staged.write_text("ours")
+        build_plan._publish_runtime(archive)
+        assert runtime.read_text() == "ours"
+
+    def test_shared_runtime(self, make_plan, cache_dir):
+        build_plan = make_plan(HatchCppLibrary(name="project/extension", sources=["cpp/a.cpp"], binding="nanobind", nanobind_runtime="shared"))
+        build_plan.generate()
+
+        compile_nb, link_nb, copy, compile_a, link = build_plan._steps
+        (runtime,) = copy.inputs
+        assert "-DNB_BUILD" in compile_nb.command
+        assert "-DNB_SHARED" in compile_nb.command
+        assert "-DNB_SHARED" in compile_a.command
+        assert f"-shared -Wl,-soname,{runtime.name} -o {link_nb.outputs[0]}" in link_nb.command
+        assert link_nb.outputs[0].name == runtime.name
+        assert copy.outputs == [Path("project") / runtime.name]
+        assert copy.depends == [link_nb.name]
+        assert build_plan.runtime_files == [Path("project") / runtime.name]
+        assert f" {runtime} -Wl,-rpath,\\$ORIGIN " in link.command
+
+    def test_msvc_shared_runtime(self, make_plan, cache_dir):
+        build_plan = make_plan(
+            HatchCppLibrary(name="project/extension", sources=["cpp/a.cpp"], binding="nanobind", nanobind_runtime="shared"), toolchain="msvc"
+        )
+        build_plan.generate()
+
+        _, link_nb, copy, _, link = build_plan._steps
+        (runtime,) = copy.inputs
+        assert runtime.suffix == ".dll"
+        assert f"/LD /Fe:{link_nb.outputs[0]} /link /DLL" in link_nb.command
+        # The import library is published along with the DLL
+        assert [destination for _, destination in build_plan._staged_runtimes[link_nb.name]] == [runtime.with_suffix(".lib"), runtime]
+        assert copy.command == f'cmd /c copy /y "{runtime}" "{Path("project") / runtime.name}"'
+        assert f" {runtime.with_suffix('.lib')} " in link.command
+
+    def test_build_shared_runtime(self, make_plan, tmp_path, monkeypatch, cache_dir):
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "project").mkdir()
+        (tmp_path / "a.cpp").write_text('#include <nanobind/nanobind.h>\nNB_MODULE(extension, m) { m.def("hello", []() { return 42; }); }\n')
+        library = HatchCppLibrary(name="project/extension", sources=["a.cpp"], binding="nanobind", nanobind_runtime="shared")
+        build_plan = make_plan(library)
+        build_plan.generate()
+        build_plan.execute()
+
+        (runtime,) = build_plan.runtime_files
+        assert runtime.exists()
+        assert not list((cache_dir / "nanobind").glob("*/*.tmp"))
+        path = tmp_path / library.get_qualified_name("linux")
+        spec = spec_from_file_location("extension", path)
+        module = module_from_spec(spec)
+        spec.loader.exec_module(module)
+        assert module.hello() == 42
+
+        # The cached runtime is reused by later builds
+        build_plan = make_plan(library)
+        build_plan.generate()
+        assert [step.kind for step in build_plan._steps] == ["copy", "compile", "link"]
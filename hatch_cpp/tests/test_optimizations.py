@@ -0,0 +1,79 @@
+import pytest
+from hatch_build import parse_extra_args_model
+from pydantic import ValidationError
+
+from hatch_cpp import HatchCppLibrary
+
+
+class TestBuildTypes:
+    @pytest.mark.parametrize(
+        "build_type,expected,unexpected",
+        [
+            ("debug", ["-O0", "-g"], ["-DNDEBUG"]),
+            ("release", ["-O3", "-DNDEBUG"], ["-g"]),
+            ("relwithdebinfo", ["-O2", "-g", "-DNDEBUG"], ["-O3"]),
+            ("minsizerel", ["-Os", "-DNDEBUG"], ["-g"]),
+        ],
+    )
+    def test_gcc(self, make_platform, build_type, expected, unexpected):
+        flags = make_platform().get_compile_flags(HatchCppLibrary(name="ext", sources=["a.cpp"]), build_type).split()
+        assert all(flag in flags for flag in expected)
+        assert not any(flag in flags for flag in unexpected)
+
+    def test_build_types_differ(self, make_platform):
+        platform = make_platform("clang")
+        library = HatchCppLibrary(name="ext", sources=["a.cpp"])
+        assert len({platform.get_compile_flags(library, build_type) for build_type in ("debug", "release", "relwithdebinfo", "minsizerel")}) == 4
+
+    def test_msvc(self, make_platform):
+        platform = make_platform("msvc")
+        library = HatchCppLibrary(name="ext", sources=["a.cpp"])
+        assert "/O2 /DNDEBUG" in platform.get_compile_flags(library, "release")
+        assert "/DEBUG" not in platform.get_link_flags(library, "release")
+        assert "/O2 /Zi /FS /DNDEBUG" in platform.get_compile_flags(library, "relwithdebinfo")
+        assert "/Od /Zi /FS" in platform.get_compile_flags(library, "debug")
+        assert "/link /DLL /DEBUG" in platform.get_link_flags(library, "relwithdebinfo")
+        assert "/O1" in platform.get_compile_flags(library, "minsizerel")
+
+    def test_build_plan_cli_override(self, make_plan, monkeypatch):
+        build_plan = make_plan(sources=["cpp/a.cpp"], binding="generic")
+        monkeypatch.setattr("hatch_build.cli._extras", ["--build-type", "debug", "--libraries.0.optimizations", "lto,native"])
+        parse_extra_args_model(build_plan)
+        build_plan.generate()
+
+        compile_step, link_step = build_plan._steps
+        assert " -O0 -g -flto=auto -march=native " in compile_step.command
+        assert " -flto=auto -O0" in link_step.command
+
+
+class TestOptimizations:
+    def test_gcc(self, make_platform):
+        platform = make_platform()
+        library = HatchCppLibrary(name="ext", sources=["a.cpp"], optimizations=["thin-lto", "no-semantic-interposition", "no-plt", "native"])
+        assert platform.get_optimization_flags(library) == (
+            ["-flto=auto", "-fno-semantic-interposition", "-fno-plt", "-march=native"],
+            ["-flto=auto"],
+        )
+        assert platform.get_link_flags(library).endswith(" -flto=auto -O3")
+
+    def test_clang(self, make_platform):
+        library = HatchCppLibrary(name="ext", sources=["a.cpp"], optimizations=["thin-lto", "no-plt"])
+        assert make_platform("clang").get_optimization_flags(library) == (["-flto=thin", "-fno-plt"], ["-flto=thin"])
+        # -fno-plt only applies to ELF
+        assert make_platform("clang", "darwin").get_optimization_flags(library) == (["-flto=thin"], ["-flto=thin"])
+
+        library.optimizations = ["lto", "native"]
+        assert make_platform("clang", "emscripten").get_optimization_flags(library) == (["-flto"], ["-flto"])
+
+    def test_msvc(self, make_platform):
+        platform = make_platform("msvc")
+        library = HatchCppLibrary(name="ext", sources=["a.cpp"], optimizations=["lto", "no-plt", "native"])
+        assert platform.get_optimization_flags(library) == (["/GL"], ["/LTCG"])
+        assert " /GL" in platform.get_compile_flags(library)
+        assert "/link /DLL /LTCG" in platform.get_link_flags(library)
+
+    def test_lto_and_thin_lto_exclusive(self):
+        with pytest.raises(ValidationError):
+            HatchCppLibrary(name="ext", sources=["a.cpp"], optimizations=["lto", "thin-lto"])
+        with pytest.raises(ValidationError):
+            HatchCppLibrary(name="ext", sources=["a.cpp"], optimizations=["fast"])
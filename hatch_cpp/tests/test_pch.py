@@ -0,0 +1,57 @@
+from pathlib import Path
+
+import pytest
+
+
+class TestPrecompiledHeaders:
+    def test_gcc_pch_step(self, make_plan):
+        build_plan = make_plan(
+            precompiled_headers=True, sources=["cpp/a.cpp", "cpp/b.cpp"], binding="pybind11", precompiled_header_includes=["pybind11/stl.h"]
+        )
+        build_plan.generate()
+
+        pch, compile_a, compile_b, link = build_plan._steps
+        assert pch.kind == "pch"
+        assert pch.command.startswith("g++ -x c++-header build/hatch-cpp/0-pch.hpp ")
+        assert pch.command.endswith(" -o build/hatch-cpp/0-pch.hpp.gch")
+        assert "-std=c++11" in pch.command
+        assert build_plan._generated_files[Path("build/hatch-cpp/0-pch.hpp")] == "#include <pybind11/pybind11.h>\n#include <pybind11/stl.h>\n"
+        for step in (compile_a, compile_b):
+            assert step.depends == [pch.name]
+            assert " -include build/hatch-cpp/0-pch.hpp " in step.command
+            assert Path("build/hatch-cpp/0-pch.hpp.gch") in step.inputs
+        assert link.depends == [compile_a.name, compile_b.name]
+
+    def test_clang_uses_include_pch(self, make_plan):
+        build_plan = make_plan(precompiled_headers=True, toolchain="clang", sources=["cpp/a.c"], language="c")
+        build_plan.generate()
+
+        pch, compile_a, _ = build_plan._steps
+        assert pch.command.startswith("clang -x c-header build/hatch-cpp/0-pch.h ")
+        assert pch.outputs == [Path("build/hatch-cpp/0-pch.h.pch")]
+        assert " -include-pch build/hatch-cpp/0-pch.h.pch " in compile_a.command
+        # The cache key is computed from the textual header, not the binary PCH
+        assert " -include build/hatch-cpp/0-pch.h" in compile_a.preprocess
+
+    @pytest.mark.parametrize("toolchain,binding", [("gcc", "generic"), ("msvc", "cpython")])
+    def test_generic_and_msvc_skip_pch(self, make_plan, toolchain, binding):
+        build_plan = make_plan(precompiled_headers=True, toolchain=toolchain, sources=["cpp/a.cpp"], binding=binding)
+        build_plan.generate()
+        assert [step.kind for step in build_plan._steps] == ["compile", "link"]
+
+    def test_build_with_pch(self, make_plan, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "project").mkdir()
+        (tmp_path / "a.cpp").write_text('PyObject* hello(PyObject*, PyObject*) { return PyUnicode_FromString("hi"); }\n')
+        build_plan = make_plan(precompiled_headers=True, sources=["a.cpp"], extra_compile_args=["-Winvalid-pch", "-Werror"])
+        build_plan.generate()
+        build_plan.execute()
+
+        assert Path("build/hatch-cpp/0-pch.hpp.gch").exists()
+        assert Path("build/hatch-cpp/0-0-a.o").exists()
+
+        # Changing the flags rebuilds the PCH along with the sources that use it; the object is identical so the link is skipped
+        build_plan = make_plan(precompiled_headers=True, sources=["a.cpp"], extra_compile_args=["-Winvalid-pch", "-Werror", "-DCHANGED"])
+        build_plan.generate()
+        build_plan.execute()
+        assert [result.kind for result in build_plan.results if not result.skipped] == ["pch", "compile"]
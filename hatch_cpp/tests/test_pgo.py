@@ -0,0 +1,103 @@
+from pathlib import Path
+from sys import executable
+
+import pytest
+
+from hatch_cpp import HatchCppBuildPlan, HatchCppPgo
+
+EXTENSION = """
+#include <Python.h>
+
+static PyObject* collatz(PyObject*, PyObject* arg) {
+    long n = PyLong_AsLong(arg), steps = 0;
+    while (n != 1) { n = n % 2 ? 3 * n + 1 : n / 2; steps++; }
+    return PyLong_FromLong(steps);
+}
+
+static PyMethodDef methods[] = {{"collatz", collatz, METH_O, ""}, {nullptr, nullptr, 0, nullptr}};
+static PyModuleDef module = {PyModuleDef_HEAD_INIT, "extension", "", -1, methods};
+PyMODINIT_FUNC PyInit_extension(void) { return PyModule_Create(&module); }
+"""
+
+
+class TestPgo:
+    def test_flags(self):
+        pgo = HatchCppPgo.model_validate({"enabled": True, "profile-dir": "build/pgo", "training-command": "bench.py"})
+        directory = Path("build/pgo").resolve()
+        assert pgo.get_generate_flags("gcc") == ([f"-fprofile-generate={directory}", "-fprofile-update=atomic"], [f"-fprofile-generate={directory}"])
+        assert pgo.get_use_flags("gcc")[0] == f"-fprofile-use={directory}"
+        assert pgo.get_generate_flags("clang")[1] == [f"-fprofile-instr-generate={directory / 'hatch-cpp-%p.profraw'}"]
+        assert pgo.get_use_flags("clang")[0] == f"-fprofile-instr-use={directory / 'hatch-cpp.profdata'}"
+
+    def test_training_step(self):
+        step = HatchCppPgo(training_command="bench/train.py --fast").get_training_step()
+        assert step.command == f"{executable} bench/train.py --fast"
+        assert step.env["PYTHONPATH"].startswith(str(Path.cwd()))
+        assert HatchCppPgo(training_command="pytest bench").get_training_step().command == "pytest bench"
+        with pytest.raises(ValueError):
+            HatchCppPgo().get_training_step()
+
+    def test_merge_step(self, tmp_path):
+        pgo = HatchCppPgo(profile_dir=str(tmp_path))
+        assert pgo.get_merge_step("gcc", "linux") is None
+        with pytest.raises(RuntimeError):
+            pgo.get_merge_step("clang", "linux")
+
+        (tmp_path / "hatch-cpp-1.profraw").touch()
+        (tmp_path / "hatch-cpp-2.profraw").touch()
+        step = pgo.get_merge_step("clang", "darwin")
+        assert step.command == (
+            f"xcrun llvm-profdata merge -output={tmp_path / 'hatch-cpp.profdata'} {tmp_path / 'hatch-cpp-1.profraw'} {tmp_path / 'hatch-cpp-2.profraw'}"
+        )
+
+    def test_record(self, tmp_path):
+        pgo = HatchCppPgo(profile_dir=str(tmp_path / "pgo"))
+        assert not pgo.is_trained("key")
+        pgo.reset()
+        pgo.record("key")
+        assert pgo.is_trained("key")
+        assert not pgo.is_trained("other")
+
+    def test_msvc_builds_without_pgo(self, make_plan, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        build_plan = make_plan(toolchain="msvc", sources=["a.cpp"], pgo=HatchCppPgo(enabled=True, training_command="train.py"))
+        build_plan.generate()
+        ran = []
+        monkeypatch.setattr(HatchCppBuildPlan, "_run_plan", lambda self: ran.append(self._pgo_phase))
+        build_plan.execute()
+        assert ran == [""]
+
+    def test_build_with_pgo(self, make_plan, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "project").mkdir()
+        (tmp_path / "project" / "__init__.py").touch()
+        (tmp_path / "steps.h").write_text("#define STEPS 1\n")
+        (tmp_path / "a.cpp").write_text('#include "steps.h"\n' + EXTENSION)
+        (tmp_path / "train.py").write_text("from project.extension import collatz\nfor n in range(1, 2000):\n    collatz(n)\n")
+        build_plan = make_plan(sources=["a.cpp"], pgo=HatchCppPgo(enabled=True, training_command="train.py"))
+        build_plan.generate()
+        build_plan.execute()
+
+        assert [result.kind for result in build_plan.results] == ["compile", "link", "pgo-train", "compile", "link"]
+        assert list(Path("build/hatch-cpp/pgo").glob("*.gcda"))
+        assert "-fprofile-use=" in build_plan._steps[0].command
+        assert "-fprofile-generate" not in build_plan._steps[1].command
+
+        # The stored profile is reused while the sources are unchanged
+        build_plan = make_plan(sources=["a.cpp"], pgo=HatchCppPgo(enabled=True, training_command="train.py"))
+        build_plan.generate()
+        build_plan.execute()
+        assert all(result.skipped for result in build_plan.results)
+
+        # A changed header invalidates the profile just like a changed source
+        (tmp_path / "steps.h").write_text("#define STEPS 2\n")
+        build_plan = make_plan(sources=["a.cpp"], pgo=HatchCppPgo(enabled=True, training_command="train.py"))
+        build_plan.generate()
+        build_plan.execute()
+        assert "pgo-train" in [result.kind for result in build_plan.results]
+
+        (tmp_path / "a.cpp").write_text('#include "steps.h"\n' + EXTENSION + "\n// changed\n")
+        build_plan = make_plan(sources=["a.cpp"], pgo=HatchCppPgo(enabled=True, training_command="train.py"))
+        build_plan.generate()
+        build_plan.execute()
+        assert "pgo-train" in [result.kind for result in build_plan.results]
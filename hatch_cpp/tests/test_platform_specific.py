@@ -407,6 +407,25 @@ class TestPlatformFlagsIntegration:
         assert "/D_WINDOWS" in flags
         assert "/W4" in flags
 
+    def test_msvc_link_args_only_in_link_flags(self):
+        """Test that MSVC link args and extra objects are passed to the link step, not to /c compiles."""
+        library = HatchCppLibrary(
+            name="test",
+            sources=["test.cpp"],
+            binding="generic",
+            extra_link_args_win32=["/NODEFAULTLIB:libcmt"],
+            extra_objects_win32=["helper.obj"],
+        )
+
+        platform = HatchCppPlatform(cc="cl", cxx="cl", ld="link", platform="win32", toolchain="msvc", disable_ccache=True)
+
+        compile_flags = platform.get_compile_flags(library)
+        assert "/NODEFAULTLIB:libcmt" not in compile_flags
+        assert "helper.obj" not in compile_flags
+        link_flags = platform.get_link_flags(library)
+        assert "/NODEFAULTLIB:libcmt" in link_flags
+        assert "helper.obj" in link_flags
+
 
 class TestPlatformFieldOrdering:
     """Test that platform-specific fields are appended after common fields."""
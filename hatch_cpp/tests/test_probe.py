@@ -0,0 +1,153 @@
+from json import loads
+from pathlib import Path
+from shutil import which
+
+import pytest
+
+from hatch_cpp import HatchCppLibrary, HatchCppPlatform
+from hatch_cpp.toolchains import common, probe
+
+_PROBES = (probe.linker_works, probe.probe_compiler, probe.probe_interpreter, probe.supports_flag)
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("HATCH_CPP_CACHE_DIR", str(tmp_path))
+    for function in _PROBES:
+        function.cache_clear()
+    yield tmp_path
+    for function in _PROBES:
+        function.cache_clear()
+
+
+class TestLinkerProbe:
+    @pytest.mark.skipif(not which("gcc"), reason="gcc not available")
+    def test_linker_works_is_cached_on_disk(self, cache_dir, monkeypatch):
+        assert probe.linker_works("gcc", "bfd")
+        assert not probe.linker_works("gcc", "not-a-linker")
+        probes = loads((cache_dir / "probes.json").read_text())
+        assert sorted(probes.values()) == [False, True]
+
+        # Later processes read the probe results instead of linking again
+        probe.linker_works.cache_clear()
+
+        def fail(*args, **kwargs):
+            raise AssertionError("probed again")
+
+        monkeypatch.setattr(probe, "run", fail)
+        assert probe.linker_works("gcc", "bfd")
+        assert not probe.linker_works("gcc", "not-a-linker")
+
+    def test_missing_compiler(self, cache_dir):
+        assert not probe.linker_works("hatch-cpp-no-such-compiler", "mold")
+
+    def test_select_linker(self, monkeypatch):
+        working = set()
+        monkeypatch.setattr(probe, "linker_works", lambda compiler, linker: linker in working)
+        assert probe.select_linker("gcc") is None
+        working.update(("gold", "lld"))
+        assert probe.select_linker("gcc") == "lld"
+        working.add("mold")
+        assert probe.select_linker("gcc") == "mold"
+
+    def test_default_platform_prefers_fast_linker(self, monkeypatch):
+        monkeypatch.setattr(common, "sys_platform", "linux")
+        monkeypatch.setattr(common, "select_linker", lambda compiler: "mold")
+        for var in ("CC", "CXX", "LD", "PYODIDE_ABI_VERSION"):
+            monkeypatch.delenv(var, raising=False)
+        assert HatchCppPlatform.default().ld == "mold"
+
+        monkeypatch.setattr(common, "select_linker", lambda compiler: None)
+        assert HatchCppPlatform.default().ld == "ld"
+
+        # An explicit LD always wins
+        monkeypatch.setattr(common, "select_linker", lambda compiler: "mold")
+        monkeypatch.setenv("LD", "ld.bfd")
+        assert HatchCppPlatform.default().ld == "ld.bfd"
+
+    def test_linker_flags(self, monkeypatch):
+        monkeypatch.setattr(common, "usable_cpu_count", lambda: 6)
+        platform = HatchCppPlatform(cc="gcc", cxx="g++", ld="mold", platform="linux", toolchain="gcc", disable_ccache=True)
+        assert platform.get_linker_flags() == ["-fuse-ld=mold", "-Wl,--thread-count=6"]
+        # A path to the linker still selects it by name, which older gcc requires
+        platform.ld = "/usr/bin/ld.mold"
+        assert platform.get_linker_flags() == ["-fuse-ld=mold", "-Wl,--thread-count=6"]
+        platform.ld = "lld"
+        assert platform.get_linker_flags() == ["-fuse-ld=lld", "-Wl,--threads=6"]
+        platform.ld = "gold"
+        assert platform.get_linker_flags() == ["-fuse-ld=gold", "-Wl,--threads", "-Wl,--thread-count=6"]
+        platform.ld = "ld"
+        assert platform.get_linker_flags() == []
+
+    def test_linker_flags_fall_back_without_lto_support(self, monkeypatch):
+        monkeypatch.setattr(common, "usable_cpu_count", lambda: 6)
+        monkeypatch.setattr(common, "linker_works", lambda compiler, linker, flags: not flags)
+        platform = HatchCppPlatform(cc="gcc", cxx="g++", ld="lld", platform="linux", toolchain="gcc", disable_ccache=True)
+        assert platform.get_linker_flags(HatchCppLibrary(name="ext", sources=["a.cpp"])) == ["-fuse-ld=lld", "-Wl,--threads=6"]
+        library = HatchCppLibrary(name="ext", sources=["a.cpp"], optimizations=["lto"])
+        assert platform.get_linker_flags(library) == []
+        assert "-fuse-ld" not in platform.get_link_flags(library)
+
+    @pytest.mark.skipif(not which("gcc"), reason="gcc not available")
+    @pytest.mark.parametrize("linker", probe.FAST_LINKERS)
+    def test_lto_links_with_selected_linker(self, make_plan, tmp_path, monkeypatch, cache_dir, linker):
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "a.c").write_text("int a(void) { return 1; }\n")
+        build_plan = make_plan(sources=["a.c"], language="c", binding="generic", optimizations=["lto"])
+        build_plan.platform.ld = linker
+        build_plan.generate()
+        build_plan.execute()
+        assert Path("project/extension.so").exists()
+
+
+class TestToolchainProbe:
+    def test_interpreter_probe_is_cached_on_disk(self, cache_dir, monkeypatch):
+        interpreter = probe.probe_interpreter()
+        assert (Path(interpreter.include) / "Python.h").exists()
+        assert interpreter.ext_suffix
+        assert Path(interpreter.pybind11_include).exists()
+        assert interpreter.nanobind_version
+
+        probe.probe_interpreter.cache_clear()
+
+        def fail(*args, **kwargs):
+            raise AssertionError("probed again")
+
+        monkeypatch.setattr(probe, "get_path", fail)
+        monkeypatch.setattr(probe, "_interpreter_key", lambda: next(key for key in loads((cache_dir / "probes.json").read_text())))
+        assert probe.probe_interpreter() == interpreter
+
+    def test_interpreter_probe_revalidates_paths(self, cache_dir, monkeypatch):
+        monkeypatch.setattr(probe, "_interpreter_key", lambda: "interpreter:test")
+        probe._store_probe("interpreter:test", {"include": str(cache_dir / "moved"), "ext_suffix": ".so"})
+        assert probe.probe_interpreter().include != str(cache_dir / "moved")
+
+    @pytest.mark.skipif(not which("gcc"), reason="gcc not available")
+    def test_compiler_probe(self, cache_dir):
+        compiler = probe.probe_compiler("gcc")
+        assert compiler.version.startswith("gcc")
+        assert f"compiler:{probe.compiler_identity('gcc')}" in loads((cache_dir / "probes.json").read_text())
+
+    def test_missing_compiler_is_not_cached(self, cache_dir):
+        assert probe.probe_compiler("hatch-cpp-no-such-compiler").version == "hatch-cpp-no-such-compiler"
+        assert not (cache_dir / "probes.json").exists()
+        # Flags are assumed to work for compilers that are not installed here
+        assert probe.supports_flag("hatch-cpp-no-such-compiler", "-fno-plt")
+        assert probe.supports_flag("cl", "/GL")
+
+    @pytest.mark.skipif(not which("gcc"), reason="gcc not available")
+    def test_supports_flag(self, cache_dir):
+        assert probe.supports_flag("gcc", "-fno-plt")
+        assert not probe.supports_flag("gcc", "-fno-such-flag")
+
+    def test_probes_are_bounded(self, cache_dir, monkeypatch):
+        monkeypatch.setattr(probe, "_MAX_PROBES", 3)
+        for index in range(5):
+            probe._store_probe(f"key:{index}", index)
+        assert list(loads((cache_dir / "probes.json").read_text())) == ["key:2", "key:3", "key:4"]
+
+    def test_optimizations_skip_unsupported_flags(self, monkeypatch):
+        monkeypatch.setattr(common, "supports_flag", lambda compiler, flag: flag not in ("-fno-plt", "-flto=auto"))
+        platform = HatchCppPlatform(cc="gcc", cxx="g++", ld="ld", platform="linux", toolchain="gcc", disable_ccache=True)
+        library = HatchCppLibrary(name="ext", sources=["a.cpp"], optimizations=["lto", "no-plt", "native"])
+        assert platform.get_optimization_flags(library) == (["-flto", "-march=native"], ["-flto"])
@@ -0,0 +1,76 @@
+from threading import Event, Lock
+from time import sleep
+
+import pytest
+
+from hatch_cpp.scheduler import run_steps
+from hatch_cpp.steps import HatchCppBuildStep
+
+
+def _step(name, depends=()):
+    return HatchCppBuildStep(name=name, kind="compile", command=f"build {name}", depends=list(depends))
+
+
+class TestRunSteps:
+    def test_respects_dependencies(self):
+        order = []
+        lock = Lock()
+
+        def run(step):
+            with lock:
+                order.append(step.name)
+            return 0
+
+        steps = [_step("a"), _step("b", ["a"]), _step("c", ["a"]), _step("d", ["b", "c"])]
+        run_steps(steps, run, jobs=4)
+
+        assert order[0] == "a"
+        assert set(order[1:3]) == {"b", "c"}
+        assert order[3] == "d"
+
+    def test_runs_independent_steps_concurrently(self):
+        started = {name: Event() for name in ("a", "b")}
+
+        def run(step):
+            started[step.name].set()
+            # Each step waits until the other has started, which deadlocks if run serially
+            other = "b" if step.name == "a" else "a"
+            return 0 if started[other].wait(timeout=5) else 1
+
+        run_steps([_step("a"), _step("b")], run, jobs=2)
+
+    def test_fails_fast_and_cancels_pending(self):
+        ran = []
+
+        def run(step):
+            ran.append(step.name)
+            if step.name == "bad":
+                return 2
+            sleep(0.05)
+            return 0
+
+        steps = [_step("bad"), _step("slow"), _step("after-bad", ["bad"]), *(_step(f"queued-{i}") for i in range(20))]
+        with pytest.raises(RuntimeError, match="exit code 2: build bad"):
+            run_steps(steps, run, jobs=2)
+
+        assert "after-bad" not in ran
+        assert len(ran) < len(steps)
+
+    def test_exception_propagates(self):
+        def run(step):
+            raise OSError("boom")
+
+        with pytest.raises(OSError, match="boom"):
+            run_steps([_step("a")], run, jobs=1)
+
+    def test_unknown_dependency(self):
+        with pytest.raises(ValueError, match="unknown step"):
+            run_steps([_step("a", ["missing"])], lambda step: 0, jobs=1)
+
+    def test_duplicate_names(self):
+        with pytest.raises(ValueError, match="unique"):
+            run_steps([_step("a"), _step("a")], lambda step: 0, jobs=1)
+
+    def test_cycle(self):
+        with pytest.raises(ValueError, match="cyclic"):
+            run_steps([_step("a", ["b"]), _step("b", ["a"])], lambda step: 0, jobs=1)
@@ -4,6 +4,7 @@ from sys import version_info
 from unittest.mock import patch
 
 import pytest
+from hatch_build import parse_extra_args_model
 from pydantic import ValidationError
 from toml import loads
 
@@ -43,6 +44,7 @@ class TestStructs:
         assert hatch_build_plan.commands[0].startswith("cmake .")
         assert hatch_build_plan.commands[1].startswith("cmake --build build")
         assert hatch_build_plan.commands[2].startswith("cmake --install build")
+        assert [step.depends for step in hatch_build_plan._steps] == [[], ["cmake:configure"], ["cmake:build"]]
 
         assert "-DCMAKE_BUILD_TYPE=release" in hatch_build_plan.commands[0]
         assert "-B build" in hatch_build_plan.commands[0]
@@ -107,6 +109,72 @@ class TestStructs:
             f" -shared -o pyodide_project/extension.cpython-{version_info.major}{version_info.minor}-wasm32-emscripten.so"
         )
 
+    def test_build_plan_compiles_each_source_before_linking(self):
+        platform = HatchCppPlatform(cc="gcc", cxx="g++", ld="ld", platform="linux", toolchain="gcc", disable_ccache=True)
+        build_plan = HatchCppBuildPlan(
+            name="project",
+            libraries=[HatchCppLibrary(name="project/extension", sources=["cpp/a.cpp", "cpp/b.cpp"], binding="generic")],
+            platform=platform,
+            vcpkg=None,
+            jobs=4,
+        )
+
+        build_plan.generate()
+
+        assert build_plan.jobs == 4
+        assert len(build_plan.commands) == 3
+        assert build_plan.commands[0].startswith("g++ -c cpp/a.cpp ")
+        assert build_plan.commands[0].endswith(" -o build/hatch-cpp/0-0-a.o")
+        assert build_plan.commands[1].startswith("g++ -c cpp/b.cpp ")
+        assert build_plan.commands[1].endswith(" -o build/hatch-cpp/0-1-b.o")
+        assert build_plan.commands[2].startswith("g++ build/hatch-cpp/0-0-a.o build/hatch-cpp/0-1-b.o ")
+        assert [step.kind for step in build_plan._steps] == ["compile", "compile", "link"]
+        assert build_plan._steps[0].depends == build_plan._steps[1].depends == []
+        assert build_plan._steps[2].depends == [build_plan._steps[0].name, build_plan._steps[1].name]
+
+    def test_build_plan_libraries_are_independent(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "vcpkg.json").write_text("{}")
+        platform = HatchCppPlatform(cc="gcc", cxx="g++", ld="ld", platform="linux", toolchain="gcc", disable_ccache=True)
+        build_plan = HatchCppBuildPlan(
+            name="project",
+            libraries=[
+                HatchCppLibrary(name="project/one", sources=["cpp/one.cpp"], binding="generic"),
+                HatchCppLibrary(name="project/two", sources=["cpp/two.cpp"], binding="generic"),
+            ],
+            platform=platform,
+        )
+
+        build_plan.generate()
+
+        steps = {step.name: step for step in build_plan._steps}
+        vcpkg_install = [step for step in build_plan._steps if step.kind == "vcpkg"][-1]
+        assert steps["compile:build/hatch-cpp/0-0-one.o"].depends == [vcpkg_install.name]
+        assert steps["compile:build/hatch-cpp/1-0-two.o"].depends == [vcpkg_install.name]
+        assert steps["link:project/one.so"].depends == ["compile:build/hatch-cpp/0-0-one.o"]
+        assert steps["link:project/two.so"].depends == ["compile:build/hatch-cpp/1-0-two.o"]
+
+    def test_build_plan_msvc_object_commands(self):
+        platform = HatchCppPlatform(cc="cl", cxx="cl", ld="link", platform="win32", toolchain="msvc", disable_ccache=True)
+        build_plan = HatchCppBuildPlan(
+            name="project",
+            libraries=[HatchCppLibrary(name="project/extension", sources=["cpp/a.cpp"], binding="generic")],
+            platform=platform,
+            vcpkg=None,
+        )
+
+        build_plan.generate()
+
+        assert build_plan.commands[0].startswith("cl /c cpp/a.cpp ")
+        assert build_plan.commands[0].endswith(" /Fo:build/hatch-cpp/0-0-a.obj")
+        assert build_plan.commands[1].startswith("cl build/hatch-cpp/0-0-a.obj ")
+
+    def test_build_plan_jobs_default(self):
+        build_plan = HatchCppBuildPlan(name="project", vcpkg=None)
+        assert build_plan.jobs >= 1
+        with pytest.raises(ValidationError):
+            HatchCppBuildPlan(name="project", vcpkg=None, jobs=0)
+
     def test_cmake_args_env_variable(self):
         """Test that CMAKE_ARGS environment variable is respected."""
         txt = (Path(__file__).parent / "test_project_cmake" / "pyproject.toml").read_text()
@@ -149,13 +217,69 @@ class TestStructs:
         hatch_build_config = HatchCppBuildConfig(name=toml_data["project"]["name"], **toml_data["tool"]["hatch"]["build"]["hooks"]["hatch-cpp"])
         hatch_build_plan = HatchCppBuildPlan(**hatch_build_config.model_dump())
 
-        with patch.dict(environ, {}, clear=False):
+        with patch.dict(environ, {}, clear=False), patch("hatch_cpp.toolchains.cmake.which", return_value=None):
             # Remove CMAKE_GENERATOR if present
             environ.pop("CMAKE_GENERATOR", None)
             hatch_build_plan.generate()
             if hatch_build_plan.platform.platform != "win32":
                 assert "-G " not in hatch_build_plan.commands[0]
 
+    def test_cmake_generator_prefers_ninja(self, tmp_path):
+        """Test that Ninja is used when available, unless the build directory was configured with another generator."""
+        txt = (Path(__file__).parent / "test_project_cmake" / "pyproject.toml").read_text()
+        toml_data = loads(txt)
+        hatch_build_config = HatchCppBuildConfig(name=toml_data["project"]["name"], **toml_data["tool"]["hatch"]["build"]["hooks"]["hatch-cpp"])
+        hatch_build_plan = HatchCppBuildPlan(**hatch_build_config.model_dump())
+        hatch_build_plan.platform.platform = "linux"
+        hatch_build_plan.cmake.build = tmp_path
+
+        with patch.dict(environ, {}, clear=False), patch("hatch_cpp.toolchains.cmake.which", return_value="/usr/bin/ninja"):
+            environ.pop("CMAKE_GENERATOR", None)
+            hatch_build_plan.generate()
+            assert '-G "Ninja"' in hatch_build_plan.commands[0]
+
+            (tmp_path / "CMakeCache.txt").write_text("CMAKE_GENERATOR:INTERNAL=Unix Makefiles\n")
+            hatch_build_plan.generate()
+            assert "-G " not in hatch_build_plan.commands[0]
+
+    def test_cmake_compilers(self):
+        """Test that cmake builds with the platform's compilers, launcher and linker."""
+        txt = (Path(__file__).parent / "test_project_cmake" / "pyproject.toml").read_text()
+        toml_data = loads(txt)
+        hatch_build_config = HatchCppBuildConfig(name=toml_data["project"]["name"], **toml_data["tool"]["hatch"]["build"]["hooks"]["hatch-cpp"])
+        hatch_build_plan = HatchCppBuildPlan(**hatch_build_config.model_dump())
+        hatch_build_plan.platform = HatchCppPlatform(cc="gcc-12", cxx="g++-12", ld="gold", platform="linux", toolchain="gcc", launcher="sccache")
+        assert hatch_build_plan.platform.cc == "sccache gcc-12"
+        assert hatch_build_plan.platform.split_launcher("sccache g++-12") == ("g++-12", "sccache")
+
+        with patch.dict(environ, {"CMAKE_GENERATOR": "Ninja"}):
+            hatch_build_plan.generate()
+        configure = hatch_build_plan.commands[0]
+        assert " -DCMAKE_C_COMPILER=gcc-12 -DCMAKE_C_COMPILER_LAUNCHER=sccache" in configure
+        assert " -DCMAKE_CXX_COMPILER=g++-12 -DCMAKE_CXX_COMPILER_LAUNCHER=sccache" in configure
+        assert ' -DCMAKE_SHARED_LINKER_FLAGS_INIT="-fuse-ld=gold -Wl,--threads' in configure
+
+        # Visual Studio generators choose their own compiler
+        hatch_build_plan.platform = HatchCppPlatform(cc="cl", cxx="cl", ld="link", platform="win32", toolchain="msvc")
+        with patch.dict(environ, {}, clear=False):
+            environ.pop("CMAKE_GENERATOR", None)
+            hatch_build_plan.generate()
+        assert "CMAKE_C_COMPILER" not in hatch_build_plan.commands[0]
+
+    def test_cmake_build_parallel(self, monkeypatch):
+        """Test that cmake --build runs with the configured number of jobs."""
+        txt = (Path(__file__).parent / "test_project_cmake" / "pyproject.toml").read_text()
+        toml_data = loads(txt)
+        hatch_build_config = HatchCppBuildConfig(name=toml_data["project"]["name"], **toml_data["tool"]["hatch"]["build"]["hooks"]["hatch-cpp"])
+        hatch_build_plan = HatchCppBuildPlan(**hatch_build_config.model_dump())
+        hatch_build_plan.generate()
+        assert hatch_build_plan.commands[1].endswith(f"--parallel {hatch_build_plan.jobs}")
+
+        monkeypatch.setattr("hatch_build.cli._extras", ["--jobs", "3"])
+        parse_extra_args_model(hatch_build_plan)
+        hatch_build_plan.generate()
+        assert hatch_build_plan.commands[1] == "cmake --build build --config release --parallel 3"
+
     def test_hatch_cpp_cmake_env_force_off(self):
         """Test that HATCH_CPP_CMAKE=0 disables cmake even when cmake config is present."""
         txt = (Path(__file__).parent / "test_project_cmake" / "pyproject.toml").read_text()
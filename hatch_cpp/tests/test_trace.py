@@ -0,0 +1,39 @@
+from json import loads
+
+from hatch_cpp.executor import HatchCppStepResult
+from hatch_cpp.trace import HatchCppTracer
+
+
+class TestTracer:
+    def test_span_and_write(self, tmp_path):
+        tracer = HatchCppTracer()
+        with tracer.span("generate plan"):
+            pass
+        tracer.write(tmp_path / "trace" / "build.json")
+
+        trace = loads((tmp_path / "trace" / "build.json").read_text())
+        spans = [event for event in trace["traceEvents"] if event["ph"] == "X"]
+        assert [span["name"] for span in spans] == ["generate plan"]
+        assert spans[0]["cat"] == "phase"
+        assert spans[0]["tid"] == 0
+        assert spans[0]["ts"] >= 0
+
+    def test_results_are_laid_out_on_free_lanes(self):
+        tracer = HatchCppTracer(origin=100.0)
+        tracer.add_results(
+            [
+                HatchCppStepResult(name="compile:a.o", kind="compile", command="cc a", start=100.0, wall_time=2.0, cpu_time=1.5),
+                HatchCppStepResult(name="compile:b.o", kind="compile", command="cc b", start=100.5, wall_time=1.0),
+                HatchCppStepResult(name="link:lib.so", kind="link", command="cc -shared", start=102.0, wall_time=0.5, max_rss=1024),
+            ]
+        )
+
+        spans = {event["name"]: event for event in tracer.events}
+        assert spans["compile:a.o"]["tid"] == 1
+        assert spans["compile:b.o"]["tid"] == 2
+        assert spans["link:lib.so"]["tid"] == 1
+        assert spans["compile:b.o"]["ts"] == 500_000
+        assert spans["compile:a.o"]["dur"] == 2_000_000
+        assert spans["compile:a.o"]["args"]["cpu_time"] == 1.5
+        assert spans["link:lib.so"]["cat"] == "link"
+        assert spans["link:lib.so"]["args"]["max_rss"] == 1024
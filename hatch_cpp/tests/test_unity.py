@@ -0,0 +1,78 @@
+from pathlib import Path
+
+from hatch_cpp import HatchCppLibrary
+
+
+class TestUnityBuild:
+    def test_batches(self):
+        library = HatchCppLibrary(
+            name="ext", sources=["a.cpp", "b.cpp", "c.cpp", "d.cpp", "e.cpp"], unity_build=True, unity_batch_size=2, unity_exclude=["c.cpp"]
+        )
+        assert library.get_unity_batches() == [["a.cpp", "b.cpp"], ["d.cpp", "e.cpp"], ["c.cpp"]]
+
+        library.unity_build = False
+        assert library.get_unity_batches() == [["a.cpp"], ["b.cpp"], ["c.cpp"], ["d.cpp"], ["e.cpp"]]
+
+    def test_aliases(self):
+        library = HatchCppLibrary.model_validate(
+            {"name": "ext", "sources": ["a.cpp"], "unity-build": True, "unity-batch-size": 4, "unity-exclude": ["a.cpp"]}
+        )
+        assert library.unity_build
+        assert library.unity_batch_size == 4
+        assert library.unity_exclude == ["a.cpp"]
+
+    def test_unity_steps(self, make_plan):
+        build_plan = make_plan(unity_build=True, sources=["cpp/a.cpp", "cpp/b.cpp", "cpp/c.cpp"], unity_batch_size=2)
+        build_plan.generate()
+
+        compile_ab, compile_c, link = build_plan._steps
+        unity = Path("build/hatch-cpp/0-unity-0.cpp")
+        assert build_plan._generated_files[unity] == "".join(
+            f'#include "{Path(source).resolve().as_posix()}"\n' for source in ("cpp/a.cpp", "cpp/b.cpp")
+        )
+        assert compile_ab.command.startswith(f"g++ -c {unity} ")
+        assert compile_ab.outputs == [Path("build/hatch-cpp/0-0-unity.o")]
+        assert compile_ab.inputs == [unity]
+        # A batch of one is compiled directly rather than through a wrapper
+        assert compile_c.command.startswith("g++ -c cpp/c.cpp ")
+        assert compile_c.outputs == [Path("build/hatch-cpp/0-1-c.o")]
+        assert link.depends == [compile_ab.name, compile_c.name]
+        assert "build/hatch-cpp/0-0-unity.o build/hatch-cpp/0-1-c.o" in link.command
+
+    def test_unity_with_pch(self, make_plan):
+        build_plan = make_plan(unity_build=True, sources=["cpp/a.cpp", "cpp/b.cpp"], precompiled_headers=True)
+        build_plan.generate()
+
+        pch, compile_ab, _ = build_plan._steps
+        assert pch.kind == "pch"
+        assert compile_ab.depends == [pch.name]
+        assert " -include build/hatch-cpp/0-pch.hpp " in compile_ab.command
+
+    def test_msvc_unity(self, make_plan):
+        build_plan = make_plan(unity_build=True, toolchain="msvc", sources=["cpp/a.c", "cpp/b.c"], language="c")
+        build_plan.generate()
+
+        compile_ab, _ = build_plan._steps
+        assert compile_ab.command.startswith(f"cl /c {Path('build/hatch-cpp/0-unity-0.c')} ")
+
+    def test_build_unity(self, make_plan, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "project").mkdir()
+        (tmp_path / "a.cpp").write_text("static int helper() { return 1; }\nint a() { return helper(); }\n")
+        (tmp_path / "b.cpp").write_text("int b() { return 2; }\n")
+        (tmp_path / "c.cpp").write_text("static int helper() { return 3; }\nint c() { return helper(); }\n")
+        build_plan = make_plan(unity_build=True, sources=["a.cpp", "b.cpp", "c.cpp"], binding="generic", unity_exclude=["c.cpp"])
+        build_plan.generate()
+        build_plan.execute()
+
+        assert Path("build/hatch-cpp/0-0-unity.o").exists()
+        assert Path("build/hatch-cpp/0-1-c.o").exists()
+
+        # Touching a source merged into a unity file rebuilds that unit only
+        build_plan = make_plan(unity_build=True, sources=["a.cpp", "b.cpp", "c.cpp"], binding="generic", unity_exclude=["c.cpp"])
+        build_plan.generate()
+        (tmp_path / "b.cpp").write_text("int b() { return 4; }\n")
+        build_plan.execute()
+        assert [result.name for result in build_plan.results if not result.skipped and result.kind == "compile"] == [
+            "compile:build/hatch-cpp/0-0-unity.o"
+        ]
@@ -0,0 +1,57 @@
+from threading import Event, Thread
+from time import sleep
+
+from hatch_cpp.utils import file_lock, find_files
+
+
+class TestFindFiles:
+    def test_prunes_heavy_directories(self, tmp_path):
+        for path in (
+            "project/extension.so",
+            "project/sub/helper.dylib",
+            "project/notes.txt",
+            "project/node_modules/dep/binding.so",
+            ".git/objects/pack.so",
+            "env/pyvenv.cfg",
+            "env/lib/site.so",
+            "cmake-build/CMakeCache.txt",
+            "cmake-build/extension.so",
+            "vcpkg/installed/lib/libz.so",
+            "dist/old.so",
+        ):
+            (tmp_path / path).parent.mkdir(parents=True, exist_ok=True)
+            (tmp_path / path).write_text("")
+
+        libraries, visited = find_files([tmp_path], (".so", ".dylib"), [tmp_path / "vcpkg"])
+        assert libraries == [tmp_path / "project" / "extension.so", tmp_path / "project" / "sub" / "helper.dylib"]
+        # The top level, project/, project/sub/, env/ and cmake-build/ are listed; nothing below the pruned directories is
+        assert visited == 6 + 4 + 1 + 2 + 2
+
+        libraries, visited = find_files([tmp_path / "project", tmp_path / "missing"], (".so",))
+        assert libraries == [tmp_path / "project" / "extension.so"]
+
+    def test_does_not_follow_symlinks(self, tmp_path):
+        (tmp_path / "project").mkdir()
+        (tmp_path / "project" / "extension.so").write_text("")
+        (tmp_path / "project" / "loop").symlink_to(tmp_path)
+        assert find_files([tmp_path], (".so",)) == ([tmp_path / "project" / "extension.so"], 3)
+
+
+class TestFileLock:
+    def test_exclusive(self, tmp_path):
+        events = []
+        acquired = Event()
+
+        def hold():
+            with file_lock(tmp_path / "locks" / ".lock"):
+                acquired.set()
+                sleep(0.2)
+                events.append("released")
+
+        thread = Thread(target=hold)
+        thread.start()
+        acquired.wait()
+        with file_lock(tmp_path / "locks" / ".lock"):
+            events.append("acquired")
+        thread.join()
+        assert events == ["released", "acquired"]
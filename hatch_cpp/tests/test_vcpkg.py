@@ -0,0 +1,271 @@
+from os import utime
+from shlex import split
+from shutil import which
+from subprocess import check_call
+from sys import platform as sys_platform
+from types import SimpleNamespace
+
+import pytest
+from hatch_build import parse_extra_args_model
+from pydantic import ValidationError
+
+from hatch_cpp import HatchCppBuildPlan, HatchCppCmakeConfiguration, HatchCppPlatform
+from hatch_cpp.toolchains.vcpkg import HatchCppVcpkgConfiguration
+
+INSTALL_OUTPUT = """Detecting compiler hash for triplet x64-linux...
+Restored 2 package(s) from /cache in 1.2 s. Use --debug to see more details.
+Installing 1/3 zlib:x64-linux@1.3.1...
+Installing 2/3 fmt:x64-linux@10.2.1...
+Installing 3/3 arrow:x64-linux@15.0.0...
+Building arrow:x64-linux@15.0.0...
+-- Configuring x64-linux-rel
+Stored binaries in 1 destinations in 80 ms.
+"""
+
+
+@pytest.fixture
+def manifest(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "vcpkg.json").write_text("{}")
+    return tmp_path
+
+
+class TestVcpkgBinaryCache:
+    def test_binary_source(self, manifest):
+        cfg = HatchCppVcpkgConfiguration(vcpkg_triplet="x64-linux", vcpkg_binary_cache="cache, shared", vcpkg_binary_cache_mode="read")
+        install = cfg.generate(None)[-1]
+        assert split(install)[-1] == f"--binarysource=files,{manifest / 'cache`, shared'},read"
+        # The directory is created when installing, not while planning
+        assert not (manifest / "cache, shared").exists()
+        assert cfg.get_binary_cache_dir() == manifest / "cache, shared"
+
+        with pytest.raises(ValidationError):
+            HatchCppVcpkgConfiguration(vcpkg_binary_cache_mode="upload")
+
+    def test_summary(self):
+        cfg = HatchCppVcpkgConfiguration()
+        assert cfg.get_binary_cache_summary(INSTALL_OUTPUT) == "vcpkg binary cache: 2 packages restored, 1 built from source"
+        assert cfg.get_binary_cache_summary("All requested installations completed successfully.\n") is None
+
+
+class TestVcpkgStamp:
+    def test_skip_install_when_unchanged(self, manifest, monkeypatch):
+        (manifest / "vcpkg").mkdir()
+        (manifest / "vcpkg" / "vcpkg").write_text("")
+        cfg = HatchCppVcpkgConfiguration(vcpkg_triplet="x64-linux")
+        monkeypatch.setattr(cfg, "_is_vcpkg_working", lambda: True)
+        assert cfg.generate(None) == ["./vcpkg/vcpkg install --triplet x64-linux"]
+
+        # A stamp without an installed tree does not count
+        (manifest / "vcpkg_installed").mkdir()
+        cfg.record_install("linux")
+        assert cfg.generate(None) != []
+        (manifest / "vcpkg_installed" / "x64-linux").mkdir()
+
+        def fail():
+            raise AssertionError("health check ran")
+
+        monkeypatch.setattr(cfg, "_is_vcpkg_working", fail)
+        assert cfg.generate(None) == []
+
+        monkeypatch.setattr(cfg, "_is_vcpkg_working", lambda: True)
+        assert cfg.generate(SimpleNamespace(platform=SimpleNamespace(platform="linux"), incremental=False)) != []
+        (manifest / "vcpkg.json").write_text('{"dependencies": ["zlib"]}')
+        assert cfg.generate(None) == ["./vcpkg/vcpkg install --triplet x64-linux"]
+        cfg.record_install("linux")
+        assert cfg.generate(None) == []
+
+        # Re-bootstrapping replaces the executable
+        utime(manifest / "vcpkg" / "vcpkg", ns=(0, 0))
+        assert cfg.generate(None) != []
+        cfg.record_install("linux")
+        cfg.vcpkg_triplet = "arm64-linux"
+        assert cfg.get_stamp("linux") != (manifest / "vcpkg_installed" / ".hatch-cpp-stamp").read_text()
+
+
+class TestVcpkgOverlays:
+    def test_custom_triplet(self, manifest):
+        with pytest.raises(ValidationError):
+            HatchCppVcpkgConfiguration(vcpkg_triplet="x64-linux-fast")
+        (manifest / "triplets").mkdir()
+        (manifest / "triplets" / "x64-linux-fast.cmake").write_text("set(VCPKG_TARGET_ARCHITECTURE x64)\n")
+        (manifest / "ports" / "zlib").mkdir(parents=True)
+        cfg = HatchCppVcpkgConfiguration(vcpkg_triplet="x64-linux-fast", vcpkg_overlay_ports=["ports"], vcpkg_overlay_triplets=["triplets"])
+        assert split(cfg.generate(None)[-1])[-3:] == [
+            "x64-linux-fast",
+            f"--overlay-ports={manifest / 'ports'}",
+            f"--overlay-triplets={manifest / 'triplets'}",
+        ]
+
+    def test_release_only(self, manifest):
+        cfg = HatchCppVcpkgConfiguration(vcpkg_triplet="x64-linux", vcpkg_release_only=True)
+        triplets = manifest / "build" / "hatch-cpp" / "vcpkg-triplets"
+        assert cfg.generate(None)[-1] == f"./vcpkg/vcpkg install --triplet x64-linux-release --overlay-triplets={triplets}"
+        triplet = (triplets / "x64-linux-release.cmake").read_text()
+        assert f'"{manifest / "vcpkg" / "triplets"}"' in triplet
+        assert triplet.endswith("set(VCPKG_BUILD_TYPE release)\n")
+
+        # Built-in release triplets are used as they are
+        assert HatchCppVcpkgConfiguration(vcpkg_triplet="x64-windows-release", vcpkg_release_only=True).get_overlay_triplets() == []
+
+    def test_stamp_covers_overlays(self, manifest):
+        (manifest / "vcpkg").mkdir()
+        (manifest / "vcpkg" / "vcpkg").write_text("")
+        (manifest / "ports" / "zlib").mkdir(parents=True)
+        (manifest / "ports" / "zlib" / "portfile.cmake").write_text("")
+        cfg = HatchCppVcpkgConfiguration(vcpkg_triplet="x64-linux", vcpkg_overlay_ports=["ports"])
+        stamp = cfg.get_stamp("linux")
+        (manifest / "ports" / "zlib" / "portfile.cmake").write_text("# faster fork\n")
+        assert cfg.get_stamp("linux") != stamp
+        cfg.vcpkg_release_only = True
+        assert cfg.get_stamp("linux") != stamp
+
+    def test_cmake(self, manifest):
+        (manifest / "CMakeLists.txt").write_text("")
+        (manifest / "ports").mkdir()
+        platform = HatchCppPlatform(cc="gcc", cxx="g++", ld="ld", platform="linux", toolchain="gcc", disable_ccache=True)
+        vcpkg = HatchCppVcpkgConfiguration(vcpkg_triplet="x64-linux", vcpkg_overlay_ports=["ports"], vcpkg_release_only=True)
+        build_plan = HatchCppBuildPlan(name="project", platform=platform, vcpkg=vcpkg, cmake=HatchCppCmakeConfiguration(root="CMakeLists.txt"))
+        build_plan.generate()
+        configure = next(step for step in build_plan._steps if step.kind == "cmake-configure").command
+        assert " -DVCPKG_TARGET_TRIPLET=x64-linux-release " in configure
+        assert f' -DVCPKG_OVERLAY_PORTS="{(manifest / "ports").as_posix()}"' in configure
+        assert f' -DVCPKG_OVERLAY_TRIPLETS="{(manifest / "build" / "hatch-cpp" / "vcpkg-triplets").as_posix()}"' in configure
+
+
+class TestVcpkgFeatures:
+    def test_install(self, manifest):
+        cfg = HatchCppVcpkgConfiguration(
+            vcpkg_triplet="x64-linux", vcpkg_features=["zstd"], vcpkg_features_linux=["avx2"], vcpkg_features_win32=["sse4"]
+        )
+        assert cfg.get_effective_features("linux") == ["zstd", "avx2"]
+        assert cfg.get_effective_features("win32") == ["zstd", "sse4"]
+        assert cfg.get_effective_features("emscripten") == ["zstd"]
+        linux = SimpleNamespace(platform=SimpleNamespace(platform="linux"))
+        assert cfg.generate(linux)[-1].endswith(" install --triplet x64-linux --x-feature=zstd --x-feature=avx2")
+        cfg.vcpkg_no_default_features = True
+        assert cfg.generate(linux)[-1].endswith(" --x-feature=zstd --x-feature=avx2 --x-no-default-features")
+
+    def test_stamp(self, manifest):
+        (manifest / "vcpkg").mkdir()
+        (manifest / "vcpkg" / "vcpkg").write_text("")
+        cfg = HatchCppVcpkgConfiguration(vcpkg_triplet="x64-linux")
+        stamp = cfg.get_stamp("linux")
+        cfg.vcpkg_features = ["zstd"]
+        with_features = cfg.get_stamp("linux")
+        cfg.vcpkg_no_default_features = True
+        assert len({stamp, with_features, cfg.get_stamp("linux")}) == 3
+
+    def test_cli_override(self, manifest, monkeypatch):
+        (manifest / "CMakeLists.txt").write_text("")
+        platform = HatchCppPlatform(cc="gcc", cxx="g++", ld="ld", platform="linux", toolchain="gcc", disable_ccache=True)
+        vcpkg = HatchCppVcpkgConfiguration(vcpkg_triplet="x64-linux", vcpkg_features=["zstd", "lz4"])
+        build_plan = HatchCppBuildPlan(name="project", platform=platform, vcpkg=vcpkg, cmake=HatchCppCmakeConfiguration(root="CMakeLists.txt"))
+        monkeypatch.setattr("hatch_build.cli._extras", ["--vcpkg.vcpkg-features", "zstd", "--vcpkg.vcpkg-no-default-features"])
+        parse_extra_args_model(build_plan)
+        build_plan.generate()
+        install = [step for step in build_plan._steps if step.kind == "vcpkg"][-1].command
+        assert install.endswith(" --x-feature=zstd --x-no-default-features")
+        configure = next(step for step in build_plan._steps if step.kind == "cmake-configure").command
+        assert ' -DVCPKG_MANIFEST_FEATURES="zstd" -DVCPKG_MANIFEST_NO_DEFAULT_FEATURES=ON' in configure
+
+
+class TestVcpkgFootprint:
+    def _write(self, path, size, mtime):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"x" * size)
+        utime(path, (mtime, mtime))
+
+    def test_evict_oldest_first(self, manifest):
+        root = manifest / "vcpkg"
+        for index, name in enumerate(("zlib", "fmt", "arrow")):
+            self._write(root / "downloads" / f"{name}.tar.gz", 100, 1000 + index)
+            self._write(root / "buildtrees" / name / "src" / "a.c", 100, 1000 + index)
+            utime(root / "buildtrees" / name, (1000 + index, 1000 + index))
+        (root / "downloads" / ".lock").touch()
+        cfg = HatchCppVcpkgConfiguration(vcpkg_downloads_max_size=250, vcpkg_buildtrees_max_size="150")
+        assert cfg.clean() == 300
+        assert sorted(path.name for path in (root / "downloads").iterdir()) == [".lock", "arrow.tar.gz", "fmt.tar.gz"]
+        assert [path.name for path in (root / "buildtrees").iterdir()] == ["arrow"]
+
+        # No limits by default
+        assert HatchCppVcpkgConfiguration().clean() == 0
+
+    def test_clean_after_build(self, manifest):
+        root = manifest / "vcpkg"
+        self._write(root / "buildtrees" / "zlib" / "build.log", 100, 1000)
+        self._write(root / "packages" / "zlib_x64-linux" / "lib" / "libz.a", 200, 1000)
+        self._write(root / "downloads" / "zlib.tar.gz", 50, 1000)
+        self._write(manifest / "vcpkg_installed" / "x64-linux" / "lib" / "libz.a", 200, 1000)
+        cfg = HatchCppVcpkgConfiguration(vcpkg_triplet="x64-linux", vcpkg_clean_after_build=True)
+        before = cfg.get_footprint()
+        assert before == {"buildtrees": 100, "packages": 200, "downloads": 50, "installed": 200}
+        assert cfg.generate(None)[-1].endswith(" --clean-buildtrees-after-build --clean-packages-after-build")
+
+        assert cfg.clean() == 300
+        after = cfg.get_footprint()
+        assert after == {"buildtrees": 0, "packages": 0, "downloads": 50, "installed": 200}
+        assert cfg.get_footprint_summary({"downloads": 3 * 2**20}, {"downloads": 2**20, "installed": 2**21}) == (
+            "vcpkg footprint: 3 MiB before, 3 MiB after (downloads 1 MiB, installed 2 MiB)"
+        )
+
+        with pytest.raises(ValidationError):
+            HatchCppVcpkgConfiguration(vcpkg_downloads_max_size="lots")
+
+
+BOOTSTRAP = """#!/bin/sh
+cd "$(dirname "$0")"
+printf '#!/bin/sh\\nmkdir -p vcpkg_installed/x64-linux\\necho "fake vcpkg $*"\\n' > vcpkg
+chmod +x vcpkg
+"""
+
+
+@pytest.fixture
+def vcpkg_repo(tmp_path):
+    """A local repository standing in for github.com/microsoft/vcpkg."""
+    repo = tmp_path / "vcpkg-upstream"
+    repo.mkdir()
+    (repo / "bootstrap-vcpkg.sh").write_text(BOOTSTRAP)
+    (repo / "bootstrap-vcpkg.sh").chmod(0o755)
+    for command in (
+        ["git", "init", "-q", "-b", "master"],
+        ["git", "add", "."],
+        ["git", "-c", "user.name=test", "-c", "user.email=test@example.com", "commit", "-q", "-m", "init"],
+        ["git", "tag", "2025.01.13"],
+    ):
+        check_call(command, cwd=repo)
+    return repo
+
+
+@pytest.mark.skipif(not which("git") or sys_platform == "win32", reason="git and a POSIX shell are required")
+class TestVcpkgHome:
+    def _build(self, monkeypatch, project, home, repo):
+        project.mkdir(exist_ok=True)
+        monkeypatch.chdir(project)
+        (project / "vcpkg.json").write_text("{}")
+        platform = HatchCppPlatform(cc="gcc", cxx="g++", ld="ld", platform="linux", toolchain="gcc", disable_ccache=True)
+        vcpkg = HatchCppVcpkgConfiguration(vcpkg_home=home, vcpkg_repo=str(repo), vcpkg_ref="2025.01.13", vcpkg_triplet="x64-linux")
+        build_plan = HatchCppBuildPlan(name="project", platform=platform, vcpkg=vcpkg)
+        build_plan.generate()
+        build_plan.execute()
+        return build_plan
+
+    def test_shared_home(self, tmp_path, monkeypatch, vcpkg_repo):
+        home = tmp_path / "home"
+        build_plan = self._build(monkeypatch, tmp_path / "one", home, vcpkg_repo)
+        commands = [result.command for result in build_plan.results]
+        assert commands[0] == f"git clone --mirror {vcpkg_repo} {home.resolve() / 'mirror.git'}"
+        assert commands[-1].startswith(
+            f"{home.resolve() / 'vcpkg'} install --triplet x64-linux --vcpkg-root={home.resolve() / 'worktrees' / '2025.01.13'} "
+        )
+        assert "--binarysource=files," in commands[-1]
+        assert (home / "worktrees" / "2025.01.13" / "bootstrap-vcpkg.sh").exists()
+        assert build_plan.vcpkg.is_installed(build_plan.platform.platform)
+
+        # A second project reuses the mirror, worktree and tool, and installs without touching the network
+        build_plan = self._build(monkeypatch, tmp_path / "two", home, vcpkg_repo)
+        assert [result.command.split()[1] for result in build_plan.results] == ["install"]
+
+        # Warm builds skip vcpkg entirely
+        build_plan = self._build(monkeypatch, tmp_path / "two", home, vcpkg_repo)
+        assert build_plan.results == []
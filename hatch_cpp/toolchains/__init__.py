@@ -1,3 +1,4 @@
 from .cmake import *
 from .common import *
+from .probe import *
 from .vcpkg import *
@@ -1,16 +1,23 @@
 from __future__ import annotations
 
+from json import dumps, loads
 from os import environ
 from pathlib import Path
+from re import MULTILINE, search
+from shutil import which
 from sys import version_info
 from typing import Any
 
-from pydantic import BaseModel, Field
+from pkn import getSimpleLogger
+from pydantic import AliasChoices, BaseModel, Field
 
+from ..utils import find_files
 from .common import Platform
 
 __all__ = ("HatchCppCmakeConfiguration",)
 
+log = getSimpleLogger("hatch_cpp")
+
 DefaultMSVCGenerator = {
     "12": "Visual Studio 12 2013",
     "14": "Visual Studio 14 2015",
@@ -22,6 +29,28 @@ DefaultMSVCGenerator = {
 }
 
 
+def _configured_generator(build: Path) -> str:
+    """Return the generator an existing build directory was configured with, if any."""
+    try:
+        matched = search(r"^CMAKE_GENERATOR:INTERNAL=(.*)$", (build / "CMakeCache.txt").read_text(errors="replace"), MULTILINE)
+    except OSError:
+        return ""
+    return matched.group(1).strip() if matched else ""
+
+
+# Files read by a configure run besides the toolchain file
+_CONFIGURE_FILES = ("CMakeLists.txt", "CMakePresets.json", "CMakeUserPresets.json")
+
+# Name of hatch-cpp's stateless query against the CMake File API
+_FILE_API_CLIENT = "client-hatch-cpp"
+
+# Artifacts that belong in the wheel
+_LIBRARY_SUFFIXES = (".pyd", ".dll", ".so", ".dylib")
+
+# Environment variables CMake reads when configuring
+_CONFIGURE_ENVIRONMENT = ("CFLAGS", "CXXFLAGS", "LDFLAGS", "CMAKE_PREFIX_PATH", "CMAKE_TOOLCHAIN_FILE", "PKG_CONFIG_PATH")
+
+
 class HatchCppCmakeConfiguration(BaseModel):
     root: Path | None = None
     build: Path = Field(default_factory=lambda: Path("build"))
@@ -32,6 +61,102 @@ class HatchCppCmakeConfiguration(BaseModel):
     cmake_env_args: dict[Platform, dict[str, str]] = Field(default_factory=dict)
 
     include_flags: dict[str, str | int | float | bool] | None = Field(default=None)
+    artifact_dirs: list[str] = Field(
+        default_factory=list,
+        alias=AliasChoices("artifact_dirs", "artifact-dirs"),
+        description="Directories scanned for built libraries when there is no CMake File API reply; defaults to the wheel's packages.",
+    )
+
+    def get_configure_inputs(self, config) -> list[Path]:
+        """Return the files a configure run reads: the project's CMake scripts, the toolchain file and the vcpkg manifest."""
+        # Build trees and the vcpkg checkout hold CMake scripts that are not part of the project
+        prune = [self.build]
+        if config.vcpkg:
+            prune.append(config.vcpkg.get_vcpkg_root())
+        found, _ = find_files([Path(self.root).parent], (*_CONFIGURE_FILES, ".cmake"), prune)
+        inputs = [path for path in found if path.name in _CONFIGURE_FILES or path.suffix == ".cmake"]
+        if "vcpkg" in config._active_toolchains:
+            inputs.append(config.vcpkg.get_vcpkg_root() / "scripts" / "buildsystems" / "vcpkg.cmake")
+            if config.vcpkg.vcpkg and Path(config.vcpkg.vcpkg).exists():
+                inputs.append(Path(config.vcpkg.vcpkg))
+        return inputs
+
+    def get_configure_env(self) -> dict[str, str]:
+        """Return the environment a configure run depends on, so that changing it reconfigures."""
+        return {name: environ[name] for name in _CONFIGURE_ENVIRONMENT if name in environ}
+
+    def get_configure_outputs(self) -> list[Path]:
+        """Return the files whose presence shows an intact build directory."""
+        return [self.build / "CMakeCache.txt"]
+
+    def get_install_prefix(self) -> Path:
+        return self.install or Path(self.root).parent
+
+    def get_file_api_query(self) -> tuple[Path, str]:
+        """Return the CMake File API query asking configure to describe the targets it generates, and its contents."""
+        query = self.build / ".cmake" / "api" / "v1" / "query" / _FILE_API_CLIENT / "query.json"
+        return query, dumps({"requests": [{"kind": "codemodel", "version": 2}]})
+
+    def get_artifacts(self, build_type: str) -> dict[str, str] | None:
+        """Return the libraries the install step put in place, mapped to their paths in the wheel.
+
+        Artifacts are read from the CMake File API reply to ``get_file_api_query``, covering installed
+        shared and module library targets and installed library files. Returns None when there is no
+        reply, e.g. for build directories configured by CMake older than 3.14.
+        """
+        reply = self.build / ".cmake" / "api" / "v1" / "reply"
+        indexes = sorted(reply.glob("index-*.json"))
+        if not indexes:
+            return None
+        responses = loads(indexes[-1].read_text()).get("reply", {}).get(_FILE_API_CLIENT, {}).get("query.json", {}).get("responses", [])
+        codemodel = next((response for response in responses if response.get("kind") == "codemodel"), None)
+        if codemodel is None:
+            return None
+        configurations = loads((reply / codemodel["jsonFile"]).read_text())["configurations"]
+        # Multi-config generators describe every configuration
+        configuration = next((c for c in configurations if c["name"].lower() == build_type.lower()), configurations[0])
+
+        installed = []
+        for reference in configuration["targets"]:
+            target = loads((reply / reference["jsonFile"]).read_text())
+            if target["type"] not in ("SHARED_LIBRARY", "MODULE_LIBRARY") or "install" not in target:
+                continue
+            names = [Path(artifact["path"]).name for artifact in target.get("artifacts", [])]
+            installed.extend(
+                Path(destination["path"]) / name
+                for destination in target["install"]["destinations"]
+                for name in names
+                if name.endswith(_LIBRARY_SUFFIXES)
+            )
+        for reference in configuration["directories"]:
+            # Directory objects, which list installed files, are only written by newer CMake versions
+            if "jsonFile" not in reference:
+                continue
+            for installer in loads((reply / reference["jsonFile"]).read_text()).get("installers", []):
+                if installer["type"] != "file":
+                    continue
+                for path in installer.get("paths", []):
+                    name = path["to"] if isinstance(path, dict) else Path(path).name
+                    if name.endswith(_LIBRARY_SUFFIXES):
+                        installed.append(Path(installer["destination"]) / name)
+
+        prefix = self.get_install_prefix().resolve()
+        cwd = Path.cwd()
+        artifacts = {}
+        for path in installed:
+            # Archive, library and runtime destinations are listed together, so keep only the files that were actually installed there
+            file = (prefix / path).resolve()
+            if not file.is_file():
+                continue
+            if file.is_relative_to(cwd):
+                # Files in the project keep their path in the wheel, as when the project is scanned for libraries
+                source = file.relative_to(cwd)
+                artifacts[str(source)] = source.as_posix()
+            elif not path.is_absolute():
+                artifacts[str(file)] = path.as_posix()
+            else:
+                log.warning("hatch-cpp not including %s in the wheel, it is installed to an absolute path outside the project", file)
+        return artifacts
 
     def generate(self, config) -> dict[str, Any]:
         commands = []
@@ -45,15 +170,27 @@ class HatchCppCmakeConfiguration(BaseModel):
 
         # Hook in to vcpkg if active
         if "vcpkg" in config._active_toolchains:
-            commands[-1] += f" -DCMAKE_TOOLCHAIN_FILE={Path(config.vcpkg.vcpkg_root) / 'scripts' / 'buildsystems' / 'vcpkg.cmake'}"
+            commands[-1] += f" -DCMAKE_TOOLCHAIN_FILE={config.vcpkg.get_vcpkg_root() / 'scripts' / 'buildsystems' / 'vcpkg.cmake'}"
+            # Resolve packages for the same triplet and overlays hatch-cpp installed
+            commands[-1] += f" -DVCPKG_TARGET_TRIPLET={config.vcpkg.get_triplet()}"
+            for variable, directories in (
+                ("VCPKG_OVERLAY_PORTS", config.vcpkg.get_overlay_ports()),
+                ("VCPKG_OVERLAY_TRIPLETS", config.vcpkg.get_overlay_triplets()),
+            ):
+                if directories:
+                    commands[-1] += f' -D{variable}="{";".join(directory.as_posix() for directory in directories)}"'
+            features = config.vcpkg.get_effective_features(config.platform.platform)
+            if features:
+                commands[-1] += f' -DVCPKG_MANIFEST_FEATURES="{";".join(features)}"'
+            if config.vcpkg.vcpkg_no_default_features:
+                commands[-1] += " -DVCPKG_MANIFEST_NO_DEFAULT_FEATURES=ON"
+            if config.vcpkg.vcpkg_home is not None:
+                # Shared worktrees have no vcpkg tool of their own, so use what hatch-cpp installed
+                commands[-1] += f" -DVCPKG_MANIFEST_INSTALL=OFF -DVCPKG_INSTALLED_DIR={config.vcpkg.get_installed_dir().resolve()}"
 
         # Setup install path
-        if self.install:
-            commands[-1] += f" -DCMAKE_INSTALL_PREFIX={self.install}"
-        else:
-            commands[-1] += f" -DCMAKE_INSTALL_PREFIX={Path(self.root).parent}"
+        commands[-1] += f" -DCMAKE_INSTALL_PREFIX={self.get_install_prefix()}"
 
-        # TODO: CMAKE_CXX_COMPILER
         # Respect CMAKE_GENERATOR environment variable
         cmake_generator = environ.get("CMAKE_GENERATOR", "")
         if config.platform.platform == "win32":
@@ -62,6 +199,23 @@ class HatchCppCmakeConfiguration(BaseModel):
             commands[-1] += f' -G "{cmake_generator}"'
         elif cmake_generator:
             commands[-1] += f' -G "{cmake_generator}"'
+        elif which("ninja"):
+            # CMake refuses to switch generators in an existing build directory, so keep whatever it was configured with
+            if _configured_generator(self.build) in ("", "Ninja"):
+                commands[-1] += ' -G "Ninja"'
+
+        # Build with the same compilers, compiler launcher and linker as the vanilla toolchain.
+        # Visual Studio generators pick their own compiler and do not support launchers.
+        if not cmake_generator.startswith("Visual Studio"):
+            for language, command in (("C", config.platform.cc), ("CXX", config.platform.cxx)):
+                compiler, launcher = config.platform.split_launcher(command)
+                commands[-1] += f" -DCMAKE_{language}_COMPILER={compiler}"
+                if launcher:
+                    commands[-1] += f" -DCMAKE_{language}_COMPILER_LAUNCHER={launcher}"
+            linker_flags = " ".join(config.platform.get_linker_flags())
+            if linker_flags:
+                for target in ("EXE", "SHARED", "MODULE"):
+                    commands[-1] += f' -DCMAKE_{target}_LINKER_FLAGS_INIT="{linker_flags}"'
 
         # Put in CMake flags
         args = self.cmake_args.copy()
@@ -89,7 +243,7 @@ class HatchCppCmakeConfiguration(BaseModel):
             commands[-1] += " " + cmake_args_env
 
         # Append build command
-        commands.append(f"cmake --build {self.build} --config {config.build_type}")
+        commands.append(f"cmake --build {self.build} --config {config.build_type} --parallel {config.jobs}")
 
         # Append install command
         commands.append(f"cmake --install {self.build} --config {config.build_type}")
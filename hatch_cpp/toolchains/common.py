@@ -3,13 +3,14 @@ from __future__ import annotations
 from os import environ
 from pathlib import Path
 from re import match
-from shutil import which
-from sys import base_exec_prefix, exec_prefix, executable, platform as sys_platform, version_info
-from sysconfig import get_config_var, get_path
+from sys import platform as sys_platform
 from typing import Any, Literal
 
 from pydantic import AliasChoices, BaseModel, Field, field_validator, model_validator
 
+from ..utils import usable_cpu_count
+from .probe import HatchCppInterpreterProbe, linker_works, probe_interpreter, select_linker, supports_flag
+
 __all__ = (
     "Binding",
     "BuildType",
@@ -17,18 +18,23 @@ __all__ = (
     "HatchCppLibrary",
     "HatchCppPlatform",
     "Language",
+    "NanobindRuntime",
+    "Optimization",
     "Platform",
     "PlatformDefaults",
     "Toolchain",
     "_normalize_rpath",
+    "get_nanobind_dir",
 )
 
 
-BuildType = Literal["debug", "release"]
+BuildType = Literal["debug", "release", "relwithdebinfo", "minsizerel"]
 CompilerToolchain = Literal["gcc", "clang", "msvc"]
 Toolchain = Literal["vcpkg", "cmake", "vanilla"]
 Language = Literal["c", "c++"]
 Binding = Literal["cpython", "pybind11", "nanobind", "generic"]
+NanobindRuntime = Literal["embedded", "static", "shared"]
+Optimization = Literal["lto", "thin-lto", "no-semantic-interposition", "no-plt", "native"]
 Platform = Literal["linux", "darwin", "win32", "emscripten"]
 PlatformDefaults = {
     "linux": {"CC": "gcc", "CXX": "g++", "LD": "ld"},
@@ -37,6 +43,23 @@ PlatformDefaults = {
     "emscripten": {"CC": "emcc", "CXX": "em++", "LD": "wasm-ld"},
 }
 
+# Match CMake's CMAKE_<LANG>_FLAGS_<CONFIG> defaults
+_BUILD_TYPE_FLAGS = {
+    "gcc": {
+        "debug": ["-O0", "-g"],
+        "release": ["-O3", "-DNDEBUG"],
+        "relwithdebinfo": ["-O2", "-g", "-DNDEBUG"],
+        "minsizerel": ["-Os", "-DNDEBUG"],
+    },
+    # /FS serializes writes to the shared vc*.pdb, which objects compiled concurrently would otherwise contend for (C1041)
+    "msvc": {
+        "debug": ["/Od", "/Zi", "/FS"],
+        "release": ["/O2", "/DNDEBUG"],
+        "relwithdebinfo": ["/O2", "/Zi", "/FS", "/DNDEBUG"],
+        "minsizerel": ["/O1", "/DNDEBUG"],
+    },
+}
+
 
 class HatchCppLibrary(BaseModel, validate_assignment=True):
     """A C++ library."""
@@ -47,6 +70,11 @@ class HatchCppLibrary(BaseModel, validate_assignment=True):
 
     binding: Binding = "cpython"
     std: str | None = None
+    nanobind_runtime: NanobindRuntime = Field(
+        default="embedded",
+        alias=AliasChoices("nanobind_runtime", "nanobind-runtime"),
+        description="Compile nanobind's runtime into the extension, or link a cached static or shared libnanobind",
+    )
 
     include_dirs: list[str] = Field(default_factory=list, alias=AliasChoices("include_dirs", "include-dirs"))
     include_dirs_linux: list[str] = Field(default_factory=list, alias=AliasChoices("include_dirs_linux", "include-dirs-linux"))
@@ -93,6 +121,32 @@ class HatchCppLibrary(BaseModel, validate_assignment=True):
 
     py_limited_api: str | None = Field(default="", alias=AliasChoices("py_limited_api", "py-limited-api"))
 
+    unity_build: bool = Field(default=False, alias=AliasChoices("unity_build", "unity-build"))
+    unity_batch_size: int = Field(default=8, ge=1, alias=AliasChoices("unity_batch_size", "unity-batch-size"))
+    unity_exclude: list[str] = Field(
+        default_factory=list,
+        alias=AliasChoices("unity_exclude", "unity-exclude"),
+        description="Sources compiled on their own in unity builds, e.g. because they do not combine cleanly with others",
+    )
+    interpreter_independent_sources: list[str] = Field(
+        default_factory=list,
+        alias=AliasChoices("interpreter_independent_sources", "interpreter-independent-sources"),
+        description="Sources that do not include Python.h, directly or through the binding, compiled on their own and only once "
+        "for all of the build's interpreters",
+    )
+
+    optimizations: list[Optimization] = Field(
+        default_factory=list,
+        description="Performance presets: lto or thin-lto, no-semantic-interposition, no-plt, and native for builds that only run on the build host",
+    )
+
+    precompiled_headers: bool = Field(default=False, alias=AliasChoices("precompiled_headers", "precompiled-headers"))
+    precompiled_header_includes: list[str] = Field(
+        default_factory=list,
+        alias=AliasChoices("precompiled_header_includes", "precompiled-header-includes"),
+        description="Extra headers to precompile along with the binding headers, e.g. pybind11/stl.h",
+    )
+
     @field_validator("py_limited_api", mode="before")
     @classmethod
     def check_py_limited_api(cls, value: Any) -> Any:
@@ -100,14 +154,25 @@ class HatchCppLibrary(BaseModel, validate_assignment=True):
             raise ValueError("py-limited-api must be in the form of cp3X")
         return value
 
-    def get_qualified_name(self, platform):
+    @field_validator("optimizations")
+    @classmethod
+    def check_optimizations(cls, value: list[str]) -> list[str]:
+        if "lto" in value and "thin-lto" in value:
+            raise ValueError("optimizations must not contain both lto and thin-lto")
+        return value
+
+    def get_qualified_name(self, platform, interpreter: HatchCppInterpreterProbe | None = None):
+        """Return the library's filename, for ``interpreter`` or else the building interpreter.
+
+        pybind11 and nanobind extensions only carry the interpreter's suffix when built for a given ``interpreter``.
+        """
+        probe = interpreter or probe_interpreter()
         if platform == "emscripten":
             if self.binding == "generic":
                 return f"{self.name}.wasm"
-            return f"{self.name}.cpython-{version_info.major}{version_info.minor}-wasm32-emscripten.so"
-        if self.binding == "cpython" and not self.py_limited_api:
-            suffix = get_config_var("EXT_SUFFIX")
-            return f"{self.name}{suffix}"
+            return f"{self.name}.cpython-{probe.version.replace('.', '')}-wasm32-emscripten.so"
+        if not self.py_limited_api and (self.binding == "cpython" or (interpreter is not None and self.binding != "generic")):
+            return f"{self.name}{probe.ext_suffix}"
         if platform == "win32":
             suffix = "dll" if self.binding == "generic" else "pyd"
         elif platform == "darwin":
@@ -118,6 +183,25 @@ class HatchCppLibrary(BaseModel, validate_assignment=True):
             return f"{self.name}.abi3.{suffix}"
         return f"{self.name}.{suffix}"
 
+    def get_unity_batches(self) -> list[list[str]]:
+        """Group sources into unity translation units; excluded sources form batches of their own."""
+        if not self.unity_build:
+            return [[source] for source in self.sources]
+        excluded = [source for source in self.sources if source in self.unity_exclude or source in self.interpreter_independent_sources]
+        combined = [source for source in self.sources if source not in excluded]
+        batches = [combined[i : i + self.unity_batch_size] for i in range(0, len(combined), self.unity_batch_size)]
+        return [*batches, *([source] for source in excluded)]
+
+    def get_precompiled_header_includes(self) -> list[str]:
+        """Get the headers to precompile: the binding's headers followed by any extra headers."""
+        includes = {
+            "cpython": ["Python.h"],
+            "pybind11": ["pybind11/pybind11.h"],
+            "nanobind": ["nanobind/nanobind.h"],
+            "generic": [],
+        }[self.binding]
+        return [*includes, *self.precompiled_header_includes]
+
     @model_validator(mode="after")
     def check_binding_and_py_limited_api(self):
         if self.binding == "pybind11" and self.py_limited_api:
@@ -215,13 +299,20 @@ class HatchCppLibrary(BaseModel, validate_assignment=True):
         return macros
 
 
+def get_nanobind_dir() -> Path:
+    """Return the root of the nanobind package, holding its headers, sources and vendored dependencies."""
+    if not probe_interpreter().nanobind_dir:
+        raise ModuleNotFoundError("nanobind is required to build libraries with binding = 'nanobind'")
+    return Path(probe_interpreter().nanobind_dir)
+
+
 def _normalize_rpath(value: str, platform: Platform) -> str:
     r"""Translate and escape rpath values for the target platform.
 
     - On macOS (darwin): ``$ORIGIN`` is replaced with ``@loader_path``.
     - On Linux: ``@loader_path`` is replaced with ``$ORIGIN``, and
-      ``$ORIGIN`` is escaped as ``\$ORIGIN`` so that ``os.system()``
-      (which invokes a shell) passes it through literally.
+      ``$ORIGIN`` is escaped as ``\$ORIGIN`` so that it passes through
+      the shell-style splitting of build commands literally.
     - On Windows: no transformation is applied (Windows does not use
       rpath).
     """
@@ -232,7 +323,7 @@ def _normalize_rpath(value: str, platform: Platform) -> str:
     elif platform == "linux":
         # Translate macOS rpath to Linux equivalent
         value = value.replace("@loader_path", "$ORIGIN")
-        # Escape $ORIGIN for shell safety (os.system runs through bash)
+        # Escape $ORIGIN so that shell-style command splitting keeps it literal
         value = value.replace("$ORIGIN", r"\$ORIGIN")
     return value
 
@@ -244,6 +335,7 @@ class HatchCppPlatform(BaseModel):
     platform: Platform
     toolchain: CompilerToolchain
     disable_ccache: bool = False
+    launcher: str = Field(default="", description="Compiler launcher such as ccache or sccache; defaults to ccache when it is on the PATH.")
 
     @staticmethod
     def default() -> HatchCppPlatform:
@@ -267,23 +359,28 @@ class HatchCppPlatform(BaseModel):
         else:
             toolchain = "gcc"
 
-        # TODO:
-        # https://github.com/rui314/mold/issues/647
-        # if which("ld.mold"):
-        #     LD = which("ld.mold")
-        # elif which("ld.lld"):
-        #     LD = which("ld.lld")
+        # Prefer the fastest linker that passes a test link, unless one was chosen explicitly
+        if "LD" not in environ and platform == "linux" and toolchain in ("gcc", "clang"):
+            LD = select_linker(CC) or LD
         return HatchCppPlatform(cc=CC, cxx=CXX, ld=LD, platform=platform, toolchain=toolchain)
 
     @model_validator(mode="wrap")
     @classmethod
     def validate_model(cls, data, handler):
         model = handler(data)
-        if which("ccache") and model.platform != "emscripten" and not model.disable_ccache and model.toolchain in ["gcc", "clang"]:
-            if not model.cc.startswith("ccache "):
-                model.cc = f"ccache {model.cc}"
-            if not model.cxx.startswith("ccache "):
-                model.cxx = f"ccache {model.cxx}"
+        if (
+            not model.launcher
+            and probe_interpreter().ccache
+            and model.platform != "emscripten"
+            and not model.disable_ccache
+            and model.toolchain in ["gcc", "clang"]
+        ):
+            model.launcher = "ccache"
+        if model.launcher:
+            if not model.cc.startswith(f"{model.launcher} "):
+                model.cc = f"{model.launcher} {model.cc}"
+            if not model.cxx.startswith(f"{model.launcher} "):
+                model.cxx = f"{model.launcher} {model.cxx}"
         return model
 
     @staticmethod
@@ -292,35 +389,187 @@ class HatchCppPlatform(BaseModel):
         platform.toolchain = toolchain
         return platform
 
-    def get_compile_flags(self, library: HatchCppLibrary, build_type: BuildType = "release") -> str:
+    def split_launcher(self, compiler: str) -> tuple[str, str]:
+        """Split a compiler command into the compiler itself and the launcher wrapping it, if any."""
+        if self.launcher and compiler.startswith(f"{self.launcher} "):
+            return compiler[len(self.launcher) + 1 :], self.launcher
+        return compiler, ""
+
+    def get_object_path(self, build_dir: Path, stem: str) -> Path:
+        """Return the object file path for a translation unit."""
+        return build_dir / f"{stem}{'.obj' if self.toolchain == 'msvc' else '.o'}"
+
+    def get_depfile_path(self, obj: Path) -> Path | None:
+        """Return the dependency file the compiler writes next to an object, if the toolchain supports it."""
+        if self.toolchain == "msvc":
+            return None
+        return obj.with_suffix(".d")
+
+    def get_compile_command(self, compiler: str, source: str, compile_flags: str, obj: Path) -> str:
+        """Return the command compiling a single source into an object file."""
+        if self.toolchain == "msvc":
+            return f"{compiler} /c {source} {compile_flags.strip()} /Fo:{obj}"
+        return f"{compiler} -c {source} {compile_flags.strip()} -MMD -MF {self.get_depfile_path(obj)} -o {obj}"
+
+    def get_precompiled_header_path(self, header: Path) -> Path:
+        """Return the precompiled header built from a header; gcc finds ``.gch`` files next to the header by itself."""
+        return header.with_name(f"{header.name}{'.gch' if self.toolchain == 'gcc' else '.pch'}")
+
+    def get_precompiled_header_command(self, compiler: str, language: Language, header: Path, compile_flags: str, pch: Path) -> str:
+        """Return the command precompiling a header with the same flags as the sources that use it."""
+        kind = "c-header" if language == "c" else "c++-header"
+        return f"{compiler} -x {kind} {header} {compile_flags.strip()} -MMD -MF {self.get_depfile_path(pch)} -o {pch}"
+
+    def get_precompiled_header_flags(self, header: Path, pch: Path) -> str:
+        """Return the flags injecting a precompiled header into every compile."""
+        if self.toolchain == "gcc":
+            return f" -include {header}"
+        return f" -include-pch {pch}"
+
+    def get_preprocess_command(self, compiler: str, source: str, compile_flags: str) -> str:
+        """Return the command printing the preprocessed source to stdout."""
+        if self.toolchain == "msvc":
+            return f"{compiler} /E {source} {compile_flags.strip()}"
+        return f"{compiler} -E {source} {compile_flags.strip()}"
+
+    def get_library_path(self, directory: Path, name: str, shared: bool) -> Path:
+        """Return the path of a static or shared library built with this toolchain."""
+        if self.toolchain == "msvc":
+            return directory / f"{name}{'.dll' if shared else '.lib'}"
+        if not shared:
+            return directory / f"lib{name}.a"
+        return directory / f"lib{name}{'.dylib' if self.platform == 'darwin' else '.so'}"
+
+    def get_static_library_command(self, objects: list[Path], output: Path) -> str:
+        """Return the command archiving objects into a static library."""
+        if self.toolchain == "msvc":
+            return f"lib /nologo {' '.join(str(obj) for obj in objects)} /OUT:{output}"
+        if self.platform == "emscripten":
+            return f"emar rcs {output} {' '.join(str(obj) for obj in objects)}"
+        return f"ar rcs {output} {' '.join(str(obj) for obj in objects)}"
+
+    def get_shared_library_command(
+        self, compiler: str, objects: list[Path], output: Path, interpreter: HatchCppInterpreterProbe | None = None
+    ) -> str:
+        """Return the command linking objects into a shared library that extensions load from their own directory."""
+        objs = " ".join(str(obj) for obj in objects)
+        if self.toolchain == "msvc":
+            libs_path = self.get_python_libs_dir(interpreter)
+            return f"{compiler} {objs} /LD /Fe:{output} /link /DLL{f' /LIBPATH:{libs_path!s}' if libs_path else ''}"
+        if self.platform == "darwin":
+            return f"{compiler} {objs} -shared -undefined dynamic_lookup -Wl,-install_name,@rpath/{output.name} -o {output}"
+        return f"{compiler} {objs} -shared -Wl,-soname,{output.name} -o {output}"
+
+    def get_library_link_flags(self, library_path: Path, shared: bool) -> str:
+        """Return the flags linking an extension against a library built by ``get_library_path``."""
+        if self.toolchain == "msvc":
+            # Shared libraries are linked through the import library written next to the DLL
+            return str(library_path.with_suffix(".lib"))
+        if shared:
+            return f"{library_path} {_normalize_rpath('-Wl,-rpath,$ORIGIN', self.platform)}"
+        return str(library_path)
+
+    def get_copy_command(self, source: Path, destination: Path) -> str:
+        """Return the command copying a file."""
+        if self.platform == "win32":
+            return f'cmd /c copy /y "{source}" "{destination}"'
+        return f"cp {source} {destination}"
+
+    def get_python_libs_dir(self, interpreter: HatchCppInterpreterProbe | None = None) -> Path | None:
+        """Return the directory holding ``pythonXY.lib`` on Windows."""
+        libs_dir = (interpreter or probe_interpreter()).libs_dir
+        return Path(libs_dir) if libs_dir else None
+
+    def get_build_type_flags(self, build_type: BuildType) -> list[str]:
+        """Return the optimization and debug info flags of a build profile."""
+        return list(_BUILD_TYPE_FLAGS["msvc" if self.toolchain == "msvc" else "gcc"][build_type])
+
+    def get_optimization_flags(self, library: HatchCppLibrary) -> tuple[list[str], list[str]]:
+        """Return the compile and link flags of a library's performance presets.
+
+        Presets without an equivalent on the toolchain or platform, or that the compiler
+        rejects, are ignored.
+        """
+        compile_flags, link_flags = [], []
+        lto = "lto" in library.optimizations or "thin-lto" in library.optimizations
+        if self.toolchain == "msvc":
+            if lto:
+                compile_flags.append("/GL")
+                link_flags.append("/LTCG")
+            return compile_flags, link_flags
+        compiler = self.cc if library.language == "c" else self.cxx
+        if lto:
+            # gcc has no ThinLTO; its parallel -flto=auto partitions the link in a similar way
+            if self.toolchain == "gcc":
+                lto_flag = "-flto=auto" if supports_flag(compiler, "-flto=auto") else "-flto"
+            else:
+                lto_flag = "-flto=thin" if "thin-lto" in library.optimizations else "-flto"
+            compile_flags.append(lto_flag)
+            link_flags.append(lto_flag)
+        presets = []
+        if "no-semantic-interposition" in library.optimizations:
+            presets.append("-fno-semantic-interposition")
+        if "no-plt" in library.optimizations and self.platform == "linux":
+            presets.append("-fno-plt")
+        if "native" in library.optimizations and self.platform != "emscripten":
+            presets.append("-march=native")
+        compile_flags.extend(flag for flag in presets if supports_flag(compiler, flag))
+        return compile_flags, link_flags
+
+    def get_linker_flags(self, library: HatchCppLibrary | None = None) -> list[str]:
+        """Return the flags selecting a fast linker and its thread count.
+
+        With ``library``, the linker must also link with the library's LTO flags, or the
+        compiler's default linker is kept.
+        """
+        # Default to the CPUs this process may use rather than every CPU on the host
+        threads = usable_cpu_count()
+        if "mold" in self.ld:
+            linker, flags = "mold", [f"-Wl,--thread-count={threads}"]
+        elif "lld" in self.ld:
+            linker, flags = "lld", [f"-Wl,--threads={threads}"]
+        elif "gold" in self.ld:
+            linker, flags = "gold", ["-Wl,--threads", f"-Wl,--thread-count={threads}"]
+        else:
+            return []
+        if library is not None:
+            # LTO needs the compiler's linker plugin: gcc's does not load into lld, and clang's needs LLVMgold for gold or bfd
+            lto_flags = self.get_optimization_flags(library)[1]
+            compiler, _ = self.split_launcher(self.cc if library.language == "c" else self.cxx)
+            if lto_flags and not linker_works(compiler, linker, tuple(lto_flags)):
+                return []
+        return [f"-fuse-ld={linker}", *flags]
+
+    def get_compile_flags(
+        self, library: HatchCppLibrary, build_type: BuildType = "release", interpreter: HatchCppInterpreterProbe | None = None
+    ) -> str:
         flags = ""
+        interpreter = interpreter or probe_interpreter()
 
         # Get effective platform-specific values
         effective_include_dirs = library.get_effective_include_dirs(self.platform)
         effective_compile_args = library.get_effective_compile_args(self.platform)
         effective_define_macros = library.get_effective_define_macros(self.platform)
         effective_undef_macros = library.get_effective_undef_macros(self.platform)
-        effective_extra_objects = library.get_effective_extra_objects(self.platform)
-        effective_link_args = library.get_effective_link_args(self.platform)
 
         # Python.h
         if library.binding != "generic":
-            effective_include_dirs.append(get_path("include"))
+            effective_include_dirs.append(interpreter.include)
 
         if library.binding == "pybind11":
-            import pybind11
-
-            effective_include_dirs.append(pybind11.get_include())
+            if not interpreter.pybind11_include:
+                raise ModuleNotFoundError("pybind11 is required to build libraries with binding = 'pybind11'")
+            effective_include_dirs.append(interpreter.pybind11_include)
             if not library.std:
                 library.std = "c++11"
         elif library.binding == "nanobind":
-            import nanobind
-
-            effective_include_dirs.append(nanobind.include_dir())
+            nanobind_dir = get_nanobind_dir()
+            effective_include_dirs.append(str(nanobind_dir / "include"))
             if not library.std:
                 library.std = "c++17"
-            library.sources.append(str(Path(nanobind.include_dir()).parent / "src" / "nb_combined.cpp"))
-            effective_include_dirs.append(str(Path(nanobind.include_dir()).parent / "ext" / "robin_map" / "include"))
+            effective_include_dirs.append(str(nanobind_dir / "ext" / "robin_map" / "include"))
+            if library.nanobind_runtime == "shared":
+                effective_define_macros.append("NB_SHARED")
 
         if library.py_limited_api:
             if library.binding == "pybind11":
@@ -349,8 +598,6 @@ class HatchCppPlatform(BaseModel):
         elif self.toolchain == "msvc":
             flags += " ".join(f"/I{d}" for d in effective_include_dirs)
             flags += " " + " ".join(effective_compile_args)
-            flags += " " + " ".join(effective_link_args)
-            flags += " " + " ".join(effective_extra_objects)
             flags += " " + " ".join(f"/D{macro}" for macro in effective_define_macros)
             flags += " " + " ".join(f"/U{macro}" for macro in effective_undef_macros)
             flags += " /EHsc /DWIN32"
@@ -358,12 +605,13 @@ class HatchCppPlatform(BaseModel):
                 # MSVC minimum is c++14; clamp older standards
                 std = library.std if library.std not in ("c++11", "c++0x") else "c++14"
                 flags += f" /std:{std}"
+        flags += " " + " ".join([*self.get_build_type_flags(build_type), *self.get_optimization_flags(library)[0]])
         # clean
         while flags.count("  "):
             flags = flags.replace("  ", " ")
         return flags
 
-    def get_link_flags(self, library: HatchCppLibrary, build_type: BuildType = "release") -> str:
+    def get_link_flags(self, library: HatchCppLibrary, build_type: BuildType = "release", interpreter: HatchCppInterpreterProbe | None = None) -> str:
         flags = ""
         effective_link_args = library.get_effective_link_args(self.platform)
         effective_extra_objects = library.get_effective_extra_objects(self.platform)
@@ -379,33 +627,27 @@ class HatchCppPlatform(BaseModel):
             flags += " " + " ".join(effective_extra_objects)
             flags += " " + " ".join(f"-l{lib}" for lib in effective_libraries)
             flags += " " + " ".join(f"-L{lib}" for lib in effective_library_dirs)
-            flags += f" -o {library.get_qualified_name(self.platform)}"
+            flags += f" -o {library.get_qualified_name(self.platform, interpreter)}"
             if self.platform == "darwin":
                 flags += " -undefined dynamic_lookup"
-            if "mold" in self.ld:
-                flags += f" -fuse-ld={self.ld}"
-            elif "lld" in self.ld:
-                flags += " -fuse-ld=lld"
+            flags += "".join(f" {flag}" for flag in self.get_linker_flags(library))
+            lto_flags = self.get_optimization_flags(library)[1]
+            if lto_flags:
+                # Link-time code generation runs at the optimization level of the build profile
+                flags += " " + " ".join([*lto_flags, *(flag for flag in self.get_build_type_flags(build_type) if flag.startswith("-O"))])
         elif self.toolchain == "msvc":
             flags += " " + " ".join(effective_link_args)
             flags += " " + " ".join(effective_extra_objects)
             flags += " /LD"
-            flags += f" /Fe:{library.get_qualified_name(self.platform)}"
+            flags += f" /Fe:{library.get_qualified_name(self.platform, interpreter)}"
             flags += " /link /DLL"
+            if "/Zi" in self.get_build_type_flags(build_type):
+                flags += " /DEBUG"
+            flags += " " + " ".join(self.get_optimization_flags(library)[1])
             # Add Python libs directory - check multiple possible locations
-            # In virtual environments, sys.executable is in the venv, but pythonXX.lib
-            # lives under the base Python installation's 'libs' directory.
-            python_libs_paths = [
-                Path(executable).parent / "libs",  # Standard Python install
-                Path(executable).parent.parent / "libs",  # Some virtualenv layouts
-                Path(get_config_var("installed_base") or "") / "libs",  # sysconfig approach
-                Path(exec_prefix) / "libs",  # exec_prefix approach
-                Path(base_exec_prefix) / "libs",  # base_exec_prefix approach
-            ]
-            for libs_path in python_libs_paths:
-                if libs_path.exists():
-                    flags += f" /LIBPATH:{libs_path!s}"
-                    break
+            libs_path = self.get_python_libs_dir(interpreter)
+            if libs_path:
+                flags += f" /LIBPATH:{libs_path!s}"
             flags += " " + " ".join(f"{lib}.lib" for lib in effective_libraries)
             flags += " " + " ".join(f"/LIBPATH:{lib}" for lib in effective_library_dirs)
         # clean
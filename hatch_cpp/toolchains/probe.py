@@ -0,0 +1,297 @@
+from __future__ import annotations
+
+from functools import cache
+from hashlib import sha256
+from json import dumps, loads
+from os import environ, getpid, replace
+from pathlib import Path
+from shlex import split
+from shutil import which
+from subprocess import PIPE, STDOUT, SubprocessError, run
+from sys import base_exec_prefix, exec_prefix, executable, implementation, version, version_info
+from sysconfig import get_config_var, get_path
+from tempfile import TemporaryDirectory
+from threading import Lock, get_ident
+
+from pydantic import BaseModel, Field
+
+from ..incremental import compiler_identity
+from ..utils import user_cache_dir
+
+__all__ = (
+    "FAST_LINKERS",
+    "HatchCppCompilerProbe",
+    "HatchCppInterpreterProbe",
+    "linker_works",
+    "probe_compiler",
+    "probe_interpreter",
+    "select_linker",
+    "supports_flag",
+)
+
+# Fastest first
+FAST_LINKERS = ("mold", "lld", "gold")
+
+# Isolated build environments are new interpreters every time, so old entries are dropped past this many
+_MAX_PROBES = 256
+
+_probes_lock = Lock()
+
+
+class HatchCppInterpreterProbe(BaseModel):
+    """What hatch-cpp needs to know about an interpreter to build for, and the building environment."""
+
+    include: str = Field(description="Directory holding Python.h.")
+    ext_suffix: str = Field(description="Filename suffix of extension modules, e.g. .cpython-312-x86_64-linux-gnu.so.")
+    version: str = Field(default="", description="Major and minor version, e.g. 3.12.")
+    python_tag: str = Field(default="", description="Python tag of wheels for the interpreter, e.g. cp312 or pp310.")
+    abi_tag: str = Field(default="", description="ABI tag of wheels for the interpreter, e.g. cp312, cp313t or pypy310_pp73.")
+    libs_dir: str = Field(default="", description="Directory holding pythonXY.lib, on Windows.")
+    ccache: str = Field(default="", description="Path of ccache, if it is on the PATH.")
+    pybind11_include: str = ""
+    nanobind_dir: str = Field(default="", description="Root of the nanobind package, holding include/, src/ and ext/.")
+    nanobind_version: str = ""
+
+
+class HatchCppCompilerProbe(BaseModel):
+    """Version of a compiler."""
+
+    version: str = Field(default="", description="Version banner, e.g. the output of g++ --version.")
+
+
+def _probes_path() -> Path:
+    return user_cache_dir() / "probes.json"
+
+
+def _load_probes() -> dict:
+    try:
+        return loads(_probes_path().read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def _store_probe(key: str, value) -> None:
+    path = _probes_path()
+    with _probes_lock:
+        probes = _load_probes()
+        probes.pop(key, None)
+        probes[key] = value
+        probes = dict(list(probes.items())[-_MAX_PROBES:])
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Concurrent builds may probe at the same time; replacing the file keeps it readable for all of them
+        temporary = path.with_name(f"{path.name}.{getpid()}.{get_ident()}.tmp")
+        temporary.write_text(dumps(probes, indent=2))
+        replace(temporary, path)
+
+
+def _run(argv: list[str], **kwargs) -> tuple[int, str]:
+    try:
+        process = run(argv, stdout=PIPE, stderr=STDOUT, check=False, timeout=60, **kwargs)
+    except (OSError, SubprocessError):
+        return -1, ""
+    return process.returncode, process.stdout.decode(errors="replace")
+
+
+def _is_msvc(compiler: str) -> bool:
+    return Path(split(compiler)[-1]).stem.lower() == "cl"
+
+
+def _interpreter_key() -> str:
+    # Installing or upgrading packages changes the site-packages directory, which invalidates the probe
+    purelib = Path(get_path("purelib"))
+    try:
+        packages = purelib.stat().st_mtime_ns
+    except OSError:
+        packages = 0
+    identity = "\0".join((executable, version, str(purelib), str(packages), environ.get("PATH", "")))
+    return f"interpreter:{sha256(identity.encode()).hexdigest()}"
+
+
+def _probe_python_libs_dir(
+    executable: str = executable, installed_base: str = "", exec_prefix: str = exec_prefix, base_exec_prefix: str = base_exec_prefix
+) -> str:
+    # In virtual environments, sys.executable is in the venv, but pythonXX.lib
+    # lives under the base Python installation's 'libs' directory.
+    python_libs_paths = [
+        Path(executable).parent / "libs",  # Standard Python install
+        Path(executable).parent.parent / "libs",  # Some virtualenv layouts
+        Path(installed_base) / "libs",  # sysconfig approach
+        Path(exec_prefix) / "libs",  # exec_prefix approach
+        Path(base_exec_prefix) / "libs",  # base_exec_prefix approach
+    ]
+    for libs_path in python_libs_paths:
+        if libs_path.exists():
+            return str(libs_path)
+    return ""
+
+
+def _wheel_tags(name: str, major: int, minor: int, soabi: str | None) -> tuple[str, str]:
+    """Return the python and ABI tags of an interpreter, e.g. ``("cp312", "cp312")`` or ``("pp310", "pypy310_pp73")``."""
+    python_tag = f"{'cp' if name == 'cpython' else 'pp' if name == 'pypy' else name}{major}{minor}"
+    if not soabi:
+        # CPython on Windows has no SOABI before 3.13
+        return python_tag, python_tag
+    parts = soabi.split("-")
+    if parts[0] == "cpython":
+        # cpython-313t-x86_64-linux-gnu
+        return python_tag, f"cp{parts[1]}"
+    if name == "cpython":
+        # cp313-win_amd64
+        return python_tag, parts[0]
+    return python_tag, "_".join(parts[:2])
+
+
+# Run by other interpreters to describe themselves
+_INTERPRETER_SCRIPT = """
+import json, sys, sysconfig
+print(json.dumps({
+    "executable": sys.executable,
+    "name": sys.implementation.name,
+    "version": list(sys.version_info[:2]),
+    "soabi": sysconfig.get_config_var("SOABI"),
+    "include": sysconfig.get_path("include"),
+    "ext_suffix": sysconfig.get_config_var("EXT_SUFFIX") or "",
+    "installed_base": sysconfig.get_config_var("installed_base") or "",
+    "exec_prefix": sys.exec_prefix,
+    "base_exec_prefix": sys.base_exec_prefix,
+}))
+"""
+
+
+@cache
+def probe_interpreter(interpreter: str = "") -> HatchCppInterpreterProbe:
+    """Locate Python's headers, ccache and the binding libraries once, cached on disk per interpreter and environment.
+
+    ``interpreter`` names another Python to build extensions for; its headers, suffix and tags are
+    probed by running it, while ccache and the binding libraries still come from the building environment.
+    """
+    if interpreter:
+        return _probe_other_interpreter(interpreter)
+    key = _interpreter_key()
+    cached = _load_probes().get(key)
+    if cached is not None:
+        probe = HatchCppInterpreterProbe.model_validate(cached)
+        # Fall back to probing if anything moved since
+        if probe.python_tag and all(
+            Path(path).exists() for path in (probe.include, probe.ccache, probe.pybind11_include, probe.nanobind_dir) if path
+        ):
+            return probe
+
+    python_tag, abi_tag = _wheel_tags(implementation.name, version_info.major, version_info.minor, get_config_var("SOABI"))
+    probe = HatchCppInterpreterProbe(
+        include=get_path("include"),
+        ext_suffix=get_config_var("EXT_SUFFIX") or "",
+        version=f"{version_info.major}.{version_info.minor}",
+        python_tag=python_tag,
+        abi_tag=abi_tag,
+        libs_dir=_probe_python_libs_dir(installed_base=get_config_var("installed_base") or ""),
+        ccache=which("ccache") or "",
+    )
+    try:
+        import pybind11
+
+        probe.pybind11_include = pybind11.get_include()
+    except ImportError:
+        pass
+    try:
+        import nanobind
+
+        probe.nanobind_dir = str(Path(nanobind.include_dir()).parent)
+        probe.nanobind_version = nanobind.__version__
+    except ImportError:
+        pass
+    _store_probe(key, probe.model_dump())
+    return probe
+
+
+def _probe_other_interpreter(interpreter: str) -> HatchCppInterpreterProbe:
+    path = which(interpreter)
+    if path is None:
+        raise ValueError(f"Python interpreter {interpreter} not found")
+    environment = probe_interpreter().model_dump(include={"ccache", "pybind11_include", "nanobind_dir", "nanobind_version"})
+    key = f"interpreter:{compiler_identity(path)}"
+    cached = _load_probes().get(key)
+    if cached is not None and Path(cached["include"]).exists():
+        return HatchCppInterpreterProbe(**cached, **environment)
+
+    returncode, output = _run([path, "-c", _INTERPRETER_SCRIPT])
+    if returncode != 0:
+        raise ValueError(f"Could not probe Python interpreter {interpreter}: {output.strip()}")
+    # Anything the interpreter warns about on stderr comes first
+    facts = loads(output.strip().splitlines()[-1])
+    python_tag, abi_tag = _wheel_tags(facts["name"], *facts["version"], facts["soabi"])
+    probe = HatchCppInterpreterProbe(
+        include=facts["include"],
+        ext_suffix=facts["ext_suffix"],
+        version="{}.{}".format(*facts["version"]),
+        python_tag=python_tag,
+        abi_tag=abi_tag,
+        libs_dir=_probe_python_libs_dir(facts["executable"], facts["installed_base"], facts["exec_prefix"], facts["base_exec_prefix"]),
+    )
+    _store_probe(key, probe.model_dump(exclude=set(environment)))
+    return probe.model_copy(update=environment)
+
+
+@cache
+def probe_compiler(compiler: str) -> HatchCppCompilerProbe:
+    """Query a compiler's version once, cached on disk by its path, size and mtime."""
+    key = f"compiler:{compiler_identity(compiler)}"
+    cached = _load_probes().get(key)
+    if cached is not None:
+        return HatchCppCompilerProbe.model_validate(cached)
+
+    argv = split(compiler)
+    probe = HatchCppCompilerProbe()
+    # cl prints its banner when run without arguments
+    _, probe.version = _run(argv if _is_msvc(compiler) else [*argv, "--version"])
+    probe.version = probe.version.strip() or compiler
+    if probe.version != compiler:
+        _store_probe(key, probe.model_dump())
+    return probe
+
+
+@cache
+def supports_flag(compiler: str, flag: str) -> bool:
+    """Whether a gcc-style compiler accepts a compile flag without warnings, cached on disk per compiler.
+
+    Compilers that cannot be run are assumed to support the flag, so that plans for other
+    machines are generated as requested.
+    """
+    if _is_msvc(compiler):
+        return True
+    key = f"flag:{flag}:{compiler_identity(compiler)}"
+    probes = _load_probes()
+    if key in probes:
+        return probes[key]
+    with TemporaryDirectory() as directory:
+        source = Path(directory) / "probe.c"
+        source.write_text("int hatch_cpp_probe(void) { return 0; }\n")
+        returncode, _ = _run([*split(compiler), "-Werror", flag, "-c", str(source), "-o", str(Path(directory) / "probe.o")])
+    if returncode == -1:
+        return True
+    _store_probe(key, returncode == 0)
+    return returncode == 0
+
+
+@cache
+def linker_works(compiler: str, linker: str, flags: tuple[str, ...] = ()) -> bool:
+    """Whether ``compiler -fuse-ld=linker`` can link a shared library with ``flags``, cached on disk per compiler."""
+    key = f"linker:{' '.join((linker, *flags))}:{compiler_identity(compiler)}"
+    probes = _load_probes()
+    if key in probes:
+        return probes[key]
+    with TemporaryDirectory() as directory:
+        source = Path(directory) / "probe.c"
+        source.write_text("int hatch_cpp_probe(void) { return 0; }\n")
+        command = [*split(compiler), "-shared", "-fPIC", f"-fuse-ld={linker}", *flags, str(source), "-o", str(Path(directory) / "probe.so")]
+        returncode, _ = _run(command)
+    _store_probe(key, returncode == 0)
+    return returncode == 0
+
+
+def select_linker(compiler: str) -> str | None:
+    """Return the fastest linker that works with ``compiler``, or None to keep the compiler's default."""
+    for linker in FAST_LINKERS:
+        if linker_works(compiler, linker):
+            return linker
+    return None
@@ -2,12 +2,18 @@ from __future__ import annotations
 
 import configparser
 import subprocess
+from hashlib import sha256
 from pathlib import Path
 from platform import machine as platform_machine
+from re import MULTILINE, findall, sub
+from shutil import rmtree
 from sys import platform as sys_platform
-from typing import Literal
+from typing import Literal, get_args
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator, model_validator
+
+from ..utils import directory_size, file_lock, parse_size
+from .common import Platform
 
 __all__ = ("HatchCppVcpkgConfiguration",)
 
@@ -41,6 +47,17 @@ VcpkgPlatformDefaults = {
     ("win32", "arm64"): "arm64-windows-static-md",
     ("emscripten", "wasm32"): "wasm32-emscripten",
 }
+VcpkgBinaryCacheMode = Literal["read", "write", "readwrite"]
+
+_RELEASE_TRIPLET = """# Generated by hatch-cpp: {triplet}, building release configurations only
+foreach(directory IN ITEMS {directories})
+    if(EXISTS "${{directory}}/{triplet}.cmake")
+        include("${{directory}}/{triplet}.cmake")
+        break()
+    endif()
+endforeach()
+set(VCPKG_BUILD_TYPE release)
+"""
 
 
 def _read_vcpkg_ref_from_gitmodules(vcpkg_root: Path) -> str | None:
@@ -63,18 +80,110 @@ def _read_vcpkg_ref_from_gitmodules(vcpkg_root: Path) -> str | None:
     return None
 
 
+def _evict(directory: Path, max_size: int) -> int:
+    """Remove the oldest entries of a directory until it fits in ``max_size``; return the bytes freed."""
+    if not max_size or not directory.is_dir():
+        return 0
+    entries = []
+    total = 0
+    for entry in directory.iterdir():
+        # Lock files and the like are in use by vcpkg
+        if entry.name.startswith("."):
+            continue
+        size = directory_size(entry) if entry.is_dir() else entry.stat().st_size
+        entries.append((entry.stat().st_mtime, size, entry))
+        total += size
+    freed = 0
+    for _, size, entry in sorted(entries):
+        if total - freed <= max_size:
+            break
+        if entry.is_dir():
+            rmtree(entry, ignore_errors=True)
+        else:
+            entry.unlink(missing_ok=True)
+        freed += size
+    return freed
+
+
 class HatchCppVcpkgConfiguration(BaseModel):
     vcpkg: str | None = Field(default="vcpkg.json")
     vcpkg_root: Path | None = Field(default=Path("vcpkg"))
     vcpkg_repo: str | None = Field(default="https://github.com/microsoft/vcpkg.git")
-    vcpkg_triplet: VcpkgTriplet | None = Field(default=None)
+    vcpkg_triplet: VcpkgTriplet | str | None = Field(
+        default=None,
+        description="Triplet to install dependencies for: a built-in triplet, or one defined in vcpkg_overlay_triplets. "
+        "Defaults to the triplet of the target platform.",
+    )
     vcpkg_ref: str | None = Field(
         default=None,
         description="Branch, tag, or commit SHA to checkout after cloning vcpkg. "
         "If not set, falls back to the branch specified in .gitmodules for the vcpkg submodule.",
     )
 
-    # TODO: overlay
+    vcpkg_home: Path | None = Field(
+        default=None,
+        description="Shared vcpkg home for all projects on a host, holding a git mirror of vcpkg_repo, a worktree per ref, "
+        "one bootstrapped vcpkg tool and shared downloads and binary cache. Replaces vcpkg_root when set.",
+    )
+    vcpkg_binary_cache: Path | None = Field(
+        default=None,
+        description="Directory used as a vcpkg binary cache, e.g. a mounted CI cache volume, on top of VCPKG_BINARY_SOURCES.",
+    )
+    vcpkg_binary_cache_mode: VcpkgBinaryCacheMode = Field(
+        default="readwrite",
+        description="Whether to restore packages from vcpkg_binary_cache, store newly built packages in it, or both.",
+    )
+
+    vcpkg_overlay_ports: list[str] = Field(
+        default_factory=list,
+        description="Directories of ports taking precedence over the vcpkg registry, e.g. pinned or faster forks of dependencies.",
+    )
+    vcpkg_overlay_triplets: list[str] = Field(
+        default_factory=list,
+        description="Directories of custom triplets, taking precedence over the built-in ones.",
+    )
+    vcpkg_release_only: bool = Field(
+        default=False,
+        description="Build dependencies in release configuration only, through a generated <triplet>-release overlay triplet. "
+        "Roughly halves dependency build time and disk use.",
+    )
+    vcpkg_features: list[str] = Field(
+        default_factory=list,
+        description="Features of the manifest to install, e.g. optional compression codecs or SIMD backends.",
+    )
+    vcpkg_features_linux: list[str] = Field(default_factory=list)
+    vcpkg_features_darwin: list[str] = Field(default_factory=list)
+    vcpkg_features_win32: list[str] = Field(default_factory=list)
+    vcpkg_no_default_features: bool = Field(
+        default=False,
+        description="Install only the manifest's core and vcpkg_features, without its default features.",
+    )
+
+    vcpkg_clean_after_build: bool = Field(
+        default=False,
+        description="Remove each port's buildtrees and packages once it is installed, and any left over after a successful install.",
+    )
+    vcpkg_downloads_max_size: int = Field(
+        default=0,
+        description="Maximum size of vcpkg's downloads in bytes, evicting the oldest first; accepts suffixes like 500M or 5G. 0 for no limit.",
+    )
+    vcpkg_buildtrees_max_size: int = Field(
+        default=0,
+        description="Maximum size of vcpkg's buildtrees in bytes, evicting the oldest ports first; accepts suffixes like 500M or 5G. 0 for no limit.",
+    )
+
+    @field_validator("vcpkg_downloads_max_size", "vcpkg_buildtrees_max_size", mode="before")
+    @classmethod
+    def check_max_size(cls, value):
+        return parse_size(value)
+
+    @model_validator(mode="after")
+    def check_triplet(self):
+        if self.vcpkg_triplet is None or self.vcpkg_triplet in get_args(VcpkgTriplet):
+            return self
+        if not any((Path(directory) / f"{self.vcpkg_triplet}.cmake").exists() for directory in self.vcpkg_overlay_triplets):
+            raise ValueError(f"Unknown vcpkg triplet {self.vcpkg_triplet}; custom triplets must be defined in vcpkg_overlay_triplets")
+        return self
 
     def _resolve_vcpkg_ref(self) -> str | None:
         """Return the ref to checkout: explicit config takes priority, then .gitmodules."""
@@ -82,24 +191,49 @@ class HatchCppVcpkgConfiguration(BaseModel):
             return self.vcpkg_ref
         return _read_vcpkg_ref_from_gitmodules(self.vcpkg_root)
 
+    def get_vcpkg_root(self) -> Path:
+        """Return the vcpkg checkout to build with: ``vcpkg_root``, or the ref's worktree in the shared home."""
+        if self.vcpkg_home is None:
+            return Path(self.vcpkg_root)
+        ref = self._resolve_vcpkg_ref() or "HEAD"
+        return self._home() / "worktrees" / sub(r"[^\w.-]", "_", ref)
+
+    def _home(self) -> Path:
+        return Path(self.vcpkg_home).expanduser().resolve()
+
+    def lock(self):
+        """Return a context manager serializing builds that share ``vcpkg_home``."""
+        return file_lock(self._home() / ".lock")
+
     def _bootstrap_script_path(self) -> Path:
-        return self.vcpkg_root / ("bootstrap-vcpkg.bat" if sys_platform == "win32" else "bootstrap-vcpkg.sh")
+        return self.get_vcpkg_root() / ("bootstrap-vcpkg.bat" if sys_platform == "win32" else "bootstrap-vcpkg.sh")
 
     def _vcpkg_executable_path(self) -> Path:
+        # The shared home bootstraps the tool once and uses it with every worktree
+        directory = self.get_vcpkg_root() if self.vcpkg_home is None else self._home()
         if sys_platform == "win32":
-            return self.vcpkg_root / "vcpkg.exe"
-        return self.vcpkg_root / "vcpkg"
+            return directory / "vcpkg.exe"
+        return directory / "vcpkg"
 
     def _command_path(self, path: Path) -> str:
         if sys_platform == "win32":
             return str(path).replace("/", "\\")
+        if path.is_absolute():
+            return str(path)
         return f"./{path}"
 
     def _delete_dir_command(self, path: Path) -> str:
         if sys_platform == "win32":
-            return f'rmdir /s /q "{path}"'
+            # rmdir is a cmd builtin, and build commands are run without a shell
+            return f'cmd /c rmdir /s /q "{path}"'
         return f'rm -rf "{path}"'
 
+    def _copy_command(self, source: Path, destination: Path) -> str:
+        if sys_platform == "win32":
+            # copy is a cmd builtin, and build commands are run without a shell
+            return f'cmd /c copy /y "{source}" "{destination}"'
+        return f'cp "{source}" "{destination}"'
+
     def _is_vcpkg_working(self) -> bool:
         vcpkg_executable = self._vcpkg_executable_path()
         if not vcpkg_executable.exists():
@@ -110,6 +244,153 @@ class HatchCppVcpkgConfiguration(BaseModel):
         except OSError:
             return False
 
+    def get_binary_cache_dir(self) -> Path | None:
+        """Return the directory of the files binary source, if a binary cache is configured."""
+        if self.vcpkg_binary_cache is not None:
+            return Path(self.vcpkg_binary_cache).resolve()
+        if self.vcpkg_home is not None:
+            return self._home() / "archives"
+        return None
+
+    def _binary_source_argument(self) -> str:
+        directory = self.get_binary_cache_dir()
+        if directory is None:
+            return ""
+        # Backticks escape vcpkg's separators inside a source
+        escaped = str(directory).replace("`", "``").replace(",", "`,").replace(";", "`;")
+        return f' "--binarysource=files,{escaped},{self.vcpkg_binary_cache_mode}"'
+
+    def get_triplet(self) -> str:
+        """Return the triplet to install, which is the generated release-only variant with ``vcpkg_release_only``."""
+        if self.vcpkg_release_only and not self.vcpkg_triplet.endswith("-release"):
+            return f"{self.vcpkg_triplet}-release"
+        return self.vcpkg_triplet
+
+    def _release_triplet_dir(self) -> Path:
+        return Path("build/hatch-cpp/vcpkg-triplets").resolve()
+
+    def _write_release_triplet(self) -> None:
+        # Look the base triplet up the same way vcpkg does: overlays first, then the built-in and community triplets
+        root = self.get_vcpkg_root().resolve()
+        directories = [*(Path(directory).resolve() for directory in self.vcpkg_overlay_triplets), root / "triplets", root / "triplets" / "community"]
+        content = _RELEASE_TRIPLET.format(triplet=self.vcpkg_triplet, directories=" ".join(f'"{directory.as_posix()}"' for directory in directories))
+        path = self._release_triplet_dir() / f"{self.get_triplet()}.cmake"
+        # Leave an unchanged triplet alone, so that vcpkg's ABI hashes stay stable
+        if not path.exists() or path.read_text() != content:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(content)
+
+    def get_overlay_ports(self) -> list[Path]:
+        return [Path(directory).resolve() for directory in self.vcpkg_overlay_ports]
+
+    def get_overlay_triplets(self) -> list[Path]:
+        """Return the overlay triplet directories, including the one holding the generated release-only triplet."""
+        directories = [Path(directory).resolve() for directory in self.vcpkg_overlay_triplets]
+        if self.get_triplet() != self.vcpkg_triplet:
+            directories.append(self._release_triplet_dir())
+        return directories
+
+    def get_effective_features(self, platform: Platform) -> list[str]:
+        """Get manifest features merged with platform-specific features."""
+        features = list(self.vcpkg_features)
+        if platform == "linux":
+            features.extend(self.vcpkg_features_linux)
+        elif platform == "darwin":
+            features.extend(self.vcpkg_features_darwin)
+        elif platform == "win32":
+            features.extend(self.vcpkg_features_win32)
+        return features
+
+    def get_binary_cache_summary(self, output: str) -> str | None:
+        """Summarize binary cache hits and misses from the output of vcpkg install, or None if it installed nothing."""
+        restored = sum(int(count) for count in findall(r"Restored (\d+) package", output))
+        built = len(findall(r"^Building \S+\.\.\.", output, MULTILINE))
+        if not restored and not built:
+            return None
+        return f"vcpkg binary cache: {restored} packages restored, {built} built from source"
+
+    def _downloads_dir(self) -> Path:
+        return self._home() / "downloads" if self.vcpkg_home is not None else self.get_vcpkg_root() / "downloads"
+
+    def get_footprint(self) -> dict[str, int]:
+        """Return the size in bytes of each of vcpkg's working directories."""
+        directories = {
+            "buildtrees": self.get_vcpkg_root() / "buildtrees",
+            "packages": self.get_vcpkg_root() / "packages",
+            "downloads": self._downloads_dir(),
+            "installed": self.get_installed_dir(),
+        }
+        return {name: directory_size(directory) if directory.is_dir() else 0 for name, directory in directories.items()}
+
+    def get_footprint_summary(self, before: dict[str, int], after: dict[str, int]) -> str:
+        sizes = ", ".join(f"{name} {after[name] / 2**20:.0f} MiB" for name in after)
+        return f"vcpkg footprint: {sum(before.values()) / 2**20:.0f} MiB before, {sum(after.values()) / 2**20:.0f} MiB after ({sizes})"
+
+    def clean(self) -> int:
+        """Remove what ``vcpkg_clean_after_build`` and the size limits leave out after an install; return the bytes freed."""
+        freed = 0
+        root = self.get_vcpkg_root()
+        if self.vcpkg_clean_after_build:
+            for directory in (root / "buildtrees", root / "packages"):
+                if directory.is_dir():
+                    freed += directory_size(directory)
+                    rmtree(directory, ignore_errors=True)
+        freed += _evict(self._downloads_dir(), self.vcpkg_downloads_max_size)
+        freed += _evict(root / "buildtrees", self.vcpkg_buildtrees_max_size)
+        return freed
+
+    def get_installed_dir(self) -> Path:
+        """Return the directory manifest mode installs into, next to the manifest."""
+        return Path(self.vcpkg).parent / "vcpkg_installed"
+
+    def _stamp_path(self) -> Path:
+        return self.get_installed_dir() / ".hatch-cpp-stamp"
+
+    def get_stamp(self, platform: Platform) -> str:
+        """Key an install on everything that decides what it produces, without running vcpkg.
+
+        The manifest and vcpkg-configuration.json (which hold the baseline), the ref, the triplet,
+        the features selected for ``platform``, the contents of the overlay directories and the size and mtime of the vcpkg executable
+        (which change whenever it is re-bootstrapped) are hashed. Returns an empty string while
+        vcpkg is not bootstrapped.
+        """
+        executable = self._vcpkg_executable_path()
+        if not executable.exists():
+            return ""
+        digest = sha256()
+        configuration = Path(self.vcpkg).parent / "vcpkg-configuration.json"
+        stat = executable.stat()
+        for part in (
+            Path(self.vcpkg).read_bytes(),
+            configuration.read_bytes() if configuration.exists() else b"",
+            str(self._resolve_vcpkg_ref()).encode(),
+            str(self.get_triplet()).encode(),
+            f"{self.get_effective_features(platform)}:{self.vcpkg_no_default_features}".encode(),
+            *(self._hash_directory(directory) for directory in (*self.get_overlay_ports(), *self.get_overlay_triplets())),
+            f"{stat.st_size}:{stat.st_mtime_ns}".encode(),
+        ):
+            digest.update(part)
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def _hash_directory(self, directory: Path) -> bytes:
+        digest = sha256(str(directory).encode())
+        for path in sorted(directory.rglob("*")) if directory.is_dir() else ():
+            if path.is_file():
+                digest.update(path.relative_to(directory).as_posix().encode())
+                digest.update(path.read_bytes())
+        return digest.digest()
+
+    def is_installed(self, platform: Platform) -> bool:
+        """Whether the installed tree was produced by an install with the current stamp."""
+        stamp = self._stamp_path()
+        return (self.get_installed_dir() / str(self.get_triplet())).is_dir() and stamp.exists() and stamp.read_text() == self.get_stamp(platform)
+
+    def record_install(self, platform: Platform) -> None:
+        """Stamp the installed tree after a successful install, so that later builds can skip it."""
+        if self.get_installed_dir().is_dir():
+            self._stamp_path().write_text(self.get_stamp(platform))
+
     def _clone_checkout_bootstrap_commands(self) -> list[str]:
         commands = [f"git clone {self.vcpkg_repo} {self.vcpkg_root}"]
 
@@ -120,17 +401,62 @@ class HatchCppVcpkgConfiguration(BaseModel):
         commands.append(self._command_path(self._bootstrap_script_path()))
         return commands
 
+    def _home_commands(self) -> list[str]:
+        """Return the commands preparing the shared home's worktree for the ref and its vcpkg tool."""
+        commands = []
+        worktree = self.get_vcpkg_root()
+        if not (worktree / ".git").exists():
+            mirror = self._home() / "mirror.git"
+            if not mirror.exists():
+                commands.append(f"git clone --mirror {self.vcpkg_repo} {mirror}")
+            else:
+                # Only fetch when a new ref is needed, so that warm builds stay offline
+                commands.append(f"git -C {mirror} fetch --prune origin")
+            commands.append(f"git -C {mirror} worktree prune")
+            commands.append(f"git -C {mirror} worktree add --detach {worktree} {self._resolve_vcpkg_ref() or 'HEAD'}")
+        tool = self._vcpkg_executable_path()
+        if not tool.exists() or not self._is_vcpkg_working():
+            commands.append(self._command_path(self._bootstrap_script_path()))
+            commands.append(self._copy_command(worktree / tool.name, tool))
+        return commands
+
+    def _install_command(self, platform: Platform) -> str:
+        command = f"{self._command_path(self._vcpkg_executable_path())} install --triplet {self.get_triplet()}"
+        if self.vcpkg_home is not None:
+            command += f" --vcpkg-root={self.get_vcpkg_root()} --downloads-root={self._home() / 'downloads'}"
+        command += "".join(f" --overlay-ports={directory}" for directory in self.get_overlay_ports())
+        command += "".join(f" --overlay-triplets={directory}" for directory in self.get_overlay_triplets())
+        command += "".join(f" --x-feature={feature}" for feature in self.get_effective_features(platform))
+        if self.vcpkg_no_default_features:
+            command += " --x-no-default-features"
+        if self.vcpkg_clean_after_build:
+            # Keep downloads, which are reused by later installs and bounded by vcpkg_downloads_max_size
+            command += " --clean-buildtrees-after-build --clean-packages-after-build"
+        return command + self._binary_source_argument()
+
     def generate(self, config):
         commands = []
+        platform = config.platform.platform if config is not None else sys_platform
 
         if self.vcpkg_triplet is None:
-            platform = config.platform.platform if config is not None else sys_platform
             machine = "wasm32" if platform == "emscripten" else platform_machine()
             self.vcpkg_triplet = VcpkgPlatformDefaults.get((platform, machine))
             if self.vcpkg_triplet is None:
                 raise ValueError(f"Could not determine vcpkg triplet for platform {platform} and architecture {machine}")
 
         if self.vcpkg and Path(self.vcpkg).exists():
+            if self.get_triplet() != self.vcpkg_triplet:
+                self._write_release_triplet()
+
+            # Skip both the health check and the install while the installed tree is current
+            if getattr(config, "incremental", True) and self.is_installed(platform):
+                return commands
+
+            if self.vcpkg_home is not None:
+                commands.extend(self._home_commands())
+                commands.append(self._install_command(platform))
+                return commands
+
             vcpkg_root = Path(self.vcpkg_root)
             bootstrap_script = self._bootstrap_script_path()
 
@@ -149,6 +475,6 @@ class HatchCppVcpkgConfiguration(BaseModel):
                         commands.append(self._delete_dir_command(vcpkg_root))
                         commands.extend(self._clone_checkout_bootstrap_commands())
 
-            commands.append(f"{self._command_path(self._vcpkg_executable_path())} install --triplet {self.vcpkg_triplet}")
+            commands.append(self._install_command(platform))
 
         return commands
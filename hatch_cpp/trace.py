@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+from collections.abc import Iterator
+from contextlib import contextmanager
+from json import dumps
+from pathlib import Path
+from threading import Lock
+from time import time
+from typing import Any
+
+from pydantic import BaseModel, Field, PrivateAttr
+
+from .executor import HatchCppStepResult
+
+__all__ = ("HatchCppTracer",)
+
+
+class HatchCppTracer(BaseModel):
+    """Collects build spans and writes them as a Chrome trace-event JSON file.
+
+    Build phases are recorded on the first row of the trace. Build steps are laid out on
+    one row per concurrently running step, so idle workers show up as gaps. The file can be
+    loaded in Perfetto or ``chrome://tracing``.
+    """
+
+    origin: float = Field(default_factory=time, description="Trace start, in seconds since the epoch.")
+    events: list[dict[str, Any]] = Field(default_factory=list)
+
+    _lock: Lock = PrivateAttr(default_factory=Lock)
+    _lanes: list[float] = PrivateAttr(default_factory=list)
+
+    def _microseconds(self, timestamp: float) -> int:
+        return round((timestamp - self.origin) * 1_000_000)
+
+    def add_span(self, name: str, category: str, start: float, duration: float, lane: int = 0, **args: Any) -> None:
+        event = {
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": self._microseconds(start),
+            "dur": max(round(duration * 1_000_000), 0),
+            "pid": 1,
+            "tid": lane,
+        }
+        if args:
+            event["args"] = args
+        with self._lock:
+            self.events.append(event)
+
+    @contextmanager
+    def span(self, name: str, category: str = "phase", **args: Any) -> Iterator[None]:
+        start = time()
+        try:
+            yield
+        finally:
+            self.add_span(name, category, start, time() - start, **args)
+
+    def add_results(self, results: list[HatchCppStepResult]) -> None:
+        """Add one span per build step, on the first row that is free when the step starts."""
+        for result in sorted(results, key=lambda result: result.start):
+            for lane, free_at in enumerate(self._lanes):
+                if free_at <= result.start:
+                    break
+            else:
+                lane = len(self._lanes)
+                self._lanes.append(0.0)
+            self._lanes[lane] = result.start + result.wall_time
+            args = {"command": result.command, "returncode": result.returncode, "skipped": result.skipped, "cached": result.cached}
+            if result.cpu_time is not None:
+                args["cpu_time"] = result.cpu_time
+            if result.max_rss is not None:
+                args["max_rss"] = result.max_rss
+            self.add_span(result.name, result.kind, result.start, result.wall_time, lane=lane + 1, **args)
+
+    def write(self, path: Path) -> None:
+        metadata = [
+            {"name": "process_name", "ph": "M", "pid": 1, "args": {"name": "hatch-cpp"}},
+            {"name": "thread_name", "ph": "M", "pid": 1, "tid": 0, "args": {"name": "phases"}},
+            *({"name": "thread_name", "ph": "M", "pid": 1, "tid": lane + 1, "args": {"name": f"worker {lane}"}} for lane in range(len(self._lanes))),
+        ]
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(dumps({"traceEvents": [*metadata, *self.events], "displayTimeUnit": "ms"}, indent=1))
@@ -1,6 +1,12 @@
 from __future__ import annotations
 
+from collections.abc import Iterator, Sequence
+from contextlib import contextmanager, suppress
 from functools import cache
+from os import cpu_count, environ, scandir, walk
+from pathlib import Path
+from re import match
+from sys import platform as sys_platform
 
 from pydantic import ImportString, TypeAdapter
 
@@ -10,3 +16,108 @@ _import_string_adapter = TypeAdapter(ImportString)
 @cache
 def import_string(input_string: str):
     return _import_string_adapter.validate_python(input_string)
+
+
+def usable_cpu_count() -> int:
+    """Return the number of CPUs this process may run on."""
+    try:
+        from os import sched_getaffinity
+
+        return len(sched_getaffinity(0)) or 1
+    except ImportError:
+        return cpu_count() or 1
+
+
+def user_cache_dir() -> Path:
+    """Return the per-user cache directory for hatch-cpp, honoring ``HATCH_CPP_CACHE_DIR``."""
+    if environ.get("HATCH_CPP_CACHE_DIR"):
+        return Path(environ["HATCH_CPP_CACHE_DIR"])
+    if sys_platform == "win32" and environ.get("LOCALAPPDATA"):
+        return Path(environ["LOCALAPPDATA"]) / "hatch-cpp" / "Cache"
+    if sys_platform == "darwin":
+        return Path.home() / "Library" / "Caches" / "hatch-cpp"
+    return Path(environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "hatch-cpp"
+
+
+@contextmanager
+def file_lock(path: Path) -> Iterator[None]:
+    """Hold an exclusive lock on ``path`` across processes, waiting for any other holder to release it."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a+b") as f:
+        if sys_platform == "win32":
+            import msvcrt
+
+            f.seek(0)
+            while True:
+                # LK_LOCK gives up after ten seconds
+                with suppress(OSError):
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def parse_size(value: int | str) -> int:
+    """Parse a size in bytes, accepting suffixes like ``500M`` or ``5GiB``."""
+    if isinstance(value, int):
+        return value
+    matched = match(r"^\s*(\d+(?:\.\d+)?)\s*([kmgt]?)i?b?\s*$", value.lower())
+    if not matched:
+        raise ValueError(f"Invalid size: {value!r}")
+    return int(float(matched.group(1)) * 1024 ** " kmgt".index(matched.group(2) or " "))
+
+
+def directory_size(path: Path) -> int:
+    """Return the total size in bytes of the files under a directory."""
+    total = 0
+    for root, _, files in walk(path):
+        for name in files:
+            with suppress(OSError):
+                total += (Path(root) / name).stat().st_size
+    return total
+
+
+# Directories that never hold a project's built libraries
+PRUNED_DIRECTORIES = frozenset(
+    (".git", ".hg", ".svn", ".tox", ".nox", ".venv", "venv", "node_modules", "dist", "__pycache__", ".mypy_cache", ".pytest_cache", ".ruff_cache")
+)
+
+
+def find_files(roots: Sequence[Path], suffixes: tuple[str, ...], prune: Sequence[Path] = ()) -> tuple[list[Path], int]:
+    """Find files with the given suffixes under ``roots``, returning them with the number of directory entries visited.
+
+    Directories named in ``PRUNED_DIRECTORIES``, the directories in ``prune``, virtual environments and
+    CMake build trees are skipped without being listed, and symlinked directories are not followed.
+    """
+    pruned = {path.resolve() for path in prune}
+    found = []
+    visited = 0
+    pending = [root for root in roots if root.is_dir() and root.resolve() not in pruned]
+    while pending:
+        directory = pending.pop()
+        try:
+            with scandir(directory) as iterator:
+                entries = list(iterator)
+        except OSError:
+            continue
+        visited += len(entries)
+        if any(entry.name in ("pyvenv.cfg", "CMakeCache.txt") for entry in entries):
+            continue
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                if entry.name not in PRUNED_DIRECTORIES and Path(entry.path).resolve() not in pruned:
+                    pending.append(Path(entry.path))
+            elif entry.name.endswith(suffixes):
+                found.append(Path(entry.path))
+    return sorted(found), visited